@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the analysis stages against the real workbooks in app/templates.
+
+Stages:
+- load_workbook: openpyxl.load_workbook of the latest version of each template
+- iter_formula_cells / iter_data_validations / iter_conditional_formats on those workbooks
+- xml_cf_report: xml_cf_report.run_report over the same workbooks
+- scan_text_diff: scan_text_diff.run_text_diff over the two latest versions per template
+- docs_rule_check: docs_excel_rule_check rule evaluation (needs a scan directory)
+
+The last two take minutes rather than seconds, so a plain run covers only the quick
+stages (DEFAULT_STAGES); --full or an explicit --stages list adds them. The baseline keeps
+entries for every stage, and a run is only checked against the stages it measured.
+
+Every run also times a fixed pure-Python calibration loop; stage times are divided by
+it so the committed baseline (analysis/benchmark-baseline.json) carries over between
+machines. A stage fails when its normalised time exceeds baseline * (1 + tolerance)
+and it is more than NOISE_FLOOR_S slower in absolute terms.
+
+Usage:
+  python analysis/benchmark_scan.py                      # quick stages vs the baseline
+  python analysis/benchmark_scan.py --full               # every stage, including the slow ones
+  python analysis/benchmark_scan.py --stages load_workbook,xml_cf_report --repeat 3
+  python analysis/benchmark_scan.py --update-baseline    # re-record the stages that ran
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import openpyxl
+
+try:
+    from analysis import docs_excel_rule_check, run_scan, scan_text_diff, xml_cf_report
+    from analysis.scan_artifacts import ScanArtifacts, find_latest_scan
+except ImportError:
+    import docs_excel_rule_check
+    import run_scan
+    from scan_artifacts import ScanArtifacts, find_latest_scan
+    import scan_text_diff
+    import xml_cf_report
+
+ROOT = Path(__file__).resolve().parents[1]
+TEMPLATE_ROOT = ROOT / "app" / "templates"
+BASELINE_PATH = ROOT / "analysis" / "benchmark-baseline.json"
+DEFAULT_TOLERANCE = 0.25
+# slowdowns smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR_S = 0.05
+STAGES = (
+    "load_workbook",
+    "iter_formula_cells",
+    "iter_data_validations",
+    "iter_conditional_formats",
+    "xml_cf_report",
+    "scan_text_diff",
+    "docs_rule_check",
+)
+# scan_text_diff and docs_rule_check run for minutes; they need --full or --stages
+SLOW_STAGES = ("scan_text_diff", "docs_rule_check")
+DEFAULT_STAGES = tuple(stage for stage in STAGES if stage not in SLOW_STAGES)
+
+
+class BenchContext:
+    """Inputs shared by the stages: selected workbooks, loaded workbooks, scratch dirs."""
+
+    def __init__(self, template_root: Path, work_dir: Path, scan_dir: Optional[Path]) -> None:
+        self.work_dir = work_dir
+        self.scan_dir = scan_dir
+        self.latest: List[Tuple[str, str, Path]] = []
+        self.latest_root = work_dir / "latest"
+        self.pairs_root = work_dir / "pairs"
+        for folder in sorted(p for p in template_root.iterdir() if p.is_dir()):
+            versions = scan_text_diff.load_versions(folder)
+            if not versions:
+                continue
+            self.latest.append((folder.name, *versions[-1]))
+            link_files(self.latest_root / folder.name, [versions[-1][1]])
+            link_files(self.pairs_root / folder.name, [path for _, path in versions[-2:]])
+        self.workbooks: List[openpyxl.Workbook] = []
+
+    @property
+    def workbook_names(self) -> List[str]:
+        return [f"{template}/{path.name}" for template, _, path in self.latest]
+
+
+def link_files(folder: Path, paths: List[Path]) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    for path in paths:
+        target = folder / path.name
+        try:
+            os.symlink(path.resolve(), target)
+        except OSError:
+            shutil.copy2(path, target)
+
+
+def stage_load_workbook(ctx: BenchContext) -> int:
+    ctx.workbooks = [
+        openpyxl.load_workbook(path, data_only=False, read_only=False)
+        for _, _, path in ctx.latest
+    ]
+    return len(ctx.workbooks)
+
+
+def _ensure_loaded(ctx: BenchContext) -> List[openpyxl.Workbook]:
+    if not ctx.workbooks:
+        stage_load_workbook(ctx)
+    return ctx.workbooks
+
+
+def stage_iter_formula_cells(ctx: BenchContext) -> int:
+    return sum(
+        len(run_scan.iter_formula_cells(ws)) for wb in ctx.workbooks for ws in wb.worksheets
+    )
+
+
+def stage_iter_data_validations(ctx: BenchContext) -> int:
+    return sum(
+        len(run_scan.iter_data_validations(ws)) for wb in ctx.workbooks for ws in wb.worksheets
+    )
+
+
+def stage_iter_conditional_formats(ctx: BenchContext) -> int:
+    return sum(
+        len(run_scan.iter_conditional_formats(ws)) for wb in ctx.workbooks for ws in wb.worksheets
+    )
+
+
+def stage_xml_cf_report(ctx: BenchContext) -> int:
+    out = ctx.work_dir / "out"
+    xml_cf_report.run_report(
+        ctx.latest_root, out / "xml-cf-report.jsonl", out / "xml-cf-report-summary.csv"
+    )
+    with (out / "xml-cf-report.jsonl").open(encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def stage_scan_text_diff(ctx: BenchContext) -> int:
+    return scan_text_diff.run_text_diff(ctx.pairs_root, ctx.work_dir / "out")
+
+
+def stage_docs_rule_check(ctx: BenchContext) -> int:
+    # a fresh ScanArtifacts, so each repeat parses the catalogs again
+    rules = docs_excel_rule_check.build_rules(ctx.scan_dir, ScanArtifacts(ctx.scan_dir))
+    evaluated = 0
+    for rule in rules:
+        try:
+            rule.excel_evidence()
+        except (FileNotFoundError, KeyError, ValueError):
+            # rules for template versions that are not checked in still cost their loads
+            pass
+        evaluated += 1
+    return evaluated
+
+
+STAGE_FUNCS: Dict[str, Callable[[BenchContext], int]] = {
+    "load_workbook": stage_load_workbook,
+    "iter_formula_cells": stage_iter_formula_cells,
+    "iter_data_validations": stage_iter_data_validations,
+    "iter_conditional_formats": stage_iter_conditional_formats,
+    "xml_cf_report": stage_xml_cf_report,
+    "scan_text_diff": stage_scan_text_diff,
+    "docs_rule_check": stage_docs_rule_check,
+}
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Best-of time for a fixed dict/str/sort workload, the unit for normalised times."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cells = {f"{chr(65 + i % 26)}{i}": f"SUM(A{i}:B{i})*{i % 7}" for i in range(200_000)}
+        ordered = sorted(cells.items(), key=lambda item: item[1])
+        "\n".join(f"{k}\t{v}" for k, v in ordered).encode("utf-8")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(
+    stages: List[str],
+    repeat: int = 1,
+    template_root: Path = TEMPLATE_ROOT,
+    scan_dir: Optional[Path] = None,
+) -> Dict[str, object]:
+    calibration = calibrate()
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix="scan-bench-") as tmp:
+        ctx = BenchContext(template_root, Path(tmp), scan_dir)
+        for stage in stages:
+            if stage == "docs_rule_check" and scan_dir is None:
+                print("skip docs_rule_check: no scan directory", file=sys.stderr)
+                continue
+            if stage.startswith("iter_"):
+                _ensure_loaded(ctx)
+            best, count = float("inf"), 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    count = STAGE_FUNCS[stage](ctx)
+                best = min(best, time.perf_counter() - start)
+            results[stage] = {
+                "seconds": round(best, 4),
+                "normalized": round(best / calibration, 3),
+                "items": count,
+            }
+        workbooks = ctx.workbook_names
+    return {"calibration_s": round(calibration, 4), "workbooks": workbooks, "stages": results}
+
+
+def check_against_baseline(
+    results: Dict[str, object], baseline: Dict[str, object]
+) -> Tuple[bool, List[str]]:
+    default_tolerance = float(baseline.get("tolerance", DEFAULT_TOLERANCE))
+    lines: List[str] = []
+    ok = True
+    if results["workbooks"] != baseline.get("workbooks"):
+        lines.append("note: benchmark workbooks differ from the baseline set")
+    base_stages = baseline.get("stages", {})
+    for stage, current in results["stages"].items():
+        base = base_stages.get(stage)
+        if base is None:
+            lines.append(f"{stage:26s} {current['normalized']:9.3f}  (no baseline)")
+            continue
+        tolerance = float(base.get("tolerance", default_tolerance))
+        ratio = current["normalized"] / base["normalized"] if base["normalized"] else 1.0
+        slower_s = (current["normalized"] - base["normalized"]) * float(results["calibration_s"])
+        status = "ok"
+        if ratio > 1 + tolerance and slower_s > NOISE_FLOOR_S:
+            status = "REGRESSION"
+            ok = False
+        elif ratio < 1 - tolerance:
+            status = "faster"
+        lines.append(
+            f"{stage:26s} {current['normalized']:9.3f} vs {base['normalized']:9.3f}"
+            f"  x{ratio:.2f} (tolerance {tolerance:.0%})  {status}"
+        )
+    return ok, lines
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the analysis stages.")
+    parser.add_argument(
+        "--stages",
+        default=None,
+        help=(
+            f"Comma-separated stages out of {', '.join(STAGES)} "
+            f"(default: {', '.join(DEFAULT_STAGES)})."
+        ),
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help=f"Run every stage, including the slow {' and '.join(SLOW_STAGES)}.",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; best is kept.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--scan-dir",
+        type=Path,
+        default=None,
+        help="Scan directory for docs_rule_check (default: latest analysis/scan-*).",
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--out", type=Path, default=None, help="Also write results as JSON.")
+    args = parser.parse_args(argv)
+    if args.full and args.stages is not None:
+        parser.error("--full and --stages are mutually exclusive")
+    if args.stages is None:
+        args.stages = ",".join(STAGES if args.full else DEFAULT_STAGES)
+    unknown = set(args.stages.split(",")) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    scan_dir = args.scan_dir
+    if scan_dir is None:
+        try:
+            scan_dir = find_latest_scan()
+        except FileNotFoundError:
+            scan_dir = None
+    stages = [stage for stage in STAGES if stage in args.stages.split(",")]
+    results = run_benchmarks(stages, args.repeat, scan_dir=scan_dir)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.update_baseline:
+        baseline = {"tolerance": DEFAULT_TOLERANCE, **results}
+        if args.baseline.exists():
+            previous = json.loads(args.baseline.read_text(encoding="utf-8"))
+            baseline["tolerance"] = previous.get("tolerance", DEFAULT_TOLERANCE)
+            baseline["stages"] = {**previous.get("stages", {}), **results["stages"]}
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote baseline to {args.baseline}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    ok, lines = check_against_baseline(results, baseline)
+    print(f"calibration {results['calibration_s']}s; normalised stage times:")
+    print("\n".join(lines))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
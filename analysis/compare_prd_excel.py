@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
-"""Compare PRD question text/options vs Excel DV and output mismatch report."""
+"""Compare PRD question text/options vs Excel DV and output mismatch report.
+
+--profile writes compare_prd_excel-{cprofile|stats}.* next to the report (see scan_profile.py).
+"""
 from __future__ import annotations
 
+import argparse
 import json
 import re
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+try:
+    from analysis.scan_profile import add_profile_argument, profiling
+except ImportError:
+    from scan_profile import add_profile_argument, profiling
+
 ROOT = Path(__file__).resolve().parents[1]
 DOCS = ROOT / "docs"
 EXCEL = ROOT / "analysis" / "excel_question_options.json"
@@ -180,5 +189,13 @@ def compare():
     OUTPUT.write_text("\n".join(lines), encoding="utf-8")
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare PRD questions/options vs Excel DV.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profiling(args, OUTPUT.parent, "compare_prd_excel"):
+        compare()
+
+
 if __name__ == "__main__":
-    compare()
+    main()
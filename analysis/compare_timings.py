@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare two timing/profile runs and report where the pipeline got slower or faster.
+
+Each run is one of:
+- a scan directory or its scan-timings.json (run_scan --timings): stages are the phases,
+  files are the workbooks (sum of their top-level phases)
+- a benchmark_scan.py --out results file or benchmark-baseline.json: stages only
+- a .pstats dump (--profile): stages are functions by cumulative time, files are source
+  files by own time
+
+Stages and files are lined up by name. A change is significant when it is more than
+--threshold (relative) and --noise-floor seconds (absolute) either way; files or stages
+present in only one run are reported as new/gone.
+
+Usage:
+  python analysis/compare_timings.py analysis/scan-2026-01-24 analysis/scan-2026-10-18
+  python analysis/compare_timings.py before.pstats after.pstats --threshold 0.2 --out cmp.md
+
+Exit status is 1 when anything is significantly slower.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pstats
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+TIMINGS_NAME = "scan-timings.json"
+METRICS = ("wall_s", "cpu_s")
+DEFAULT_THRESHOLD = 0.10
+# changes smaller than this are timer noise, whatever the ratio
+DEFAULT_NOISE_FLOOR_S = 0.05
+TOTAL_KEY = "(total)"
+# meta keys that make two scan runs hard to compare when they differ
+META_KEYS = ("engine", "jobs", "cache_hits", "cache_misses")
+
+
+@dataclass
+class TimingRun:
+    path: Path
+    kind: str
+    stages: Dict[str, float]
+    files: Dict[str, float] = field(default_factory=dict)
+    # per file: the stage times behind files[name], used to say where a file got slower
+    file_stages: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    total: Optional[float] = None
+    meta: Dict[str, object] = field(default_factory=dict)
+    notes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Change:
+    name: str
+    before: Optional[float]
+    after: Optional[float]
+    status: str
+    where: str = ""
+
+    @property
+    def delta(self) -> float:
+        return (self.after or 0.0) - (self.before or 0.0)
+
+    @property
+    def ratio(self) -> Optional[float]:
+        if not self.before or self.after is None:
+            return None
+        return self.after / self.before
+
+
+def top_level_time(phases: Dict[str, Dict[str, float]], metric: str) -> Dict[str, float]:
+    """Phase times without the calls that ran nested inside another phase."""
+    times = {}
+    for name, record in phases.items():
+        calls = record.get("calls") or 1
+        times[name] = record[metric] * (1 - record.get("nested", 0) / calls)
+    return times
+
+
+def load_timings(path: Path, payload: dict, metric: str) -> TimingRun:
+    file_stages = {
+        workbook: {name: record[metric] for name, record in phases.items()}
+        for workbook, phases in payload.get("workbooks", {}).items()
+    }
+    files = {
+        workbook: sum(top_level_time(phases, metric).values())
+        for workbook, phases in payload.get("workbooks", {}).items()
+    }
+    notes = []
+    if any("nested" not in record for record in payload.get("phases", {}).values()):
+        notes.append(f"{path} has no nested-phase counts; its file times count nested phases twice")
+    return TimingRun(
+        path=path,
+        kind="scan-timings",
+        stages={name: record[metric] for name, record in payload.get("phases", {}).items()},
+        files=files,
+        file_stages=file_stages,
+        total=payload.get("total", {}).get(metric),
+        meta=payload.get("meta", {}),
+        notes=notes,
+    )
+
+
+def load_benchmark(path: Path, payload: dict) -> TimingRun:
+    stages = {name: record["seconds"] for name, record in payload["stages"].items()}
+    return TimingRun(
+        path=path,
+        kind="benchmark",
+        stages=stages,
+        total=sum(stages.values()),
+        meta={"calibration_s": payload.get("calibration_s")},
+    )
+
+
+def load_pstats(path: Path) -> TimingRun:
+    stats = pstats.Stats(str(path)).stats
+    stages: Dict[str, float] = {}
+    files: Dict[str, float] = {}
+    for (filename, lineno, func), (_, _, own, cumulative, _) in stats.items():
+        stages[f"{filename}:{lineno}({func})"] = cumulative
+        files[filename] = files.get(filename, 0.0) + own
+    total = sum(files.values())
+    return TimingRun(path=path, kind="pstats", stages=stages, files=files, total=total)
+
+
+def load_run(path: Path, metric: str = "wall_s") -> TimingRun:
+    if path.is_dir():
+        path = path / TIMINGS_NAME
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found; run run_scan.py --timings first.")
+    if path.suffix == ".pstats":
+        return load_pstats(path)
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    if "phases" in payload:
+        return load_timings(path, payload, metric)
+    if "stages" in payload and "calibration_s" in payload:
+        return load_benchmark(path, payload)
+    raise ValueError(f"{path}: not a scan-timings, benchmark or pstats file")
+
+
+def classify(
+    before: Optional[float], after: Optional[float], threshold: float, noise_floor: float
+) -> str:
+    if before is None:
+        return "new"
+    if after is None:
+        return "gone"
+    delta = after - before
+    if delta > noise_floor and after > before * (1 + threshold):
+        return "slower"
+    if -delta > noise_floor and after < before * (1 - threshold):
+        return "faster"
+    return "same"
+
+
+def compare_times(
+    before: Dict[str, float],
+    after: Dict[str, float],
+    threshold: float = DEFAULT_THRESHOLD,
+    noise_floor: float = DEFAULT_NOISE_FLOOR_S,
+) -> List[Change]:
+    """Line up two name -> seconds maps; biggest absolute changes first."""
+    changes = [
+        Change(
+            name,
+            before.get(name),
+            after.get(name),
+            classify(before.get(name), after.get(name), threshold, noise_floor),
+        )
+        for name in sorted(set(before) | set(after))
+    ]
+    changes.sort(key=lambda change: abs(change.delta), reverse=True)
+    return changes
+
+
+def biggest_stage_change(before: Dict[str, float], after: Dict[str, float]) -> str:
+    deltas = [
+        (after.get(name, 0.0) - before.get(name, 0.0), name)
+        for name in set(before) | set(after)
+    ]
+    if not deltas:
+        return ""
+    delta, name = max(deltas, key=lambda item: abs(item[0]))
+    return f"{name} {delta:+.3f}s"
+
+
+def compare_runs(
+    before: TimingRun,
+    after: TimingRun,
+    threshold: float = DEFAULT_THRESHOLD,
+    noise_floor: float = DEFAULT_NOISE_FLOOR_S,
+) -> Tuple[List[Change], List[Change]]:
+    """Return (stage changes, file changes); the run total leads the stage list."""
+    stages = compare_times(before.stages, after.stages, threshold, noise_floor)
+    if before.total is not None and after.total is not None:
+        total_status = classify(before.total, after.total, threshold, noise_floor)
+        stages.insert(0, Change(TOTAL_KEY, before.total, after.total, total_status))
+    files = compare_times(before.files, after.files, threshold, noise_floor)
+    for change in files:
+        if change.status in ("slower", "faster"):
+            change.where = biggest_stage_change(
+                before.file_stages.get(change.name, {}), after.file_stages.get(change.name, {})
+            )
+    return stages, files
+
+
+def meta_notes(before: TimingRun, after: TimingRun) -> List[str]:
+    notes = before.notes + after.notes
+    if before.kind != after.kind:
+        notes.append(f"comparing a {before.kind} run with a {after.kind} run")
+    for key in META_KEYS:
+        if key in before.meta and before.meta.get(key) != after.meta.get(key):
+            notes.append(f"{key} differs: {before.meta.get(key)} -> {after.meta.get(key)}")
+    return notes
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def _table(title: str, changes: List[Change], with_where: bool) -> List[str]:
+    header = "| Name | Before (s) | After (s) | Δ (s) | Ratio | Status |"
+    rule = "|---|---:|---:|---:|---:|---|"
+    if with_where:
+        header += " Biggest stage change |"
+        rule += "---|"
+    lines = [f"## {title}", ""]
+    if not changes:
+        return lines + ["- no significant changes", ""]
+    lines += [header, rule]
+    for change in changes:
+        ratio = "-" if change.ratio is None else f"x{change.ratio:.2f}"
+        row = (
+            f"| {change.name} | {_seconds(change.before)} | {_seconds(change.after)} "
+            f"| {change.delta:+.3f} | {ratio} | {change.status} |"
+        )
+        if with_where:
+            row += f" {change.where} |"
+        lines.append(row)
+    lines.append("")
+    return lines
+
+
+def render_report(
+    before: TimingRun,
+    after: TimingRun,
+    stages: List[Change],
+    files: List[Change],
+    threshold: float,
+    noise_floor: float,
+    show_all: bool = False,
+) -> str:
+    def shown(changes: List[Change]) -> List[Change]:
+        return changes if show_all else [c for c in changes if c.status != "same"]
+
+    counts = {status: 0 for status in ("slower", "faster", "new", "gone")}
+    for change in stages + files:
+        if change.status in counts:
+            counts[change.status] += 1
+    lines = [
+        "# Timing comparison",
+        "",
+        f"> before: {before.path}",
+        f"> after: {after.path}",
+        f"> significant: ±{threshold:.0%} and ≥{noise_floor:g}s",
+        "",
+        "Summary: " + ", ".join(f"{count} {status}" for status, count in counts.items()),
+        "",
+    ]
+    notes = meta_notes(before, after)
+    if notes:
+        lines += [f"- note: {note}" for note in notes] + [""]
+    stage_title = "Functions (cumulative)" if after.kind == "pstats" else "Stages"
+    file_title = "Source files (own time)" if after.kind == "pstats" else "Files"
+    lines += _table(stage_title, shown(stages), with_where=False)
+    if before.files or after.files:
+        lines += _table(file_title, shown(files), with_where=after.kind != "pstats")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare two timing/profile runs.")
+    parser.add_argument(
+        "before", type=Path, help="Scan dir, scan-timings.json, benchmark JSON or .pstats."
+    )
+    parser.add_argument("after", type=Path, help="Run to compare against before (same kinds).")
+    parser.add_argument(
+        "--metric", choices=METRICS, default="wall_s", help="scan-timings field to compare."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Relative change that counts as significant (default: {DEFAULT_THRESHOLD}).",
+    )
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=DEFAULT_NOISE_FLOOR_S,
+        help=(
+            "Absolute change in seconds below which nothing is significant "
+            f"(default: {DEFAULT_NOISE_FLOOR_S})."
+        ),
+    )
+    parser.add_argument("--all", action="store_true", help="List unchanged stages and files too.")
+    parser.add_argument("--out", type=Path, default=None, help="Also write the report as markdown.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    before = load_run(args.before, args.metric)
+    after = load_run(args.after, args.metric)
+    stages, files = compare_runs(before, after, args.threshold, args.noise_floor)
+    report = render_report(
+        before, after, stages, files, args.threshold, args.noise_floor, show_all=args.all
+    )
+    print(report)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(report + "\n", encoding="utf-8")
+    return 1 if any(change.status == "slower" for change in stages + files) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
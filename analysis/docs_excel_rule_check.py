@@ -6,12 +6,11 @@ Validate docs vs Excel for key rules across Declaration / Smelter List / Mine Li
 Outputs:
 - docs/diffs/docs-excel-rule-check.md (pass/fail summary + evidence)
 - docs/diffs/docs-excel-evidence.md (evidence index: Excel -> docs line)
+- docs_excel_rule_check-{cprofile|stats}.* in the scan directory with --profile (see scan_profile.py)
 """
 from __future__ import annotations
 
 import argparse
-import csv
-import json
 import re
 from dataclasses import dataclass
 from pathlib import Path
@@ -20,11 +19,19 @@ from typing import Callable, Iterable, List, Optional, Tuple
 import openpyxl
 from openpyxl.utils.cell import range_boundaries
 
+try:
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from analysis.sqref_index import RuleCatalog
+except ImportError:
+    from scan_profile import add_profile_argument, profiling
+    from scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from sqref_index import RuleCatalog
+
 ROOT = Path(__file__).resolve().parents[1]
 TEMPLATE_ROOT = ROOT / "app" / "templates"
 DOCS_ROOT = ROOT / "docs"
 ANALYSIS_ROOT = ROOT / "analysis"
-SCAN_PREFIX = "scan-"
 VERSION_RE = re.compile(r"_(\d+(?:\.\d+)*)\.xlsx$")
 
 
@@ -39,13 +46,6 @@ class Rule:
     versions: Tuple[str, ...] = ()
 
 
-def find_latest_scan(root: Path) -> Path:
-    scans = sorted([p for p in root.iterdir() if p.is_dir() and p.name.startswith(SCAN_PREFIX)])
-    if not scans:
-        raise FileNotFoundError("No scan-YYYY-MM-DD directories found in analysis/.")
-    return scans[-1]
-
-
 def parse_version_tuple(v: str) -> Tuple[int, ...]:
     return tuple(int(x) for x in v.split("."))
 
@@ -81,54 +81,11 @@ def norm_text(val) -> str:
     return text.replace("\r\n", "\n").replace("\r", "\n").strip()
 
 
-def load_dv_catalog(scan_root: Path, template: str) -> List[dict]:
-    path = scan_root / f"{template.lower()}_rule_catalog_dv.csv"
-    if not path.exists():
-        return []
-    rows: List[dict] = []
-    with path.open(encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
-    return rows
-
-
-def cell_in_sqref(cell: str, sqref: str) -> bool:
-    target_col = re.sub(r"\d+", "", cell)
-    target_row = int(re.sub(r"\D+", "", cell))
-    for part in sqref.split():
-        part = part.replace("$", "")
-        if not part:
-            continue
-        if ":" in part:
-            min_col, min_row, max_col, max_row = range_boundaries(part)
-            # convert letter to index via range_boundaries already
-            if min_row <= target_row <= max_row:
-                # compare column letters by index
-                if min_col <= openpyxl.utils.cell.column_index_from_string(target_col) <= max_col:
-                    return True
-        else:
-            if part == cell or part == cell.replace("$", ""):
-                return True
-    return False
-
+def dv_list_for_cell(dv_rows: RuleCatalog, version: str, sheet: str, cell: str) -> List[dict]:
+    return [row for row in dv_rows.covering(version, sheet, cell) if row.get("type") == "list"]
 
-def dv_list_for_cell(dv_rows: List[dict], version: str, sheet: str, cell: str) -> List[dict]:
-    hits = []
-    for row in dv_rows:
-        if row.get("version") != version:
-            continue
-        if row.get("sheet") != sheet:
-            continue
-        if row.get("type") != "list":
-            continue
-        sqref = row.get("sqref", "")
-        if cell_in_sqref(cell, sqref):
-            hits.append(row)
-    return hits
 
-
-def dv_list_formulas_for_cell(dv_rows: List[dict], version: str, sheet: str, cell: str) -> List[str]:
+def dv_list_formulas_for_cell(dv_rows: RuleCatalog, version: str, sheet: str, cell: str) -> List[str]:
     hits = dv_list_for_cell(dv_rows, version, sheet, cell)
     formulas = []
     for row in hits:
@@ -366,19 +323,6 @@ def instructions_filename_example_multi(template: str, versions: List[str]) -> T
             ok = False
     return ok, " / ".join(details)
 
-def load_cf_formulas(scan_root: Path) -> List[dict]:
-    path = scan_root / "xml-cf-report.jsonl"
-    if not path.exists():
-        return []
-    rows = []
-    with path.open(encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rows.append(json.loads(line))
-    return rows
-
-
 def find_doc_evidence(patterns: List[re.Pattern], paths: Iterable[Path]) -> Optional[str]:
     evidences: List[str] = []
     seen = set()
@@ -419,11 +363,11 @@ def rule_matches(rule: Rule, templates: Optional[set], versions: Optional[set])
     return True
 
 
-def build_rules(scan_root: Path) -> List[Rule]:
-    dv_emrt = load_dv_catalog(scan_root, "EMRT")
-    dv_amrt = load_dv_catalog(scan_root, "AMRT")
-    dv_cmrt = load_dv_catalog(scan_root, "CMRT")
-    cf_rows = load_cf_formulas(scan_root)
+def build_rules(scan_root: Path, artifacts: Optional[ScanArtifacts] = None) -> List[Rule]:
+    artifacts = artifacts or artifacts_for(scan_root)
+    dv_emrt = artifacts.dv_catalog("EMRT")
+    dv_amrt = artifacts.dv_catalog("AMRT")
+    dv_cmrt = artifacts.dv_catalog("CMRT")
 
     def emrt_mine_sheet() -> Tuple[bool, str]:
         wb20 = openpyxl.load_workbook(load_template_path("EMRT", "2.0"), data_only=False)
@@ -450,11 +394,8 @@ def build_rules(scan_root: Path) -> List[Rule]:
 
     def mine_bang_cf_emrt21() -> Tuple[bool, str]:
         formulas = []
-        for row in cf_rows:
-            if row.get("template") != "EMRT" or row.get("version") != "2.1":
-                continue
-            if row.get("sheet") != "Mine List":
-                continue
+        rows = artifacts.cf_records("EMRT", "2.1", "Mine List") if artifacts.has_cf_report() else []
+        for row in rows:
             for formula in row.get("formulas", []) or []:
                 if "!" in formula and ("FIND(\"!\"" in formula or "SEARCH(\"!\"" in formula):
                     formulas.append(formula)
@@ -1064,9 +1005,15 @@ def main() -> None:
     parser.add_argument("--scan-dir", type=str, default="", help="Use a specific scan directory (analysis/scan-YYYY-MM-DD).")
     parser.add_argument("--templates", type=str, default="", help="Comma-separated templates to include (CMRT,EMRT,CRT,AMRT).")
     parser.add_argument("--versions", type=str, default="", help="Comma-separated versions to include (e.g., 2.1,2.0,1.3).")
+    add_profile_argument(parser)
     args = parser.parse_args()
 
     scan_root = Path(args.scan_dir) if args.scan_dir else find_latest_scan(ANALYSIS_ROOT)
+    with profiling(args, scan_root, "docs_excel_rule_check"):
+        run_check(args, scan_root)
+
+
+def run_check(args: argparse.Namespace, scan_root: Path) -> None:
     rules = build_rules(scan_root)
 
     templates_filter = {t.strip().upper() for t in args.templates.split(",") if t.strip()} or None
@@ -2,9 +2,11 @@
 """
 Extract question text + DV options from Excel Declaration sheet.
 Outputs analysis/excel_question_options.json
+(plus extract_excel_questions-{cprofile|stats}.* next to it with --profile; see scan_profile.py)
 """
 from __future__ import annotations
 
+import argparse
 import json
 import re
 from pathlib import Path
@@ -13,6 +15,13 @@ from typing import Dict, List, Tuple
 import openpyxl
 from openpyxl.utils.cell import range_boundaries
 
+try:
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.sqref_index import SqrefIndex
+except ImportError:
+    from scan_profile import add_profile_argument, profiling
+    from sqref_index import SqrefIndex
+
 ROOT = Path(__file__).resolve().parents[1]
 TEMPLATE_ROOT = ROOT / "app" / "templates"
 OUTPUT = ROOT / "analysis" / "excel_question_options.json"
@@ -65,22 +74,15 @@ def dv_list_values(wb: openpyxl.Workbook, sheet: str, formula1: str) -> List[str
     return values
 
 
-def build_dv_index(ws) -> List[openpyxl.worksheet.datavalidation.DataValidation]:
-    return [dv for dv in ws.data_validations.dataValidation if dv.type == "list"]
+def build_dv_index(ws) -> SqrefIndex:
+    return SqrefIndex(
+        (str(dv.sqref), dv) for dv in ws.data_validations.dataValidation if dv.type == "list"
+    )
 
 
-def find_dv_for_cell(dvs, cell) -> List[str]:
-    for dv in dvs:
-        for sqref in str(dv.sqref).split():
-            sqref = sqref.replace("$", "")
-            if ":" in sqref:
-                min_col, min_row, max_col, max_row = range_boundaries(sqref)
-                if min_row <= cell.row <= max_row and min_col <= cell.column <= max_col:
-                    return [dv.formula1]
-            else:
-                if sqref == cell.coordinate:
-                    return [dv.formula1]
-    return []
+def find_dv_for_cell(dvs: SqrefIndex, cell) -> List[str]:
+    hits = dvs.covering(cell.coordinate)
+    return [hits[0].formula1] if hits else []
 
 
 def first_text_cell(ws, row: int, max_col: int = 10) -> Tuple[int, str]:
@@ -182,7 +184,7 @@ def extract_questions(ws, wb):
     return result
 
 
-def main() -> None:
+def extract_all() -> None:
     output: Dict[str, Dict[str, dict]] = {}
     for template, folder in iter_templates():
         for path in sorted(folder.glob("*.xlsx")):
@@ -204,5 +206,13 @@ def main() -> None:
     OUTPUT.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extract Declaration questions and DV options.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profiling(args, OUTPUT.parent, "extract_excel_questions"):
+        extract_all()
+
+
 if __name__ == "__main__":
     main()
@@ -17,6 +17,13 @@ from typing import Dict, Iterable, List, Optional, Tuple
 
 import openpyxl
 
+try:
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_store import replace_text
+except ImportError:
+    from scan_profile import add_profile_argument, profiling
+    from scan_store import replace_text
+
 ROOT = Path(__file__).resolve().parents[1]
 TEMPLATE_ROOT = ROOT / "app" / "templates"
 VERSION_RE = re.compile(r"_(\d+(?:\.\d+)*)$")
@@ -311,8 +318,8 @@ def run_review(out_diff: Path, out_fix: Path) -> int:
         fix_lines.append("- 未发现需要修正的文档项。")
         fix_lines.append("")
 
-    out_diff.write_text("\n".join(diff_lines), encoding="utf-8")
-    out_fix.write_text("\n".join(fix_lines), encoding="utf-8")
+    replace_text(out_diff, "\n".join(diff_lines))
+    replace_text(out_fix, "\n".join(fix_lines))
     print(f"Wrote detailed diff to {out_diff}")
     print(f"Wrote fix list to {out_fix}")
     return 0
@@ -322,11 +329,13 @@ def main() -> int:
     parser = argparse.ArgumentParser(description="Manual review for non-Product List sheets.")
     parser.add_argument("--out-diff", type=Path, default=None)
     parser.add_argument("--out-fix", type=Path, default=None)
+    add_profile_argument(parser)
     args = parser.parse_args()
 
     out_diff = args.out_diff or (ROOT / "analysis" / "scan-2026-01-24" / "manual-sheet-review-diff.md")
     out_fix = args.out_fix or (ROOT / "analysis" / "scan-2026-01-24" / "manual-sheet-review-fixlist.md")
-    return run_review(out_diff, out_fix)
+    with profiling(args, out_diff.parent, "manual_sheet_review"):
+        return run_review(out_diff, out_fix)
 
 
 if __name__ == "__main__":
@@ -5,32 +5,205 @@ Re-scan conflict mineral Excel templates and emit rule catalogs / summaries.
 
 Outputs are written to analysis/scan-YYYY-MM-DD/* and follow the legacy CSV/TSV schema:
 - {template}_rule_catalog_{formulas|dv|cf}.csv
+- {template}_rule_catalog_dv.bin and xml-cf-report.bin: the DV catalog and the
+  xml-cf-report.jsonl records in the indexed binary format of scan_records.py
 - {template}_rules_summary.csv
+- scan-warehouse.sqlite: catalogs, xml-cf-report rules, sheet states and diff summaries
+  as indexed SQLite tables (see scan_warehouse.py); --no-warehouse skips it
 - {template}_sheet_list.csv
 - {template}_sheet_diff_summary.csv
+- {template}_version_diff_{pairs|matrix}.csv with --diff-mode adjacent|all-pairs
+- sheet-fingerprints.json (per-sheet digest, formulas/dv/cf and row-block hashes)
+- scan-timings.json with --timings (see scan_timings.py)
+- scan-memprofile.json with --memprofile (see scan_memory.py)
+- scan-events.jsonl with --events (per-workbook/per-sheet events; see scan_events.py)
+- run_scan-{cprofile|stats}.pstats and -top.txt with --profile (see scan_profile.py)
 - cross_template_{sheet_presence|metrics_baseline|diff_highlights|diff_report}.csv
 - per-sheet TSVs in analysis_{template}_{sheet}/{version}.{formulas|dv|cf}.tsv
+  (or, with --tsv-archive, one indexed sheet-tsv.pack; see scan_archive.py)
+
+Extraction engines (--engine):
+- openpyxl: full object model via openpyxl.load_workbook (default)
+- raw: streams each worksheet part with iterparse and emits the same records
+
+Each workbook is read once through xlsx_package.WorkbookPackage; cfExt detection, the
+engine and the xml-cf-report records all share that package. The xml-cf reports run
+at the end (xml_cf_doc_compare, xml_cf_range_diff) get those records in memory through a
+scan_artifacts.ScanArtifacts instead of reading them back; DV catalog rows come from the
+.bin twins written during the scan.
+
+Extracted workbooks are cached in analysis/.scan-cache/ keyed by the SHA-256 of the
+xlsx and the engine (xml-cf-report records included), so only new or modified template
+files are parsed again (--no-cache to bypass); an --engine raw run never gets openpyxl
+results and vice versa.
+
+With --dedup every output file is then hardlinked into the content-addressed store
+analysis/.scan-objects/ (see scan_store.py), so files identical to an earlier scan's
+take no extra space; shared files in OUT_ROOT are copied apart before a run writes.
+
+With --watch the script keeps polling app/templates/<TEMPLATE>/ after the scan and, for
+each added, modified or removed versioned xlsx, rewrites only that template's outputs,
+the cross-template files and the xml-cf reports.
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import dataclasses
 import datetime as dt
+import gzip
+import hashlib
+import json
+import os
 import re
+import time
 import zipfile
 from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import IO, Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
 import xml.etree.ElementTree as ET
 
 import openpyxl
+from openpyxl.formula.translate import Translator
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+from openpyxl.worksheet.cell_range import MultiCellRange
+from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
+
+try:
+    from analysis import xml_cf_report
+    from analysis.scan_archive import ARCHIVE_NAME, TsvArchiveWriter
+    from analysis.scan_artifacts import ScanArtifacts
+    from analysis.scan_events import (
+        EventLog,
+        add_events_argument,
+        event_log_from_args,
+        format_summary,
+    )
+    from analysis.scan_memory import MemoryProfiler, add_memprofile_argument, profiler_from_args
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_records import CsvRecordTee, RecordWriter, binary_path, iter_records
+    from analysis.scan_store import STORE_ROOT, ObjectStore, unshare_tree
+    from analysis.scan_timings import PhaseTimer
+    from analysis.scan_warehouse import TEMPLATE_TABLES, TableTee, WarehouseWriter, warehouse_path
+    from analysis.sheet_fingerprint import (
+        SheetFingerprint,
+        build_fingerprint,
+        changed_blocks,
+        split_row_blocks,
+        write_fingerprints,
+    )
+    from analysis.xlsx_package import WorkbookPackage
+except ImportError:
+    import xml_cf_report
+    from scan_archive import ARCHIVE_NAME, TsvArchiveWriter
+    from scan_artifacts import ScanArtifacts
+    from scan_events import (
+        EventLog,
+        add_events_argument,
+        event_log_from_args,
+        format_summary,
+    )
+    from scan_memory import MemoryProfiler, add_memprofile_argument, profiler_from_args
+    from scan_profile import add_profile_argument, profiling
+    from scan_records import CsvRecordTee, RecordWriter, binary_path, iter_records
+    from scan_store import STORE_ROOT, ObjectStore, unshare_tree
+    from scan_timings import PhaseTimer
+    from scan_warehouse import TEMPLATE_TABLES, TableTee, WarehouseWriter, warehouse_path
+    from sheet_fingerprint import (
+        SheetFingerprint,
+        build_fingerprint,
+        changed_blocks,
+        split_row_blocks,
+        write_fingerprints,
+    )
+    from xlsx_package import WorkbookPackage
 
 ROOT = Path(__file__).resolve().parents[1]
 TEMPLATE_ROOT = ROOT / "app" / "templates"
 DATE_TAG = dt.date.today().isoformat()
 OUT_ROOT = ROOT / "analysis" / f"scan-{DATE_TAG}"
+CACHE_ROOT = ROOT / "analysis" / ".scan-cache"
+# bump when the extracted record shape changes so stale cache entries are ignored
+CACHE_FORMAT = 2
 VERSION_RE = re.compile(r"_(\d+(?:\.\d+)*)$")
+ENGINES = ("openpyxl", "raw")
+WATCH_INTERVAL_S = 1.0
+DV_CATALOG_HEADER = [
+    "version",
+    "sheet",
+    "sqref",
+    "type",
+    "operator",
+    "allowBlank",
+    "showErrorMessage",
+    "showInputMessage",
+    "errorTitle",
+    "error",
+    "promptTitle",
+    "prompt",
+    "formula1",
+    "formula2",
+]
+CF_CATALOG_HEADER = [
+    "version",
+    "sheet",
+    "sqref",
+    "type",
+    "operator",
+    "priority",
+    "dxfId",
+    "formulas",
+]
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+TAG_SHEET_DATA = f"{{{NS_MAIN}}}sheetData"
+TAG_ROW = f"{{{NS_MAIN}}}row"
+TAG_CELL = f"{{{NS_MAIN}}}c"
+TAG_VALUE = f"{{{NS_MAIN}}}v"
+TAG_FORMULA = f"{{{NS_MAIN}}}f"
+TAG_INLINE_STR = f"{{{NS_MAIN}}}is"
+TAG_TEXT = f"{{{NS_MAIN}}}t"
+TAG_RUN = f"{{{NS_MAIN}}}r"
+TAG_SI = f"{{{NS_MAIN}}}si"
+TAG_MERGE_CELL = f"{{{NS_MAIN}}}mergeCell"
+TAG_DATA_VALIDATION = f"{{{NS_MAIN}}}dataValidation"
+TAG_CONDITIONAL_FORMATTING = f"{{{NS_MAIN}}}conditionalFormatting"
+TAG_CF_RULE = f"{{{NS_MAIN}}}cfRule"
+TAG_CF_FORMULA = f"{{{NS_MAIN}}}formula"
+CF_EXTENSION_MARKERS = (b"x14:conditionalFormatting", b"cx:conditionalFormatting")
+CF_EXTENSION_CHUNK = 1 << 16
+CF_EXTENSION_TAIL = max(map(len, CF_EXTENSION_MARKERS)) - 1
+
+
+@dataclass
+class WorkbookScan:
+    template: str
+    version: str
+    formulas: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    dvs: Dict[str, List[Dict[str, str]]] = field(default_factory=dict)
+    cfs: Dict[str, List[Dict[str, str]]] = field(default_factory=dict)
+    sheet_states: Dict[str, str] = field(default_factory=dict)
+    cf_extension_sheets: List[str] = field(default_factory=list)
+    xml_cf_records: Optional[List[Dict[str, object]]] = None
+    # per-phase timings / memory stages, wall time and inflated sheet sizes of this
+    # extraction run; never cached
+    timings: Dict[str, Dict[str, float]] = field(default_factory=dict, compare=False)
+    memory: Dict[str, Dict[str, object]] = field(default_factory=dict, compare=False)
+    extract_s: float = field(default=0.0, compare=False)
+    inflated: Dict[str, int] = field(default_factory=dict, compare=False)
+    # served from ScanCache instead of being extracted
+    cached: bool = field(default=False, compare=False)
+
+    @property
+    def cell_count(self) -> int:
+        return sum(map(len, self.formulas.values()))
+
+    @property
+    def rule_count(self) -> int:
+        return sum(map(len, self.dvs.values())) + sum(map(len, self.cfs.values()))
 
 
 def sanitize_sheet(name: str) -> str:
@@ -57,39 +230,45 @@ def parse_version(path: Path) -> Tuple[str, Tuple[int, ...]]:
 def contains_cf_extension(xml_bytes: bytes) -> bool:
     if b"extLst" not in xml_bytes:
         return False
-    return b"x14:conditionalFormatting" in xml_bytes or b"cx:conditionalFormatting" in xml_bytes
-
-
-def build_sheet_xml_map(xlsx_path: Path) -> Dict[str, str]:
-    sheet_map: Dict[str, str] = {}
-    ns_main = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
-    ns_r = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
-    ns_pkg = "http://schemas.openxmlformats.org/package/2006/relationships"
-    with zipfile.ZipFile(xlsx_path) as z:
-        wb = ET.fromstring(z.read("xl/workbook.xml"))
-        rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
-        rid_map = {
-            rel.get("Id"): rel.get("Target")
-            for rel in rels.findall(f"{{{ns_pkg}}}Relationship")
-        }
-        for sheet in wb.findall(f"{{{ns_main}}}sheets/{{{ns_main}}}sheet"):
-            name = sheet.get("name") or ""
-            rid = sheet.get(f"{{{ns_r}}}id")
-            target = rid_map.get(rid or "")
-            if name and target:
-                sheet_map[name] = f"xl/{target}"
-    return sheet_map
-
-
-def detect_cf_extensions(xlsx_path: Path) -> List[str]:
+    return any(marker in xml_bytes for marker in CF_EXTENSION_MARKERS)
+
+
+def stream_contains_cf_extension(stream: IO[bytes]) -> Tuple[bool, int]:
+    """contains_cf_extension over a sheet stream, chunk by chunk; also the bytes read.
+
+    Reading stops as soon as both markers were seen, and nothing is kept but a short
+    tail, so a marker split across two chunks is still found.
+    """
+    seen_ext_lst = seen_cf = False
+    tail = b""
+    read = 0
+    for chunk in iter(lambda: stream.read(CF_EXTENSION_CHUNK), b""):
+        read += len(chunk)
+        window = tail + chunk
+        seen_ext_lst = seen_ext_lst or b"extLst" in window
+        seen_cf = seen_cf or any(marker in window for marker in CF_EXTENSION_MARKERS)
+        if seen_ext_lst and seen_cf:
+            return True, read
+        tail = window[-CF_EXTENSION_TAIL:]
+    return False, read
+
+
+def detect_cf_extensions(
+    source: Union[Path, WorkbookPackage], counters: Optional[Dict[str, int]] = None
+) -> List[str]:
+    """Sheets with cfExt rules; counters["bytes_read"] gets the inflated bytes scanned."""
     sheets = []
     try:
-        sheet_map = build_sheet_xml_map(xlsx_path)
-        with zipfile.ZipFile(xlsx_path) as z:
-            for sheet_name, xml_path in sheet_map.items():
-                xml_bytes = z.read(xml_path)
-                if contains_cf_extension(xml_bytes):
-                    sheets.append(sheet_name)
+        if not isinstance(source, WorkbookPackage):
+            with WorkbookPackage(source) as package:
+                return detect_cf_extensions(package, counters)
+        for sheet_name in source.sheet_map:
+            with source.sheet_stream(sheet_name) as stream:
+                found, read = stream_contains_cf_extension(stream)
+            if counters is not None:
+                counters["bytes_read"] += read
+            if found:
+                sheets.append(sheet_name)
     except (KeyError, zipfile.BadZipFile, ET.ParseError):
         return sheets
     return sheets
@@ -99,6 +278,11 @@ def iter_formula_cells(ws) -> Dict[str, str]:
     formulas: Dict[str, str] = {}
     for cell in ws._cells.values():
         val = cell.value
+        if isinstance(val, ArrayFormula):
+            val = val.text
+        elif isinstance(val, DataTableFormula):
+            # openpyxl keeps only the attributes of a data-table formula, not its text
+            val = "="
         if cell.data_type == "f":
             formula = str(val or "")
         elif isinstance(val, str) and val.startswith("="):
@@ -155,12 +339,399 @@ def iter_conditional_formats(ws) -> List[Dict[str, str]]:
     return items
 
 
+def _xml_bool(value: Optional[str]) -> str:
+    if value is None or value in ("false", "f", "0"):
+        return "0"
+    return "1"
+
+
+def _xml_int(value: Optional[str]) -> str:
+    try:
+        return str(int(value)) if value is not None else "None"
+    except ValueError:
+        return value
+
+
+def _sqref_text(sqref: str) -> str:
+    # normalise the way openpyxl's MultiCellRange prints (ranges sorted by column, then row)
+    return str(MultiCellRange(sqref))
+
+
+def _element_text(node: ET.Element) -> str:
+    # plain text of a shared/inline string: direct <t> plus rich-text runs, without phonetics
+    parts = [node.findtext(TAG_TEXT) or ""]
+    parts.extend(run.findtext(TAG_TEXT) or "" for run in node.findall(TAG_RUN))
+    return "".join(parts)
+
+
+def read_formula_like_strings(package: WorkbookPackage) -> Dict[int, str]:
+    """Shared strings that start with '=' keyed by index; the rest are never formulas."""
+    strings: Dict[int, str] = {}
+    if not package.has_member("xl/sharedStrings.xml"):
+        return strings
+    with package.open_member("xl/sharedStrings.xml") as fh:
+        idx = 0
+        for _, node in ET.iterparse(fh):
+            if node.tag != TAG_SI:
+                continue
+            text = _element_text(node).replace("x005F_", "")
+            if text.startswith("="):
+                strings[idx] = text
+            idx += 1
+            node.clear()
+    return strings
+
+
+def _drop_merged_cells(formulas: Dict[str, str], merged_refs: List[str]) -> None:
+    # openpyxl replaces every merged cell except the top-left one with an empty MergedCell
+    for ref in merged_refs:
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        anchor = f"{get_column_letter(min_col)}{min_row}"
+        if (max_row - min_row + 1) * (max_col - min_col + 1) <= len(formulas):
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    coord = f"{get_column_letter(col)}{row}"
+                    if coord != anchor:
+                        formulas.pop(coord, None)
+        else:
+            for coord in list(formulas):
+                row, col = coordinate_to_tuple(coord)
+                if min_row <= row <= max_row and min_col <= col <= max_col and coord != anchor:
+                    del formulas[coord]
+
+
+def _raw_formula(cell: ET.Element, f: ET.Element, shared: Dict[str, Translator]) -> str:
+    value = "=" + (f.text or "")
+    kind = f.get("t")
+    if kind == "shared":
+        idx = f.get("si")
+        if idx in shared:
+            value = shared[idx].translate_formula(cell.get("r"))
+        elif value != "=":
+            shared[idx] = Translator(value, cell.get("r"))
+    elif kind == "dataTable":
+        value = "="
+    return value[1:] if value.startswith("=") else value
+
+
+def _raw_string_value(cell: ET.Element, strings: Dict[int, str]) -> str:
+    kind = cell.get("t")
+    if kind == "s":
+        value = cell.findtext(TAG_VALUE)
+        return strings.get(int(value), "") if value else ""
+    if kind == "str":
+        return cell.findtext(TAG_VALUE) or ""
+    if kind == "inlineStr":
+        node = cell.find(TAG_INLINE_STR)
+        return _element_text(node) if node is not None else ""
+    return ""
+
+
+def _raw_data_validation(node: ET.Element) -> Dict[str, str]:
+    dv_type = node.get("type") or ""
+    return {
+        "sqref": _sqref_text(node.get("sqref", "")),
+        "type": "" if dv_type == "none" else dv_type,
+        "operator": node.get("operator") or "",
+        "allowBlank": _xml_bool(node.get("allowBlank")),
+        "showErrorMessage": _xml_bool(node.get("showErrorMessage")),
+        "showInputMessage": _xml_bool(node.get("showInputMessage")),
+        "errorTitle": node.get("errorTitle") or "",
+        "error": node.get("error") or "",
+        "promptTitle": node.get("promptTitle") or "",
+        "prompt": node.get("prompt") or "",
+        "formula1": node.findtext(f"{{{NS_MAIN}}}formula1") or "",
+        "formula2": node.findtext(f"{{{NS_MAIN}}}formula2") or "",
+    }
+
+
+def iter_sheet_xml_raw(
+    xml_stream: IO[bytes], strings: Dict[int, str]
+) -> Tuple[Dict[str, str], List[Dict[str, str]], List[Dict[str, str]]]:
+    """Stream one worksheet part and return (formulas, dvs, cfs) like the openpyxl path.
+
+    Each <c> is dropped as soon as it has been read and finished rows are removed from
+    <sheetData>, so memory follows the rule count rather than the cell count.
+    """
+    formulas: Dict[str, str] = {}
+    dvs: List[Dict[str, str]] = []
+    cf_rules: Dict[str, List[ET.Element]] = {}
+    merged_refs: List[str] = []
+    shared: Dict[str, Translator] = {}
+    sheet_data: Optional[ET.Element] = None
+    row_idx = 0
+    last_ref: Optional[str] = None
+    for event, node in ET.iterparse(xml_stream, events=("start", "end")):
+        tag = node.tag
+        if event == "start":
+            if tag == TAG_ROW:
+                row_idx = int(node.get("r") or row_idx + 1)
+                last_ref = None
+            elif tag == TAG_SHEET_DATA:
+                sheet_data = node
+            continue
+        if tag == TAG_CELL:
+            ref = node.get("r")
+            if ref is None:
+                # cells without r follow the previous cell in the row, as openpyxl counts them
+                col_idx = coordinate_to_tuple(last_ref)[1] if last_ref else 0
+                ref = f"{get_column_letter(col_idx + 1)}{row_idx}"
+                node.set("r", ref)
+            last_ref = ref
+            f = node.find(TAG_FORMULA)
+            if f is not None:
+                formulas[ref] = _raw_formula(node, f, shared)
+            elif node.get("t") in ("s", "str", "inlineStr"):
+                value = _raw_string_value(node, strings)
+                if value.startswith("="):
+                    formula = value[1:]
+                    formulas[ref] = formula[1:] if formula.startswith("=") else formula
+            node.clear()
+        elif tag == TAG_ROW:
+            if sheet_data is not None:
+                sheet_data.clear()
+        elif tag == TAG_MERGE_CELL:
+            if node.get("ref"):
+                merged_refs.append(node.get("ref"))
+        elif tag == TAG_DATA_VALIDATION:
+            dvs.append(_raw_data_validation(node))
+        elif tag == TAG_CONDITIONAL_FORMATTING:
+            rules = [rule for rule in node if rule.tag == TAG_CF_RULE]
+            cf_rules.setdefault(_sqref_text(node.get("sqref", "")), []).extend(rules)
+    _drop_merged_cells(formulas, merged_refs)
+
+    cfs: List[Dict[str, str]] = []
+    max_priority = 0
+    for sqref, rules in cf_rules.items():
+        for rule in rules:
+            max_priority += 1
+            priority = _xml_int(rule.get("priority"))
+            if priority in ("None", "0"):
+                priority = str(max_priority)
+            cfs.append(
+                {
+                    "sqref": f"<ConditionalFormatting {sqref}>",
+                    "type": rule.get("type") or "",
+                    "operator": rule.get("operator") or "",
+                    "priority": priority,
+                    "dxfId": _xml_int(rule.get("dxfId")),
+                    "formulas": "|".join(
+                        child.text or "" for child in rule if child.tag == TAG_CF_FORMULA
+                    ),
+                }
+            )
+    return formulas, dvs, cfs
+
+
+def extract_raw(package: WorkbookPackage, scan: WorkbookScan) -> None:
+    strings = read_formula_like_strings(package)
+    for sheet in package.worksheets:
+        sheet_name = sheet["name"]
+        scan.sheet_states[sheet_name] = sheet["state"]
+        with package.sheet_stream(sheet_name) as fh:
+            formulas, dvs, cfs = iter_sheet_xml_raw(fh, strings)
+        scan.formulas[sheet_name] = formulas
+        scan.dvs[sheet_name] = dvs
+        scan.cfs[sheet_name] = cfs
+
+
+def extract_openpyxl(package: WorkbookPackage, scan: WorkbookScan, timer: PhaseTimer) -> None:
+    with timer.phase("load_workbook") as counters:
+        wb = openpyxl.load_workbook(package.file_stream(), data_only=False, read_only=False)
+        counters["bytes_read"] = len(package.data)
+    for ws in wb.worksheets:
+        sheet_name = ws.title
+        scan.sheet_states[sheet_name] = ws.sheet_state
+        scan.formulas[sheet_name] = iter_formula_cells(ws)
+        scan.dvs[sheet_name] = iter_data_validations(ws)
+        scan.cfs[sheet_name] = iter_conditional_formats(ws)
+
+
+def scan_workbook(
+    template: str,
+    version: str,
+    file_path: Path,
+    engine: str = "openpyxl",
+    xml_cf: bool = False,
+    memprofile_top: Optional[int] = None,
+) -> WorkbookScan:
+    """Extract one workbook from a single WorkbookPackage.
+
+    The package is shared by cfExt detection, the extraction engine and, with xml_cf,
+    the xml_cf_report records, so the zip is opened and each sheet inflated once.
+    With memprofile_top set, every phase is also traced as a scan_memory stage keeping
+    that many allocation sites.
+    """
+    started = time.perf_counter()
+    scan = WorkbookScan(template=template, version=version)
+    memory = MemoryProfiler(enabled=memprofile_top is not None, top=memprofile_top or 0)
+    timer = PhaseTimer(memory)
+    with timer.phase("read_package") as counters:
+        package = WorkbookPackage(file_path)
+        counters["bytes_read"] = len(package.data)
+    with package:
+        with timer.phase("detect_cf_extensions") as counters:
+            scan.cf_extension_sheets = detect_cf_extensions(package, counters)
+        scan.inflated = {sheet: package.sheet_size(sheet) for sheet in package.sheet_map}
+        with timer.phase(f"extract_{engine}") as counters:
+            if engine == "raw":
+                extract_raw(package, scan)
+            else:
+                extract_openpyxl(package, scan, timer)
+            counters["cells"], counters["rules"] = scan.cell_count, scan.rule_count
+        if xml_cf:
+            with timer.phase("xml_cf_collect") as counters:
+                scan.xml_cf_records = xml_cf_report.collect_workbook_cf(package, template, version)
+                counters["rules"] = len(scan.xml_cf_records)
+    scan.timings = timer.workbook_phases()
+    scan.memory = memory.workbook_stages()
+    memory.close()
+    scan.extract_s = time.perf_counter() - started
+    return scan
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ScanCache:
+    """Extracted WorkbookScan payloads keyed by the SHA-256 of the xlsx bytes and engine."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, digest: str, engine: str = "openpyxl") -> Path:
+        return self.root / digest[:2] / f"{digest}.{engine}.v{CACHE_FORMAT}.json.gz"
+
+    def load(
+        self,
+        digest: str,
+        template: str,
+        version: str,
+        xml_cf: bool = False,
+        engine: str = "openpyxl",
+    ) -> Optional[WorkbookScan]:
+        path = self.entry_path(digest, engine)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            payload = None
+        if payload is None or (xml_cf and payload.get("xml_cf_records") is None):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return WorkbookScan(template=template, version=version, cached=True, **payload)
+
+    def store(self, digest: str, scan: WorkbookScan, engine: str = "openpyxl") -> None:
+        path = self.entry_path(digest, engine)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = dataclasses.asdict(scan)
+        for key in ("template", "version", "timings", "memory", "extract_s", "inflated", "cached"):
+            del payload[key]
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=1) as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def scan_templates(
+    templates: Dict[str, List[Tuple[str, Path]]],
+    jobs: int = 1,
+    engine: str = "openpyxl",
+    cache: Optional[ScanCache] = None,
+    xml_cf: bool = False,
+    timer: Optional[PhaseTimer] = None,
+    memprofile_top: Optional[int] = None,
+) -> Iterator[WorkbookScan]:
+    """Yield one WorkbookScan per (template, version) in load_templates order.
+
+    With jobs > 1 the workbooks are parsed in a process pool; results are still
+    yielded in submission order so callers see the same sequence as a serial run.
+    With a cache, workbooks whose bytes were scanned before are not parsed again.
+    """
+    tasks = [
+        (template, version, file_path)
+        for template, version_files in templates.items()
+        for version, file_path in version_files
+    ]
+    digests: List[str] = []
+    cached: List[Optional[WorkbookScan]] = [None] * len(tasks)
+    if cache is not None:
+        with (timer or PhaseTimer()).phase("cache_lookup") as counters:
+            digests = [file_sha256(file_path) for _, _, file_path in tasks]
+            cached = [
+                cache.load(digest, *task[:2], xml_cf, engine)
+                for digest, task in zip(digests, tasks)
+            ]
+            counters["bytes_read"] = sum(file_path.stat().st_size for _, _, file_path in tasks)
+    misses = [task for task, hit in zip(tasks, cached) if hit is None]
+
+    if jobs <= 1 or len(misses) <= 1:
+        parsed = (
+            scan_workbook(*task, engine=engine, xml_cf=xml_cf, memprofile_top=memprofile_top)
+            for task in misses
+        )
+        yield from _merge_cached(cached, digests, parsed, cache, engine)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(misses))) as pool:
+        parsed = pool.map(
+            scan_workbook,
+            *zip(*misses),
+            [engine] * len(misses),
+            [xml_cf] * len(misses),
+            [memprofile_top] * len(misses),
+        )
+        yield from _merge_cached(cached, digests, parsed, cache, engine)
+
+
+def _merge_cached(
+    cached: List[Optional[WorkbookScan]],
+    digests: List[str],
+    parsed: Iterator[WorkbookScan],
+    cache: Optional[ScanCache],
+    engine: str,
+) -> Iterator[WorkbookScan]:
+    for idx, hit in enumerate(cached):
+        if hit is not None:
+            yield hit
+            continue
+        scan = next(parsed)
+        if cache is not None:
+            cache.store(digests[idx], scan, engine)
+        yield scan
+
+
+def format_tsv(rows: Iterable[Iterable[str]]) -> str:
+    return "".join("\t".join(map(str, row)) + "\n" for row in rows)
+
+
 def write_tsv(path: Path, rows: Iterable[Iterable[str]]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", encoding="utf-8", newline="") as f:
-        for row in rows:
-            f.write("\t".join(map(str, row)))
-            f.write("\n")
+        f.write(format_tsv(rows))
+
+
+def write_sheet_tsv(
+    archive: Optional[TsvArchiveWriter],
+    template: str,
+    sheet_name: str,
+    version: str,
+    kind: str,
+    rows: Iterable[Iterable[str]],
+) -> None:
+    rel_path = f"analysis_{template.lower()}_{sanitize_sheet(sheet_name)}/{version}.{kind}.tsv"
+    if archive is None:
+        write_tsv(OUT_ROOT / rel_path, rows)
+    else:
+        data = format_tsv(rows).encode("utf-8")
+        archive.add(template, sheet_name, version, kind, rel_path, data)
 
 
 def write_csv(path: Path, header: List[str], rows: Iterable[Iterable[str]]) -> None:
@@ -171,6 +742,16 @@ def write_csv(path: Path, header: List[str], rows: Iterable[Iterable[str]]) -> N
         writer.writerows(rows)
 
 
+@contextmanager
+def csv_writer(path: Path, header: List[str]) -> Iterator[Any]:
+    """Open a CSV for incremental writes; rows go to disk as each workbook is processed."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        yield writer
+
+
 def load_templates() -> Dict[str, List[Tuple[str, Path]]]:
     templates: Dict[str, List[Tuple[str, Path]]] = {}
     for folder in TEMPLATE_ROOT.iterdir():
@@ -186,356 +767,553 @@ def load_templates() -> Dict[str, List[Tuple[str, Path]]]:
     return templates
 
 
-def build_diff_summary(
-    baseline_formulas: Dict[str, Dict[str, str]],
-    baseline_dv: Dict[str, List[Dict[str, str]]],
-    baseline_cf: Dict[str, List[Dict[str, str]]],
-    current_formulas: Dict[str, Dict[str, str]],
-    current_dv: Dict[str, List[Dict[str, str]]],
-    current_cf: Dict[str, List[Dict[str, str]]],
-) -> Dict[str, Dict[str, int]]:
-    summary: Dict[str, Dict[str, int]] = {}
-    sheets = set(baseline_formulas.keys()) | set(current_formulas.keys())
-    for sheet in sheets:
-        base_cells = baseline_formulas.get(sheet, {})
-        curr_cells = current_formulas.get(sheet, {})
-
-        base_keys = set(base_cells.keys())
-        curr_keys = set(curr_cells.keys())
-
-        formula_added = len(curr_keys - base_keys)
-        formula_removed = len(base_keys - curr_keys)
-
-        changed = 0
-        for cell in base_keys & curr_keys:
-            if base_cells[cell] != curr_cells[cell]:
-                changed += 1
-
-        base_dv_set = {
-            (
-                dv["sqref"],
-                dv["type"],
-                dv["operator"],
-                dv["formula1"],
-                dv["formula2"],
-            )
-            for dv in baseline_dv.get(sheet, [])
-        }
-        curr_dv_set = {
-            (
-                dv["sqref"],
-                dv["type"],
-                dv["operator"],
-                dv["formula1"],
-                dv["formula2"],
-            )
-            for dv in current_dv.get(sheet, [])
-        }
-        dv_added = len(curr_dv_set - base_dv_set)
-        dv_removed = len(base_dv_set - curr_dv_set)
+DvKey = Tuple[str, str, str, str, str]
+CfKey = Tuple[str, str, str, str]
 
-        base_cf_set = {
-            (cf["sqref"], cf["type"], cf["operator"], cf["formulas"])
-            for cf in baseline_cf.get(sheet, [])
-        }
-        curr_cf_set = {
-            (cf["sqref"], cf["type"], cf["operator"], cf["formulas"])
-            for cf in current_cf.get(sheet, [])
-        }
-        cf_added = len(curr_cf_set - base_cf_set)
-        cf_removed = len(base_cf_set - curr_cf_set)
-
-        summary[sheet] = {
-            "formula_added": formula_added,
-            "formula_removed": formula_removed,
-            "formula_changed": changed,
-            "dv_added": dv_added,
-            "dv_removed": dv_removed,
-            "cf_added": cf_added,
-            "cf_removed": cf_removed,
-        }
-    return summary
 
+def dv_key(dv: Dict[str, str]) -> DvKey:
+    return (dv["sqref"], dv["type"], dv["operator"], dv["formula1"], dv["formula2"])
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Scan Excel templates and emit rule catalogs.")
-    parser.add_argument(
-        "--skip-xml-cf",
-        action="store_true",
-        help="Skip XML conditional formatting report (cfExt-aware).",
-    )
-    return parser.parse_args()
 
+def cf_key(cf: Dict[str, str]) -> CfKey:
+    return (cf["sqref"], cf["type"], cf["operator"], cf["formulas"])
 
-def main() -> None:
-    args = parse_args()
-    OUT_ROOT.mkdir(parents=True, exist_ok=True)
-    templates = load_templates()
 
-    baseline_versions: Dict[str, str] = {}
-    baseline_metrics: Dict[str, Dict[str, Dict[str, int]]] = {}
-    baseline_states: Dict[str, Dict[str, str]] = {}
+@dataclass(frozen=True, eq=False)
+class SheetIndex:
+    """Per-version sheet index: formulas split by row block, hashed DV/CF keys, fingerprint."""
 
-    for template, version_files in templates.items():
-        if not version_files:
-            continue
-        baseline_version = version_files[-1][0]
-        baseline_versions[template] = baseline_version
+    blocks: Dict[int, Dict[str, str]]
+    dv_keys: FrozenSet[DvKey]
+    cf_keys: FrozenSet[CfKey]
+    fingerprint: SheetFingerprint
 
-        # storage per version
-        formulas_by_version: Dict[str, Dict[str, Dict[str, str]]] = {}
-        dv_by_version: Dict[str, Dict[str, List[Dict[str, str]]]] = {}
-        cf_by_version: Dict[str, Dict[str, List[Dict[str, str]]]] = {}
-        sheet_states: Dict[str, Dict[str, str]] = {}
+    @classmethod
+    def build(
+        cls,
+        formulas: Dict[str, str],
+        dvs: List[Dict[str, str]],
+        cfs: List[Dict[str, str]],
+    ) -> "SheetIndex":
+        blocks = split_row_blocks(formulas)
+        dv_keys = frozenset(map(dv_key, dvs))
+        cf_keys = frozenset(map(cf_key, cfs))
+        fingerprint = build_fingerprint(blocks, "formulas", {"dv": dv_keys, "cf": cf_keys})
+        return cls(blocks, dv_keys, cf_keys, fingerprint)
 
-        # rule catalogs
-        dv_catalog_rows = []
-        cf_catalog_rows = []
-        formula_catalog_rows = []
 
-        # rules summary counts
-        summary_counts = defaultdict(lambda: defaultdict(dict))
+VersionIndex = Dict[str, SheetIndex]
 
-        cf_extension_rows = []
-        for version, file_path in version_files:
-            wb = openpyxl.load_workbook(file_path, data_only=False, read_only=False)
-            for sheet_name in detect_cf_extensions(file_path):
-                cf_extension_rows.append(
-                    [template, version, sheet_name, "cf_extension_detected"]
-                )
-            formulas_by_sheet: Dict[str, Dict[str, str]] = {}
-            dv_by_sheet: Dict[str, List[Dict[str, str]]] = {}
-            cf_by_sheet: Dict[str, List[Dict[str, str]]] = {}
-            sheet_states_version: Dict[str, str] = {}
-
-            for ws in wb.worksheets:
-                sheet_name = ws.title
-                sheet_states_version[sheet_name] = ws.sheet_state
-
-                formulas = iter_formula_cells(ws)
-                dvs = iter_data_validations(ws)
-                cfs = iter_conditional_formats(ws)
-
-                formulas_by_sheet[sheet_name] = formulas
-                dv_by_sheet[sheet_name] = dvs
-                cf_by_sheet[sheet_name] = cfs
-
-                # per-sheet TSV
-                dir_name = f"analysis_{template.lower()}_{sanitize_sheet(sheet_name)}"
-                sheet_dir = OUT_ROOT / dir_name
-                write_tsv(
-                    sheet_dir / f"{version}.formulas.tsv",
-                    [[cell, formula] for cell, formula in formulas.items()],
-                )
-                write_tsv(
-                    sheet_dir / f"{version}.dv.tsv",
-                    [
-                        [
-                            dv["type"],
-                            dv["operator"],
-                            dv["allowBlank"],
-                            dv["showErrorMessage"],
-                            dv["showInputMessage"],
-                            dv["errorTitle"],
-                            dv["error"],
-                            dv["promptTitle"],
-                            dv["prompt"],
-                            dv["formula1"],
-                            dv["formula2"],
-                            dv["sqref"],
-                        ]
-                        for dv in dvs
-                    ],
-                )
-                write_tsv(
-                    sheet_dir / f"{version}.cf.tsv",
-                    [
-                        [
-                            cf["sqref"],
-                            cf["type"],
-                            cf["operator"],
-                            cf["dxfId"],
-                            cf["formulas"],
-                        ]
-                        for cf in cfs
-                    ],
-                )
+EMPTY_SHEET = SheetIndex.build({}, [], [])
+DIFF_FIELDS = [
+    "formula_added",
+    "formula_removed",
+    "formula_changed",
+    "dv_added",
+    "dv_removed",
+    "cf_added",
+    "cf_removed",
+]
+NO_CHANGES = dict.fromkeys(DIFF_FIELDS, 0)
+DIFF_MODES = ("baseline", "adjacent", "all-pairs")
+
+
+def index_version(
+    formulas: Dict[str, Dict[str, str]],
+    dvs: Dict[str, List[Dict[str, str]]],
+    cfs: Dict[str, List[Dict[str, str]]],
+) -> VersionIndex:
+    return {
+        sheet: SheetIndex.build(cells, dvs.get(sheet, []), cfs.get(sheet, []))
+        for sheet, cells in formulas.items()
+    }
+
+
+class DiffEngine:
+    """Diff any number of indexed versions against one indexed baseline."""
+
+    def __init__(self, baseline: VersionIndex) -> None:
+        self.baseline = baseline
 
-                # catalog rows
-                formula_catalog_rows.extend(
-                    [[version, sheet_name, cell, formula] for cell, formula in formulas.items()]
+    def diff(self, current: VersionIndex) -> Dict[str, Dict[str, int]]:
+        if current is self.baseline:
+            return {sheet: dict(NO_CHANGES) for sheet in self.baseline}
+        summary: Dict[str, Dict[str, int]] = {}
+        sheets = list(self.baseline)
+        sheets.extend(sheet for sheet in current if sheet not in self.baseline)
+        for sheet in sheets:
+            summary[sheet] = self.diff_sheet(
+                self.baseline.get(sheet, EMPTY_SHEET), current.get(sheet, EMPTY_SHEET)
+            )
+        return summary
+
+    @staticmethod
+    def diff_sheet(base: SheetIndex, curr: SheetIndex) -> Dict[str, int]:
+        counts = dict(NO_CHANGES)
+        base_fp, curr_fp = base.fingerprint, curr.fingerprint
+        if base_fp.digest == curr_fp.digest:
+            return counts
+        if base_fp.kinds["formulas"] != curr_fp.kinds["formulas"]:
+            for block in changed_blocks(base_fp, curr_fp):
+                base_cells = base.blocks.get(block, {})
+                curr_cells = curr.blocks.get(block, {})
+                shared = base_cells.keys() & curr_cells.keys()
+                counts["formula_added"] += len(curr_cells) - len(shared)
+                counts["formula_removed"] += len(base_cells) - len(shared)
+                counts["formula_changed"] += sum(
+                    1 for cell in shared if base_cells[cell] != curr_cells[cell]
                 )
-                dv_catalog_rows.extend(
+        if base_fp.kinds["dv"] != curr_fp.kinds["dv"]:
+            counts["dv_added"] = len(curr.dv_keys - base.dv_keys)
+            counts["dv_removed"] = len(base.dv_keys - curr.dv_keys)
+        if base_fp.kinds["cf"] != curr_fp.kinds["cf"]:
+            counts["cf_added"] = len(curr.cf_keys - base.cf_keys)
+            counts["cf_removed"] = len(base.cf_keys - curr.cf_keys)
+        return counts
+
+
+def build_diff_summary(
+    baseline_formulas: Dict[str, Dict[str, str]],
+    baseline_dv: Dict[str, List[Dict[str, str]]],
+    baseline_cf: Dict[str, List[Dict[str, str]]],
+    current_formulas: Dict[str, Dict[str, str]],
+    current_dv: Dict[str, List[Dict[str, str]]],
+    current_cf: Dict[str, List[Dict[str, str]]],
+) -> Dict[str, Dict[str, int]]:
+    engine = DiffEngine(index_version(baseline_formulas, baseline_dv, baseline_cf))
+    return engine.diff(index_version(current_formulas, current_dv, current_cf))
+
+
+def diff_pairs(versions: List[str], mode: str) -> List[Tuple[str, str]]:
+    """(base, current) version pairs for --diff-mode; versions are sorted oldest first."""
+    if mode == "adjacent":
+        return list(zip(versions, versions[1:]))
+    if mode == "all-pairs":
+        return [(a, b) for i, a in enumerate(versions) for b in versions[i + 1 :]]
+    return [(versions[-1], version) for version in versions]
+
+
+def build_version_diffs(
+    version_index: Dict[str, VersionIndex], pairs: List[Tuple[str, str]]
+) -> Dict[Tuple[str, str], Dict[str, Dict[str, int]]]:
+    engines: Dict[str, DiffEngine] = {}
+    diffs = {}
+    for base, current in pairs:
+        if base not in engines:
+            engines[base] = DiffEngine(version_index.get(base, {}))
+        diffs[(base, current)] = engines[base].diff(version_index.get(current, {}))
+    return diffs
+
+
+def build_change_matrix(
+    versions: List[str], diffs: Dict[Tuple[str, str], Dict[str, Dict[str, int]]]
+) -> List[List[str]]:
+    """N x N grid of total formula/DV/CF changes; a diff and its reverse have the same total."""
+    totals: Dict[Tuple[str, str], int] = {}
+    for (base, current), summary in diffs.items():
+        total = sum(sum(counts.values()) for counts in summary.values())
+        totals[(base, current)] = totals[(current, base)] = total
+    rows = []
+    for base in versions:
+        row = [base]
+        for current in versions:
+            total = 0 if base == current else totals.get((base, current))
+            row.append("" if total is None else str(total))
+        rows.append(row)
+    return rows
+
+
+def log_workbook_events(
+    events: EventLog, workbook: str, scan: WorkbookScan, duration_s: float, cache: Optional[str]
+) -> None:
+    """One sheet event per sheet and a file event for a written workbook."""
+    for sheet_name in scan.sheet_states:
+        events.sheet(
+            workbook,
+            sheet_name,
+            formula_cells=len(scan.formulas.get(sheet_name, {})),
+            dv_rules=len(scan.dvs.get(sheet_name, [])),
+            cf_rules=len(scan.cfs.get(sheet_name, [])),
+            bytes_inflated=scan.inflated.get(sheet_name, 0),
+        )
+    events.file(
+        workbook,
+        duration_s,
+        cache,
+        template=scan.template,
+        version=scan.version,
+        sheets=len(scan.sheet_states),
+        formula_cells=scan.cell_count,
+        dv_rules=sum(map(len, scan.dvs.values())),
+        cf_rules=sum(map(len, scan.cfs.values())),
+        bytes_inflated=sum(scan.inflated.values()),
+    )
+
+
+def write_workbook_outputs(
+    scan: WorkbookScan,
+    tsv_archive: Optional[TsvArchiveWriter],
+    catalogs: Tuple[Any, Any, Any],
+    summary_counts: Dict[str, Dict[str, Dict[str, int]]],
+    write_tsvs: bool = True,
+) -> None:
+    """Per-sheet TSVs, rule catalog rows and summary counts for one scanned workbook."""
+    template, version = scan.template, scan.version
+    formula_catalog, dv_catalog, cf_catalog = catalogs
+    for sheet_name in scan.sheet_states:
+        formulas = scan.formulas[sheet_name]
+        dvs = scan.dvs[sheet_name]
+        cfs = scan.cfs[sheet_name]
+
+        # per-sheet TSV
+        if write_tsvs:
+            write_sheet_tsv(
+                tsv_archive,
+                template,
+                sheet_name,
+                version,
+                "formulas",
+                [[cell, formula] for cell, formula in formulas.items()],
+            )
+            write_sheet_tsv(
+                tsv_archive,
+                template,
+                sheet_name,
+                version,
+                "dv",
+                [
                     [
-                        [
-                            version,
-                            sheet_name,
-                            dv["sqref"],
-                            dv["type"],
-                            dv["operator"],
-                            dv["allowBlank"],
-                            dv["showErrorMessage"],
-                            dv["showInputMessage"],
-                            dv["errorTitle"],
-                            dv["error"],
-                            dv["promptTitle"],
-                            dv["prompt"],
-                            dv["formula1"],
-                            dv["formula2"],
-                        ]
-                        for dv in dvs
+                        dv["type"],
+                        dv["operator"],
+                        dv["allowBlank"],
+                        dv["showErrorMessage"],
+                        dv["showInputMessage"],
+                        dv["errorTitle"],
+                        dv["error"],
+                        dv["promptTitle"],
+                        dv["prompt"],
+                        dv["formula1"],
+                        dv["formula2"],
+                        dv["sqref"],
                     ]
-                )
-                cf_catalog_rows.extend(
+                    for dv in dvs
+                ],
+            )
+            write_sheet_tsv(
+                tsv_archive,
+                template,
+                sheet_name,
+                version,
+                "cf",
+                [
                     [
-                        [
-                            version,
-                            sheet_name,
-                            cf["sqref"],
-                            cf["type"],
-                            cf["operator"],
-                            cf["priority"],
-                            cf["dxfId"],
-                            cf["formulas"],
-                        ]
-                        for cf in cfs
+                        cf["sqref"],
+                        cf["type"],
+                        cf["operator"],
+                        cf["dxfId"],
+                        cf["formulas"],
                     ]
-                )
-
-                # rules summary counts
-                summary_counts[sheet_name]["formulaCells"][version] = len(formulas)
-                summary_counts[sheet_name]["formulaDefs"][version] = len(
-                    set(formulas.values())
-                )
-                summary_counts[sheet_name]["dataValidations"][version] = len(dvs)
-                summary_counts[sheet_name]["conditionalFormats"][version] = len(cfs)
-
-            formulas_by_version[version] = formulas_by_sheet
-            dv_by_version[version] = dv_by_sheet
-            cf_by_version[version] = cf_by_sheet
-            sheet_states[version] = sheet_states_version
+                    for cf in cfs
+                ],
+            )
 
-        # write catalogs
-        write_csv(
-            OUT_ROOT / f"{template.lower()}_rule_catalog_formulas.csv",
-            ["version", "sheet", "cell", "formula"],
-            formula_catalog_rows,
+        # catalog rows
+        formula_catalog.writerows(
+            [[version, sheet_name, cell, formula] for cell, formula in formulas.items()]
         )
-        write_csv(
-            OUT_ROOT / f"{template.lower()}_rule_catalog_dv.csv",
+        dv_catalog.writerows(
             [
-                "version",
-                "sheet",
-                "sqref",
-                "type",
-                "operator",
-                "allowBlank",
-                "showErrorMessage",
-                "showInputMessage",
-                "errorTitle",
-                "error",
-                "promptTitle",
-                "prompt",
-                "formula1",
-                "formula2",
-            ],
-            dv_catalog_rows,
+                [
+                    version,
+                    sheet_name,
+                    dv["sqref"],
+                    dv["type"],
+                    dv["operator"],
+                    dv["allowBlank"],
+                    dv["showErrorMessage"],
+                    dv["showInputMessage"],
+                    dv["errorTitle"],
+                    dv["error"],
+                    dv["promptTitle"],
+                    dv["prompt"],
+                    dv["formula1"],
+                    dv["formula2"],
+                ]
+                for dv in dvs
+            ]
         )
-        write_csv(
-            OUT_ROOT / f"{template.lower()}_rule_catalog_cf.csv",
-            ["version", "sheet", "sqref", "type", "operator", "priority", "dxfId", "formulas"],
-            cf_catalog_rows,
+        cf_catalog.writerows(
+            [
+                [
+                    version,
+                    sheet_name,
+                    cf["sqref"],
+                    cf["type"],
+                    cf["operator"],
+                    cf["priority"],
+                    cf["dxfId"],
+                    cf["formulas"],
+                ]
+                for cf in cfs
+            ]
         )
-        if cf_extension_rows:
-            write_csv(
-                OUT_ROOT / f"{template.lower()}_cf_extension_warnings.csv",
-                ["template", "version", "sheet", "note"],
-                cf_extension_rows,
-            )
 
-        # sheet list (baseline)
-        baseline_state = sheet_states.get(baseline_version, {})
-        sheet_list_rows = [[sheet, baseline_state.get(sheet, "")] for sheet in baseline_state]
-        write_csv(
-            OUT_ROOT / f"{template.lower()}_sheet_list.csv",
-            ["sheet", f"state_{baseline_version}"],
-            sheet_list_rows,
+        # rules summary counts
+        summary_counts[sheet_name]["formulaCells"][version] = len(formulas)
+        summary_counts[sheet_name]["formulaDefs"][version] = len(
+            set(formulas.values())
         )
-
-        # rules summary
-        versions = [v for v, _ in version_files]
-        summary_rows = []
-        for sheet, metrics in summary_counts.items():
-            for metric, counts in metrics.items():
-                row = [sheet, metric] + [str(counts.get(v, 0)) for v in versions]
-                summary_rows.append(row)
-        write_csv(
-            OUT_ROOT / f"{template.lower()}_rules_summary.csv",
-            ["sheet", "metric"] + versions,
-            summary_rows,
+        summary_counts[sheet_name]["dataValidations"][version] = len(dvs)
+        summary_counts[sheet_name]["conditionalFormats"][version] = len(cfs)
+
+
+@dataclass
+class ScanContext:
+    """Run settings and instrumentation shared by every template pass (and --watch)."""
+
+    args: argparse.Namespace
+    cache: Optional[ScanCache]
+    timer: PhaseTimer
+    memory: MemoryProfiler
+    events: EventLog
+    tsv_archive: Optional[TsvArchiveWriter] = None
+    warehouse: Optional[WarehouseWriter] = None
+
+
+@dataclass
+class TemplateOutputs:
+    """What the cross-template outputs and xml-cf reports need from one template pass."""
+
+    baseline_version: str
+    baseline_metrics: Dict[str, Dict[str, int]]
+    baseline_states: Dict[str, str]
+    fingerprints: Dict[str, Dict[str, SheetFingerprint]]
+    xml_cf_records: Dict[Path, List[Dict[str, object]]]
+
+
+def warehouse_tee(
+    ctx: ScanContext, writer: Any, table: str, header: List[str], template: str
+) -> Any:
+    """writer, also filling a warehouse table when the run has a warehouse."""
+    if ctx.warehouse is None:
+        return writer
+    return TableTee(writer, ctx.warehouse, table, header, template)
+
+
+def scan_template(
+    ctx: ScanContext,
+    template: str,
+    version_files: List[Tuple[str, Path]],
+    scans: Iterator[WorkbookScan],
+    tsv_paths: Optional[FrozenSet[Path]] = None,
+) -> TemplateOutputs:
+    """Write one template's catalogs, summaries and diffs from its next scans.
+
+    With tsv_paths, per-sheet TSVs are only rewritten for those workbooks (--watch);
+    the TSVs of the other versions are unchanged on disk.
+    """
+    timer, memory, events, cache = ctx.timer, ctx.memory, ctx.events, ctx.cache
+    baseline_version = version_files[-1][0]
+    xml_cf_records: Dict[Path, List[Dict[str, object]]] = {}
+
+    # storage per version
+    version_index: Dict[str, VersionIndex] = {}
+    sheet_states: Dict[str, Dict[str, str]] = {}
+
+    # rules summary counts
+    summary_counts = defaultdict(lambda: defaultdict(dict))
+
+    cf_extension_rows = []
+    warehouse = ctx.warehouse
+    if warehouse is not None:
+        for table in TEMPLATE_TABLES:
+            warehouse.clear(table, template)
+    # rule catalogs, streamed one workbook at a time
+    dv_path = OUT_ROOT / f"{template.lower()}_rule_catalog_dv.csv"
+    with ExitStack() as catalogs:
+        formula_header = ["version", "sheet", "cell", "formula"]
+        formula_catalog = warehouse_tee(
+            ctx,
+            catalogs.enter_context(
+                csv_writer(
+                    OUT_ROOT / f"{template.lower()}_rule_catalog_formulas.csv", formula_header
+                )
+            ),
+            "formulas",
+            formula_header,
+            template,
+        )
+        dv_records = RecordWriter([(name, "str") for name in DV_CATALOG_HEADER])
+        dv_catalog = CsvRecordTee(
+            warehouse_tee(
+                ctx,
+                catalogs.enter_context(csv_writer(dv_path, DV_CATALOG_HEADER)),
+                "dvs",
+                DV_CATALOG_HEADER,
+                template,
+            ),
+            dv_records,
+            DV_CATALOG_HEADER,
+            template,
         )
+        cf_catalog = warehouse_tee(
+            ctx,
+            catalogs.enter_context(
+                csv_writer(OUT_ROOT / f"{template.lower()}_rule_catalog_cf.csv", CF_CATALOG_HEADER)
+            ),
+            "cf_catalog",
+            CF_CATALOG_HEADER,
+            template,
+        )
+        for version, file_path in version_files:
+            scan = next(scans)
+            if scan.xml_cf_records is not None:
+                xml_cf_records[file_path] = scan.xml_cf_records
+            for sheet_name in scan.cf_extension_sheets:
+                cf_extension_rows.append([template, version, sheet_name, "cf_extension_detected"])
+
+            written = time.perf_counter()
+            workbook_key = f"{template}/{file_path.name}"
+            timer.merge(scan.timings, workbook_key)
+            memory.merge(scan.memory, workbook_key)
+            with timer.phase("write_outputs", workbook_key) as counters:
+                write_workbook_outputs(
+                    scan,
+                    ctx.tsv_archive,
+                    (formula_catalog, dv_catalog, cf_catalog),
+                    summary_counts,
+                    write_tsvs=tsv_paths is None or file_path in tsv_paths,
+                )
+                counters["cells"], counters["rules"] = scan.cell_count, scan.rule_count
+            with timer.phase("fingerprint", workbook_key) as counters:
+                version_index[version] = index_version(scan.formulas, scan.dvs, scan.cfs)
+                counters["cells"], counters["rules"] = scan.cell_count, scan.rule_count
+            sheet_states[version] = scan.sheet_states
+            if events.enabled:
+                duration_s = scan.extract_s + time.perf_counter() - written
+                cache_status = None if cache is None else ("hit" if scan.cached else "miss")
+                log_workbook_events(events, workbook_key, scan, duration_s, cache_status)
+    dv_records.write(binary_path(dv_path), source=dv_path)
+
+    warnings_path = OUT_ROOT / f"{template.lower()}_cf_extension_warnings.csv"
+    if cf_extension_rows:
+        write_csv(warnings_path, ["template", "version", "sheet", "note"], cf_extension_rows)
+    elif tsv_paths is not None and warnings_path.exists():
+        # a rescan removed the last cfExt sheet; a full run would not write the file
+        warnings_path.unlink()
+
+    # sheet list (baseline)
+    baseline_state = sheet_states.get(baseline_version, {})
+    sheet_list_rows = [[sheet, baseline_state.get(sheet, "")] for sheet in baseline_state]
+    write_csv(
+        OUT_ROOT / f"{template.lower()}_sheet_list.csv",
+        ["sheet", f"state_{baseline_version}"],
+        sheet_list_rows,
+    )
 
-        # diff summary vs baseline
-        baseline_formulas = formulas_by_version.get(baseline_version, {})
-        baseline_dv = dv_by_version.get(baseline_version, {})
-        baseline_cf = cf_by_version.get(baseline_version, {})
-        diff_rows = []
-        for version, _ in version_files:
-            diff = build_diff_summary(
-                baseline_formulas,
-                baseline_dv,
-                baseline_cf,
-                formulas_by_version.get(version, {}),
-                dv_by_version.get(version, {}),
-                cf_by_version.get(version, {}),
-            )
-            for sheet, counts in diff.items():
-                diff_rows.append(
-                    [
-                        sheet,
-                        version,
-                        baseline_version,
-                        counts["formula_added"],
-                        counts["formula_removed"],
-                        counts["formula_changed"],
-                        counts["dv_added"],
-                        counts["dv_removed"],
-                        counts["cf_added"],
-                        counts["cf_removed"],
-                    ]
+    # rules summary
+    versions = [v for v, _ in version_files]
+    summary_rows = []
+    for sheet, metrics in summary_counts.items():
+        for metric, counts in metrics.items():
+            row = [sheet, metric] + [str(counts.get(v, 0)) for v in versions]
+            summary_rows.append(row)
+    write_csv(
+        OUT_ROOT / f"{template.lower()}_rules_summary.csv",
+        ["sheet", "metric"] + versions,
+        summary_rows,
+    )
+
+    # diff summary vs baseline
+    with timer.phase("diff"):
+        baseline_diffs = build_version_diffs(version_index, diff_pairs(versions, "baseline"))
+    diff_rows = [
+        [sheet, current, base] + [counts[name] for name in DIFF_FIELDS]
+        for (base, current), diff in baseline_diffs.items()
+        for sheet, counts in diff.items()
+    ]
+    write_csv(
+        OUT_ROOT / f"{template.lower()}_sheet_diff_summary.csv",
+        ["sheet", "version", "baseline"] + DIFF_FIELDS,
+        diff_rows,
+    )
+    if warehouse is not None:
+        for version, states in sheet_states.items():
+            for sheet, state in states.items():
+                warehouse.add(
+                    "sheet_states",
+                    {"template": template, "version": version, "sheet": sheet, "state": state},
                 )
+        for (base, current), diff in baseline_diffs.items():
+            for sheet, counts in diff.items():
+                row = {"template": template, "version": current, "sheet": sheet, "baseline": base}
+                warehouse.add("sheet_diffs", {**row, **counts})
+
+    diff_mode = ctx.args.diff_mode
+    if diff_mode != "baseline":
+        with timer.phase(f"diff_{diff_mode}"):
+            version_diffs = build_version_diffs(version_index, diff_pairs(versions, diff_mode))
         write_csv(
-            OUT_ROOT / f"{template.lower()}_sheet_diff_summary.csv",
+            OUT_ROOT / f"{template.lower()}_version_diff_pairs.csv",
+            ["sheet", "from_version", "to_version"] + DIFF_FIELDS,
             [
-                "sheet",
-                "version",
-                "baseline",
-                "formula_added",
-                "formula_removed",
-                "formula_changed",
-                "dv_added",
-                "dv_removed",
-                "cf_added",
-                "cf_removed",
+                [sheet, base, current] + [counts[name] for name in DIFF_FIELDS]
+                for (base, current), diff in version_diffs.items()
+                for sheet, counts in diff.items()
             ],
-            diff_rows,
         )
-
-        # capture baseline metrics for cross-template outputs
-        baseline_metrics[template] = {
+        write_csv(
+            OUT_ROOT / f"{template.lower()}_version_diff_matrix.csv",
+            ["version"] + versions,
+            build_change_matrix(versions, version_diffs),
+        )
+        if warehouse is not None:
+            for (base, current), diff in version_diffs.items():
+                for sheet, counts in diff.items():
+                    row = {"template": template, "version": current, "sheet": sheet}
+                    warehouse.add("version_diffs", {**row, "from_version": base, **counts})
+    if warehouse is not None:
+        # the exports these rows mirror, so readers can tell the warehouse is current
+        mirrored = [
+            "rule_catalog_formulas",
+            "rule_catalog_dv",
+            "rule_catalog_cf",
+            "sheet_diff_summary",
+        ]
+        if diff_mode != "baseline":
+            mirrored.append("version_diff_pairs")
+        for name in mirrored:
+            warehouse.record_source(OUT_ROOT / f"{template.lower()}_{name}.csv")
+        warehouse.commit()
+
+    return TemplateOutputs(
+        baseline_version=baseline_version,
+        baseline_metrics={
             sheet: {
                 "formulaCells": summary_counts[sheet]["formulaCells"].get(baseline_version, 0),
                 "formulaDefs": summary_counts[sheet]["formulaDefs"].get(baseline_version, 0),
-                "dataValidations": summary_counts[sheet]["dataValidations"].get(baseline_version, 0),
+                "dataValidations": summary_counts[sheet]["dataValidations"].get(
+                    baseline_version, 0
+                ),
                 "conditionalFormats": summary_counts[sheet]["conditionalFormats"].get(
                     baseline_version, 0
                 ),
             }
             for sheet in summary_counts
-        }
-        baseline_states[template] = sheet_states.get(baseline_version, {})
+        },
+        baseline_states=baseline_state,
+        fingerprints={
+            version: {sheet: index.fingerprint for sheet, index in sheets.items()}
+            for version, sheets in version_index.items()
+        },
+        xml_cf_records=xml_cf_records,
+    )
+
 
-    # cross-template outputs
+def write_cross_template_outputs(outputs: Dict[str, TemplateOutputs]) -> None:
+    baseline_versions = {t: o.baseline_version for t, o in outputs.items()}
+    baseline_metrics = {t: o.baseline_metrics for t, o in outputs.items()}
+    baseline_states = {t: o.baseline_states for t, o in outputs.items()}
     templates_sorted = sorted(baseline_versions.keys())
     sheets_all = set()
     for sheet_map in baseline_states.values():
@@ -604,33 +1382,373 @@ def main() -> None:
         report_rows,
     )
 
-    if not args.skip_xml_cf:
-        try:
-            import xml_cf_report
-        except ImportError as exc:
-            raise SystemExit(f"Missing xml_cf_report: {exc}") from exc
+
+def scan_and_write(
+    ctx: ScanContext,
+    templates: Dict[str, List[Tuple[str, Path]]],
+    outputs: Dict[str, TemplateOutputs],
+    tsv_paths: Optional[FrozenSet[Path]] = None,
+) -> None:
+    """Scan the given templates, (re)write their outputs and the cross-template files.
+
+    outputs holds every template's TemplateOutputs; templates not in templates keep
+    theirs, so --watch can rescan only the folders that changed.
+    """
+    args = ctx.args
+    scans = scan_templates(
+        templates,
+        args.jobs,
+        args.engine,
+        ctx.cache,
+        xml_cf=not args.skip_xml_cf,
+        timer=ctx.timer,
+        memprofile_top=ctx.memory.top if ctx.memory.enabled else None,
+    )
+    for template, version_files in templates.items():
+        if not version_files:
+            outputs.pop(template, None)
+            if ctx.warehouse is not None:
+                for table in TEMPLATE_TABLES:
+                    ctx.warehouse.clear(table, template)
+                ctx.warehouse.commit()
+            continue
+        outputs[template] = scan_template(ctx, template, version_files, scans, tsv_paths)
+
+    write_cross_template_outputs(outputs)
+    write_fingerprints(
+        OUT_ROOT / "sheet-fingerprints.json",
+        {template: output.fingerprints for template, output in outputs.items()},
+    )
+
+
+def write_xml_cf_outputs(ctx: ScanContext, outputs: Dict[str, TemplateOutputs]) -> None:
+    xml_cf_records = {
+        path: records
+        for output in outputs.values()
+        for path, records in output.xml_cf_records.items()
+    }
+    # the reports below read what this run just wrote; hand the CF records over instead
+    # (DV rows come from the catalogs' .bin twins)
+    artifacts = ScanArtifacts(OUT_ROOT)
+    with ctx.timer.phase("xml_cf_report") as counters:
         xml_cf_report.run_report(
             TEMPLATE_ROOT,
             OUT_ROOT / "xml-cf-report.jsonl",
             OUT_ROOT / "xml-cf-report-summary.csv",
+            records_by_path=xml_cf_records,
+            out_binary=OUT_ROOT / "xml-cf-report.bin",
         )
-        try:
-            import xml_cf_doc_compare
-        except ImportError as exc:
-            raise SystemExit(f"Missing xml_cf_doc_compare: {exc}") from exc
+        counters["rules"] = sum(map(len, xml_cf_records.values()))
+    tasks = list(xml_cf_report.iter_templates(TEMPLATE_ROOT))
+    records: Iterable[Dict[str, object]] = iter_records(OUT_ROOT / "xml-cf-report.jsonl")
+    if all(path in xml_cf_records for _, path in tasks):
+        records = [record for _, path in tasks for record in xml_cf_records[path]]
+        artifacts.provide_cf_records(records)
+    if ctx.warehouse is not None:
+        with ctx.timer.phase("warehouse_cf_rules") as counters:
+            ctx.warehouse.clear("cf_rules")
+            for record in records:
+                ctx.warehouse.add_cf_record(record)
+                counters["rules"] += 1
+            ctx.warehouse.record_source(OUT_ROOT / "xml-cf-report.jsonl")
+            ctx.warehouse.commit()
+    try:
+        import xml_cf_doc_compare
+    except ImportError as exc:
+        raise SystemExit(f"Missing xml_cf_doc_compare: {exc}") from exc
+    with ctx.timer.phase("xml_cf_doc_compare"):
         xml_cf_doc_compare.run_compare(
             OUT_ROOT,
             OUT_ROOT / "xml-cf-doc-compare.md",
+            artifacts,
         )
-        try:
-            import xml_cf_range_diff
-        except ImportError as exc:
-            raise SystemExit(f"Missing xml_cf_range_diff: {exc}") from exc
+    try:
+        import xml_cf_range_diff
+    except ImportError as exc:
+        raise SystemExit(f"Missing xml_cf_range_diff: {exc}") from exc
+    with ctx.timer.phase("xml_cf_range_diff"):
         xml_cf_range_diff.run_diff(
             OUT_ROOT,
             OUT_ROOT / "xml-cf-range-diff.md",
+            artifacts,
         )
 
 
+def remove_sheet_tsvs(template: str, version: str) -> None:
+    """Drop the per-sheet TSVs of a workbook that was removed from the templates."""
+    for kind in ("formulas", "dv", "cf"):
+        for path in OUT_ROOT.glob(f"analysis_{template.lower()}_*/{version}.{kind}.tsv"):
+            path.unlink()
+
+
+FileStat = Tuple[int, int]
+
+
+class TemplateWatcher:
+    """Poll the template folders for added, modified and removed versioned xlsx files.
+
+    A file counts as modified when its (mtime, size) moved and its SHA-256 no longer
+    matches the bytes last reported, so touching or re-saving identical bytes is not a
+    change. Files are only looked at once their stat held still for one poll, so a
+    workbook that is still being written is picked up on the next round.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.seen = self.snapshot()
+        self.known: Dict[Path, Tuple[FileStat, str]] = {
+            path: (stat, file_sha256(path)) for path, stat in self.seen.items()
+        }
+
+    def snapshot(self) -> Dict[Path, FileStat]:
+        files: Dict[Path, FileStat] = {}
+        for folder in self.root.iterdir():
+            if not folder.is_dir():
+                continue
+            for path in folder.glob("*.xlsx"):
+                if not is_versioned_xlsx(path):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def poll(self) -> Dict[str, FrozenSet[Path]]:
+        """{template: changed paths} since the last poll; removed files count as changed."""
+        current = self.snapshot()
+        settled = [path for path, stat in current.items() if self.seen.get(path) == stat]
+        self.seen = current
+        changed: Dict[str, set] = defaultdict(set)
+        for path in [path for path in self.known if path not in current]:
+            del self.known[path]
+            changed[path.parent.name].add(path)
+        for path in settled:
+            known = self.known.get(path)
+            if known is not None and known[0] == current[path]:
+                continue
+            try:
+                digest = file_sha256(path)
+            except FileNotFoundError:
+                continue
+            self.known[path] = (current[path], digest)
+            if known is None or known[1] != digest:
+                changed[path.parent.name].add(path)
+        return {template: frozenset(paths) for template, paths in changed.items()}
+
+
+def watch_templates(
+    ctx: ScanContext, outputs: Dict[str, TemplateOutputs], interval: float
+) -> None:
+    """Rescan changed template folders until interrupted (--watch).
+
+    Only the changed workbooks are extracted again (the rest of their template comes
+    from the scan cache); that template's catalogs, summaries and diffs, the
+    cross-template files and, unless --skip-xml-cf, the xml-cf reports are rewritten.
+    """
+    watcher = TemplateWatcher(TEMPLATE_ROOT)
+    print(f"Watching {TEMPLATE_ROOT} every {interval:g}s (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            changed = watcher.poll()
+            if not changed:
+                continue
+            started = time.perf_counter()
+            current = load_templates()
+            templates = {template: current.get(template, []) for template in sorted(changed)}
+            paths = frozenset().union(*changed.values())
+            try:
+                for path in paths:
+                    if not path.exists():
+                        remove_sheet_tsvs(path.parent.name, parse_version(path)[0])
+                scan_and_write(ctx, templates, outputs, tsv_paths=paths)
+                if not ctx.args.skip_xml_cf:
+                    write_xml_cf_outputs(ctx, outputs)
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile) as exc:
+                # typically a half-written workbook; its next save is picked up again
+                print(f"Rescan failed: {exc}")
+                continue
+            names = ", ".join(sorted(f"{path.parent.name}/{path.name}" for path in paths))
+            elapsed = time.perf_counter() - started
+            print(f"Rescanned {names} in {elapsed:.2f}s")
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scan Excel templates and emit rule catalogs.")
+    parser.add_argument(
+        "--skip-xml-cf",
+        action="store_true",
+        help="Skip XML conditional formatting report (cfExt-aware).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for per-workbook extraction (default: 1, serial).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="openpyxl",
+        help="Extraction backend: full openpyxl object model, or streaming sheet XML (raw).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=CACHE_ROOT,
+        help="Extraction cache keyed by xlsx SHA-256 and engine (default: analysis/.scan-cache).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-parse every workbook and leave the extraction cache untouched.",
+    )
+    parser.add_argument(
+        "--tsv-archive",
+        action="store_true",
+        help=f"Pack the per-sheet TSVs into one indexed {ARCHIVE_NAME} instead of separate files.",
+    )
+    parser.add_argument(
+        "--diff-mode",
+        choices=DIFF_MODES,
+        default="baseline",
+        help=(
+            "Version pairs for {template}_version_diff_{pairs,matrix}.csv: adjacent versions "
+            "or every pair (all-pairs); baseline only writes the usual sheet_diff_summary."
+        ),
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Write per-phase/per-workbook wall, CPU, bytes and counts to scan-timings.json.",
+    )
+    parser.add_argument(
+        "--no-warehouse",
+        action="store_true",
+        help=(
+            "Skip scan-warehouse.sqlite; readers fall back to the CSV/JSONL exports (and "
+            "their .bin twins) once an existing warehouse no longer matches them."
+        ),
+    )
+    add_memprofile_argument(parser, OUT_ROOT / "scan-memprofile.json")
+    add_events_argument(parser, "scan-events.jsonl")
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Hardlink the outputs into the content-addressed object store (see scan_store.py).",
+    )
+    parser.add_argument(
+        "--object-store",
+        type=Path,
+        default=STORE_ROOT,
+        help="Object store for --dedup (default: analysis/.scan-objects; same filesystem).",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "After the scan, poll the template folders and rescan only added, modified or "
+            "removed workbooks (and the outputs that depend on them) until Ctrl-C."
+        ),
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=WATCH_INTERVAL_S,
+        metavar="SECONDS",
+        help=f"Polling interval for --watch (default: {WATCH_INTERVAL_S}).",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    if args.watch and args.no_cache:
+        parser.error("--watch rescans unchanged versions from the cache; drop --no-cache")
+    if args.watch and args.tsv_archive:
+        parser.error("--watch rewrites single TSVs; it cannot be combined with --tsv-archive")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    with profiling(args, OUT_ROOT, "run_scan"):
+        run(args)
+
+
+def run(args: argparse.Namespace) -> None:
+    # files hardlinked into the object store are shared with other scans
+    unshare_tree(OUT_ROOT)
+    OUT_ROOT.mkdir(parents=True, exist_ok=True)
+    memory = profiler_from_args(args)
+    warehouse = None
+    if not args.no_warehouse:
+        warehouse = WarehouseWriter(warehouse_path(OUT_ROOT), fresh=True)
+    ctx = ScanContext(
+        args=args,
+        cache=None if args.no_cache else ScanCache(args.cache_dir),
+        timer=PhaseTimer(memory),
+        memory=memory,
+        events=event_log_from_args(args, OUT_ROOT / "scan-events.jsonl", "run_scan"),
+        tsv_archive=TsvArchiveWriter(OUT_ROOT / ARCHIVE_NAME) if args.tsv_archive else None,
+        warehouse=warehouse,
+    )
+    outputs: Dict[str, TemplateOutputs] = {}
+    scan_and_write(ctx, load_templates(), outputs)
+
+    if ctx.tsv_archive is not None:
+        ctx.tsv_archive.close()
+        print(f"Wrote {len(ctx.tsv_archive)} sheet TSVs to {ctx.tsv_archive.path}")
+
+    if ctx.cache is not None:
+        print(f"Scan cache: {ctx.cache.hits} hit(s), {ctx.cache.misses} parsed ({ctx.cache.root})")
+
+    if not args.skip_xml_cf:
+        write_xml_cf_outputs(ctx, outputs)
+
+    if ctx.warehouse is not None:
+        with ctx.timer.phase("warehouse_indexes"):
+            ctx.warehouse.create_indexes()
+        print(f"Wrote scan warehouse to {ctx.warehouse.path}")
+
+    if args.watch:
+        watch_templates(ctx, outputs, args.watch_interval)
+    if ctx.warehouse is not None:
+        ctx.warehouse.close()
+
+    cache, timer, events = ctx.cache, ctx.timer, ctx.events
+    if args.timings:
+        meta = {
+            "date": DATE_TAG,
+            "engine": args.engine,
+            "jobs": args.jobs,
+            "cache_hits": cache.hits if cache is not None else 0,
+            "cache_misses": cache.misses if cache is not None else 0,
+        }
+        timer.write(OUT_ROOT / "scan-timings.json", meta)
+        print(f"Wrote timings to {OUT_ROOT / 'scan-timings.json'}")
+
+    if args.memprofile is not None:
+        meta = {
+            "date": DATE_TAG,
+            "engine": args.engine,
+            "jobs": args.jobs,
+            "cache_hits": cache.hits if cache is not None else 0,
+        }
+        memory.write(args.memprofile, meta)
+        memory.close()
+        print(f"Wrote memory profile to {args.memprofile}")
+
+    if events.enabled:
+        print(f"Throughput: {format_summary(events.close())}")
+        print(f"Wrote events to {events.path}")
+
+    if args.dedup:
+        print(f"Deduplicated {OUT_ROOT}: {ObjectStore(args.object_store).dedup_tree(OUT_ROOT)}")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Packed per-sheet TSV archive for run_scan (--tsv-archive).
+
+Instead of analysis_{template}_{sheet}/{version}.{kind}.tsv files, every TSV of a scan
+is appended to a single sheet-tsv.pack:
+
+    MAGIC | tsv bytes ... | JSON index | index offset (8 bytes, big endian) | FOOTER
+
+Index entries are keyed by (template, sheet, version, kind) and carry the byte offset
+and length of the TSV plus its legacy relative path, so a reader seeks straight to one
+TSV without unpacking the rest.
+
+Usage:
+  python analysis/scan_archive.py analysis/scan-YYYY-MM-DD/sheet-tsv.pack --list
+  python analysis/scan_archive.py PACK --template CMRT --sheet Declaration --version 6.5 --kind dv
+  python analysis/scan_archive.py PACK --extract DEST_DIR
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+ARCHIVE_NAME = "sheet-tsv.pack"
+MAGIC = b"SCANTSV1"
+FOOTER = b"TSVIDX01"
+TAIL = struct.Struct(">Q8s")
+KINDS = ("formulas", "dv", "cf")
+
+ArchiveKey = Tuple[str, str, str, str]
+
+
+class TsvArchiveWriter:
+    """Append TSV payloads to one file; the index is written on close()."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._tmp = path.with_name(f"{path.name}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh: IO[bytes] = self._tmp.open("wb")
+        self._fh.write(MAGIC)
+        self._entries: List[Dict[str, object]] = []
+
+    def __enter__(self) -> "TsvArchiveWriter":
+        return self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._fh.close()
+            self._tmp.unlink(missing_ok=True)
+
+    def add(
+        self, template: str, sheet: str, version: str, kind: str, rel_path: str, data: bytes
+    ) -> None:
+        self._entries.append(
+            {
+                "template": template,
+                "sheet": sheet,
+                "version": version,
+                "kind": kind,
+                "path": rel_path,
+                "offset": self._fh.tell(),
+                "length": len(data),
+            }
+        )
+        self._fh.write(data)
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        index_offset = self._fh.tell()
+        self._fh.write(json.dumps(self._entries, ensure_ascii=False).encode("utf-8"))
+        self._fh.write(TAIL.pack(index_offset, FOOTER))
+        self._fh.close()
+        os.replace(self._tmp, self.path)
+
+
+class TsvArchive:
+    """Random-access reader for a sheet-tsv.pack."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a sheet TSV archive")
+            fh.seek(-TAIL.size, os.SEEK_END)
+            index_end = fh.tell()
+            index_offset, footer = TAIL.unpack(fh.read(TAIL.size))
+            if footer != FOOTER:
+                raise ValueError(f"{path} has no archive index (truncated write?)")
+            fh.seek(index_offset)
+            entries = json.loads(fh.read(index_end - index_offset).decode("utf-8"))
+        self.entries: Dict[ArchiveKey, Dict[str, object]] = {
+            (e["template"], e["sheet"], e["version"], e["kind"]): e for e in entries
+        }
+
+    def keys(self) -> List[ArchiveKey]:
+        return list(self.entries)
+
+    def read_bytes(self, template: str, sheet: str, version: str, kind: str) -> bytes:
+        entry = self.entries[(template, sheet, version, kind)]
+        with self.path.open("rb") as fh:
+            fh.seek(int(entry["offset"]))
+            return fh.read(int(entry["length"]))
+
+    def read_rows(self, template: str, sheet: str, version: str, kind: str) -> List[List[str]]:
+        text = self.read_bytes(template, sheet, version, kind).decode("utf-8")
+        return [line.split("\t") for line in text.splitlines()]
+
+    def extract(self, dest: Path) -> int:
+        """Unpack into the legacy analysis_{template}_{sheet}/{version}.{kind}.tsv layout."""
+        with self.path.open("rb") as fh:
+            for entry in self.entries.values():
+                fh.seek(int(entry["offset"]))
+                out = dest / str(entry["path"])
+                out.parent.mkdir(parents=True, exist_ok=True)
+                out.write_bytes(fh.read(int(entry["length"])))
+        return len(self.entries)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Read one TSV from a packed scan archive.")
+    parser.add_argument("archive", type=Path, help=f"Path to {ARCHIVE_NAME}.")
+    parser.add_argument("--list", action="store_true", help="List archive keys.")
+    parser.add_argument("--extract", type=Path, default=None, help="Unpack all TSVs here.")
+    parser.add_argument("--template", default=None)
+    parser.add_argument("--sheet", default=None)
+    parser.add_argument("--version", default=None)
+    parser.add_argument("--kind", choices=KINDS, default=None)
+    args = parser.parse_args(argv)
+
+    archive = TsvArchive(args.archive)
+    if args.list:
+        for key in archive.keys():
+            print("\t".join(key))
+        return 0
+    if args.extract is not None:
+        count = archive.extract(args.extract)
+        print(f"Extracted {count} TSV files to {args.extract}")
+        return 0
+    if not (args.template and args.sheet and args.version and args.kind):
+        parser.error("--template, --sheet, --version and --kind are required to read a TSV")
+    try:
+        data = archive.read_bytes(args.template, args.sheet, args.version, args.kind)
+    except KeyError:
+        print("No such TSV in archive", file=sys.stderr)
+        return 1
+    sys.stdout.write(data.decode("utf-8"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
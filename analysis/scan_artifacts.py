@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared loader for the scan artifacts the review scripts read (xml_cf_doc_compare,
+xml_semantic_review, xml_cf_range_diff, docs_excel_rule_check).
+
+ScanArtifacts parses each artifact of one scan directory at most once, on first use:
+- xml-cf-report records, per template (from the indexed .bin twin when it is current,
+  so only that template's records are decoded; see scan_records.py)
+- {template}_rule_catalog_dv.csv rows, per template
+
+and serves them as views keyed by (template, version, sheet). Lookups of a single
+sheet (cf_records with a version and sheet, sheet_cf_formulas, sheet_dv_rows) query the
+scan's SQLite warehouse instead, when it is current and the template is not loaded yet
+(see scan_warehouse.py). artifacts_for() keeps one ScanArtifacts per scan directory for
+the life of the process. run_scan builds its own ScanArtifacts, hands it the CF records
+it already has in memory (provide_cf_records) and passes it to the reports it runs; DV
+rows are read back from the catalogs' .bin twins it just wrote.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from analysis import scan_warehouse
+    from analysis.scan_records import SUFFIX, RecordFile, current_binary, iter_records
+    from analysis.sqref_index import RuleCatalog
+except ImportError:
+    import scan_warehouse
+    from scan_records import SUFFIX, RecordFile, current_binary, iter_records
+    from sqref_index import RuleCatalog
+
+ANALYSIS_ROOT = Path(__file__).resolve().parent
+SCAN_PREFIX = "scan-"
+CF_REPORT_NAME = "xml-cf-report.jsonl"
+DV_CATALOG_STEM = "_rule_catalog_dv"
+
+SheetKey = Tuple[str, str, str]
+
+_LOADED: Dict[Path, "ScanArtifacts"] = {}
+
+
+def find_latest_scan(root: Path = ANALYSIS_ROOT) -> Path:
+    scans = sorted([p for p in root.iterdir() if p.is_dir() and p.name.startswith(SCAN_PREFIX)])
+    if not scans:
+        raise FileNotFoundError("No scan-YYYY-MM-DD directories found in analysis/.")
+    return scans[-1]
+
+
+def _by_sheet(
+    records: Iterable[dict], template: Optional[str] = None
+) -> Dict[SheetKey, List[dict]]:
+    grouped: Dict[SheetKey, List[dict]] = {}
+    for record in records:
+        key = (template or record["template"], record["version"], record["sheet"])
+        grouped.setdefault(key, []).append(record)
+    return grouped
+
+
+class ScanArtifacts:
+    """Lazily parsed, memoized artifacts of one scan directory."""
+
+    def __init__(self, scan_root: Path) -> None:
+        self.scan_root = scan_root
+        # template -> its records in report order, filled in per template
+        self._cf: Dict[str, List[dict]] = {}
+        self._cf_templates: Optional[List[str]] = None
+        self._cf_catalog: Optional[RuleCatalog] = None
+        self._cf_by_sheet: Optional[Dict[SheetKey, List[dict]]] = None
+        self._cf_formulas: Optional[Dict[SheetKey, List[str]]] = None
+        self._dv: Dict[str, RuleCatalog] = {}
+        self._dv_records: Optional[Dict[SheetKey, List[dict]]] = None
+        self._warehouse: Optional[sqlite3.Connection] = None
+        self._warehouse_checked = False
+
+    # handed over by run_scan
+
+    def provide_cf_records(self, records: Iterable[dict]) -> None:
+        """Use these xml-cf-report records (in report order) instead of the files."""
+        self._cf = {}
+        for record in records:
+            self._cf.setdefault(str(record["template"]), []).append(record)
+        self._cf_templates = list(self._cf)
+
+    # scan-warehouse.sqlite
+
+    def warehouse(self) -> Optional[sqlite3.Connection]:
+        """Read-only connection to the warehouse, unless it is missing or stale."""
+        if not self._warehouse_checked:
+            self._warehouse_checked = True
+            text = [self.cf_path, *self.scan_root.glob(f"*{DV_CATALOG_STEM}.csv")]
+            path = scan_warehouse.current_warehouse(self.scan_root, *text)
+            if path is not None:
+                self._warehouse = scan_warehouse.connect(path)
+        return self._warehouse
+
+    def _warehouse_table(self, table: str) -> Optional[sqlite3.Connection]:
+        conn = self.warehouse()
+        if conn is None or not scan_warehouse.has_rows(conn, table):
+            return None
+        return conn
+
+    # xml-cf-report
+
+    @property
+    def cf_path(self) -> Path:
+        return self.scan_root / CF_REPORT_NAME
+
+    def has_cf_report(self) -> bool:
+        return bool(self._cf_templates) or self.cf_path.exists() or bool(
+            current_binary(self.cf_path)
+        )
+
+    def _load_all_cf(self) -> None:
+        self._cf = {}
+        for record in iter_records(self.cf_path):
+            self._cf.setdefault(str(record["template"]), []).append(record)
+        self._cf_templates = list(self._cf)
+
+    def cf_templates(self) -> List[str]:
+        """Templates in xml-cf-report order."""
+        if self._cf_templates is None:
+            binary = current_binary(self.cf_path)
+            if binary is None:
+                self._load_all_cf()
+            else:
+                with RecordFile(binary) as records:
+                    self._cf_templates = list(dict.fromkeys(key[0] for key in records.keys()))
+        return list(self._cf_templates)
+
+    def cf_records(
+        self, template: str, version: Optional[str] = None, sheet: Optional[str] = None
+    ) -> List[dict]:
+        """One template's CF records, optionally narrowed to a version and sheet."""
+        records = self._cf.get(template)
+        if records is None and version is not None and sheet is not None:
+            conn = self._warehouse_table("cf_rules")
+            if conn is not None:
+                rows = scan_warehouse.select(conn, "cf_rules", template, version, sheet)
+                return [scan_warehouse.cf_record(row) for row in rows]
+        if records is None:
+            if template not in self.cf_templates():
+                return []
+            binary = current_binary(self.cf_path)
+            if binary is None:
+                self._load_all_cf()
+                records = self._cf.get(template, [])
+            else:
+                with RecordFile(binary) as report:
+                    records = self._cf[template] = list(report.select(template))
+        return [
+            record
+            for record in records
+            if (version is None or record["version"] == version)
+            and (sheet is None or record["sheet"] == sheet)
+        ]
+
+    def cf_catalog(self) -> RuleCatalog:
+        """Every CF record, with a sqref index per (template, version, sheet)."""
+        if self._cf_catalog is None:
+            self._cf_catalog = RuleCatalog(
+                record for template in self.cf_templates() for record in self.cf_records(template)
+            )
+        return self._cf_catalog
+
+    def cf_by_sheet(self) -> Dict[SheetKey, List[dict]]:
+        if self._cf_by_sheet is None:
+            self._cf_by_sheet = _by_sheet(self.cf_catalog())
+        return self._cf_by_sheet
+
+    def sheet_cf_formulas(self, key: SheetKey) -> List[str]:
+        """Non-empty CF formulas of one (template, version, sheet)."""
+        if self._cf_formulas is not None:
+            return self._cf_formulas.get(key, [])
+        return [
+            formula
+            for record in self.cf_records(*key)
+            for formula in record.get("formulas", [])
+            if formula
+        ]
+
+    def cf_formulas(self) -> Dict[SheetKey, List[str]]:
+        """Non-empty CF formulas per (template, version, sheet), in report order."""
+        if self._cf_formulas is None:
+            self._cf_formulas = {
+                key: [
+                    formula
+                    for record in records
+                    for formula in record.get("formulas", [])
+                    if formula
+                ]
+                for key, records in self.cf_by_sheet().items()
+            }
+        return self._cf_formulas
+
+    # {template}_rule_catalog_dv.csv
+
+    def dv_templates(self) -> List[str]:
+        names = set(self._dv)
+        for path in self.scan_root.glob(f"*{DV_CATALOG_STEM}.*"):
+            if path.suffix in (".csv", SUFFIX):
+                names.add(path.name[: -len(DV_CATALOG_STEM + path.suffix)].upper())
+        return sorted(names)
+
+    def dv_catalog(self, template: str) -> RuleCatalog:
+        """One template's DV catalog rows (empty when the scan has none)."""
+        catalog = self._dv.get(template)
+        if catalog is None:
+            path = self.scan_root / f"{template.lower()}{DV_CATALOG_STEM}.csv"
+            rows: Iterable[dict] = ()
+            if path.exists() or current_binary(path) is not None:
+                rows = iter_records(path)
+            catalog = self._dv[template] = RuleCatalog(rows, template=template)
+        return catalog
+
+    def sheet_dv_rows(self, key: SheetKey) -> List[dict]:
+        """DV rows of one (template, version, sheet)."""
+        template, version, sheet = key
+        if self._dv_records is not None:
+            return self._dv_records.get(key, [])
+        if template not in self._dv:
+            conn = self._warehouse_table("dvs")
+            if conn is not None:
+                return scan_warehouse.select(conn, "dvs", template, version, sheet)
+        return [
+            row
+            for row in self.dv_catalog(template)
+            if row["version"] == version and row["sheet"] == sheet
+        ]
+
+    def dv_records(self) -> Dict[SheetKey, List[dict]]:
+        """Every template's DV rows per (template, version, sheet)."""
+        if self._dv_records is None:
+            self._dv_records = {}
+            for template in self.dv_templates():
+                self._dv_records.update(_by_sheet(self.dv_catalog(template), template))
+        return self._dv_records
+
+
+def artifacts_for(scan_root: Path) -> ScanArtifacts:
+    """The process-wide ScanArtifacts of scan_root."""
+    key = scan_root.resolve()
+    if key not in _LOADED:
+        _LOADED[key] = ScanArtifacts(scan_root)
+    return _LOADED[key]
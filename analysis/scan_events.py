@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Structured JSONL event log for long analysis runs (--events).
+
+Every line is one event, flushed as soon as the file or sheet it describes is done:
+
+{"ts": ..., "elapsed_s": ..., "source": "run_scan", "event": "sheet", "workbook": ...,
+ "sheet": ..., "formula_cells": ..., "dv_rules": ..., "cf_rules": ..., "bytes_inflated": ...}
+
+Events:
+- start: once, when the log is opened
+- sheet: one per processed sheet (formula_cells, dv_rules, cf_rules, bytes_inflated,
+  duration_s where the script can time sheets separately)
+- file: one per workbook (same counters plus sheets, duration_s and cache hit/miss)
+- summary: once, on close; run totals with formula cells/s, files/s and bytes/s
+  throughput
+
+Run totals are taken from the file events, so sheet events can be emitted or not without
+changing them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import IO, Dict, Optional
+
+COUNTERS = ("formula_cells", "dv_rules", "cf_rules", "bytes_inflated")
+CACHE_TOTALS = {"hit": "cache_hits", "miss": "cache_misses"}
+
+
+def add_events_argument(parser: argparse.ArgumentParser, default_name: str) -> None:
+    """Add --events [PATH]; a bare --events writes default_name into the output directory."""
+    parser.add_argument(
+        "--events",
+        type=Path,
+        nargs="?",
+        const=True,
+        default=None,
+        metavar="PATH",
+        help=(
+            "Write per-file/per-sheet JSONL events and a throughput summary "
+            f"(default: {default_name} in the output directory)."
+        ),
+    )
+
+
+def event_log_from_args(args: argparse.Namespace, default: Path, source: str) -> "EventLog":
+    path = default if args.events is True else args.events
+    return EventLog(path, source)
+
+
+class EventLog:
+    """JSONL events plus running totals; with path None only the totals are kept."""
+
+    def __init__(self, path: Optional[Path], source: str) -> None:
+        self.path = path
+        self.source = source
+        self.totals: Dict[str, float] = dict.fromkeys(
+            ("files", "sheets", *COUNTERS, "duration_s", *CACHE_TOTALS.values()), 0
+        )
+        self._start = time.perf_counter()
+        self._fh: Optional[IO[str]] = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # a fresh inode: in a deduplicated scan the old log is a shared hardlink
+            if path.exists():
+                path.unlink()
+            self._fh = path.open("w", encoding="utf-8")
+        self.emit("start")
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def enabled(self) -> bool:
+        return self._fh is not None
+
+    def emit(self, event: str, **fields: object) -> None:
+        if self._fh is None:
+            return
+        payload = {
+            "ts": round(time.time(), 3),
+            "elapsed_s": round(time.perf_counter() - self._start, 6),
+            "source": self.source,
+            "event": event,
+            **fields,
+        }
+        self._fh.write(json.dumps(payload, ensure_ascii=False))
+        self._fh.write("\n")
+        self._fh.flush()
+
+    def sheet(self, workbook: str, sheet: str, **fields: object) -> None:
+        self.totals["sheets"] += 1
+        self.emit("sheet", workbook=workbook, sheet=sheet, **_counters(fields))
+
+    def file(
+        self,
+        workbook: str,
+        duration_s: float,
+        cache: Optional[str] = None,
+        **fields: object,
+    ) -> None:
+        """Record one finished workbook; cache is "hit", "miss" or None (no cache)."""
+        fields = _counters(fields)
+        self.totals["files"] += 1
+        self.totals["duration_s"] += duration_s
+        for key in COUNTERS:
+            self.totals[key] += fields[key]
+        if cache is not None:
+            self.totals[CACHE_TOTALS[cache]] += 1
+            fields["cache"] = cache
+        self.emit("file", workbook=workbook, duration_s=round(duration_s, 6), **fields)
+
+    def summary(self) -> Dict[str, float]:
+        elapsed = time.perf_counter() - self._start
+        summary = {key: int(value) for key, value in self.totals.items() if key != "duration_s"}
+        summary["duration_s"] = round(self.totals["duration_s"], 6)
+        summary["elapsed_s"] = round(elapsed, 6)
+        for key, unit in (
+            ("formula_cells", "formula_cells"),
+            ("files", "files"),
+            ("bytes_inflated", "bytes"),
+        ):
+            summary[f"{unit}_per_s"] = round(self.totals[key] / elapsed, 3) if elapsed else 0.0
+        return summary
+
+    def close(self) -> Dict[str, float]:
+        summary = self.summary()
+        if self._fh is not None:
+            self.emit("summary", **summary)
+            self._fh.close()
+            self._fh = None
+        return summary
+
+
+def _counters(fields: Dict[str, object]) -> Dict[str, object]:
+    return {**dict.fromkeys(COUNTERS, 0), **fields}
+
+
+def format_summary(summary: Dict[str, float]) -> str:
+    return (
+        f"{summary['files']} file(s), {summary['sheets']} sheet(s), "
+        f"{summary['formula_cells']} formula cell(s) in {summary['elapsed_s']:.1f}s: "
+        f"{summary['formula_cells_per_s']:.0f} formula cells/s, "
+        f"{summary['files_per_s']:.2f} files/s"
+    )
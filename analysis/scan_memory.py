@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory high-water marks per stage and workbook (--memprofile), via tracemalloc.
+
+A MemoryProfiler records, for each (workbook, stage):
+- peak_bytes: traced-memory high-water mark while the stage ran
+- peak_delta_bytes: that peak minus the traced memory on entry
+- net_bytes: memory still held when the stage ended
+- top: the allocation sites (file:line) holding the most new memory at stage end,
+  from a tracemalloc snapshot diff
+
+Grouping snapshots by site walks every live allocation, which dominates the profiling
+overhead when many objects are alive; --memprofile-top 0 records the peaks only.
+
+Stages nest (an inner stage's peak also counts for the enclosing one). Workbook-level
+stages recorded in process-pool workers are merged like PhaseTimer records; run-level
+stages use the empty workbook key. write() emits:
+
+{
+  "meta": {...},
+  "peak_bytes": ...,
+  "stages": {stage: {peak_bytes, peak_delta_bytes, net_bytes, calls, top}},
+  "workbooks": {"CMRT/RMI_CMRT_6.5.xlsx": {stage: {...}}}
+}
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sysconfig
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional
+
+try:
+    from analysis.scan_store import replacing
+except ImportError:
+    from scan_store import replacing
+
+ROOT = Path(__file__).resolve().parents[1]
+# site names are shown relative to the first of these that contains the file
+SITE_ROOTS = tuple(
+    Path(path)
+    for path in dict.fromkeys(
+        [str(ROOT)] + [sysconfig.get_paths()[key] for key in ("purelib", "platlib", "stdlib")]
+    )
+)
+RUN_KEY = ""
+DEFAULT_TOP = 10
+TRACE_FRAMES = 1
+# allocation sites left out of the top lists (the profiler's own and import machinery)
+IGNORED_SITES = (tracemalloc.__file__, __file__, "<frozen importlib._bootstrap", "<unknown>")
+
+StageRecord = Dict[str, object]
+
+# open stages of every profiler in this process; tracemalloc's peak is process-wide, so
+# each entry keeps the highest peak seen by its stage across inner reset_peak() calls
+_open_peaks: List[int] = []
+
+
+def add_memprofile_argument(parser: argparse.ArgumentParser, default: Path) -> None:
+    """Add --memprofile [PATH] and --memprofile-top N to an analysis CLI."""
+    parser.add_argument(
+        "--memprofile",
+        type=Path,
+        nargs="?",
+        const=default,
+        default=None,
+        metavar="PATH",
+        help=(
+            "Trace allocations (tracemalloc) and write per-stage/per-workbook peaks and top "
+            f"allocation sites as JSON (default path: {default}). Slows the run down."
+        ),
+    )
+    parser.add_argument(
+        "--memprofile-top",
+        type=int,
+        default=DEFAULT_TOP,
+        metavar="N",
+        help=f"Allocation sites kept per stage (default: {DEFAULT_TOP}; 0 = peaks only).",
+    )
+
+
+def profiler_from_args(args: argparse.Namespace) -> "MemoryProfiler":
+    return MemoryProfiler(enabled=args.memprofile is not None, top=args.memprofile_top)
+
+
+def site_name(frame: tracemalloc.Frame) -> str:
+    path = Path(frame.filename)
+    for root in SITE_ROOTS:
+        if root in path.parents:
+            path = path.relative_to(root)
+            break
+    return f"{path.as_posix()}:{frame.lineno}"
+
+
+class MemoryProfiler:
+    def __init__(self, enabled: bool = True, top: int = DEFAULT_TOP) -> None:
+        self.enabled = enabled
+        self.top = top
+        self.records: Dict[str, Dict[str, StageRecord]] = {}
+        self._started = enabled and not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start(TRACE_FRAMES)
+
+    def close(self) -> None:
+        """Stop tracing if this profiler started it."""
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @contextmanager
+    def stage(self, name: str, workbook: str = RUN_KEY) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        before = tracemalloc.take_snapshot() if self.top else None
+        entry, peak = tracemalloc.get_traced_memory()
+        if _open_peaks:
+            _open_peaks[-1] = max(_open_peaks[-1], peak)
+        tracemalloc.reset_peak()
+        _open_peaks.append(entry)
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(_open_peaks.pop(), peak)
+            if _open_peaks:
+                _open_peaks[-1] = max(_open_peaks[-1], peak)
+            top = self._top_sites(before, tracemalloc.take_snapshot()) if before else []
+            self.add(
+                name,
+                workbook,
+                peak_bytes=peak,
+                peak_delta_bytes=peak - entry,
+                net_bytes=current - entry,
+                calls=1,
+                top=top,
+            )
+
+    def _top_sites(
+        self, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot
+    ) -> List[Dict[str, object]]:
+        grown = [
+            stat
+            for stat in after.compare_to(before, "lineno")
+            if stat.size_diff > 0 and not stat.traceback[0].filename.startswith(IGNORED_SITES)
+        ]
+        grown.sort(key=lambda stat: stat.size_diff, reverse=True)
+        return [
+            {
+                "site": site_name(stat.traceback[0]),
+                "size_bytes": stat.size_diff,
+                "count": stat.count_diff,
+            }
+            for stat in grown[: self.top]
+        ]
+
+    def add(self, name: str, workbook: str = RUN_KEY, **values: object) -> None:
+        stages = self.records.setdefault(workbook, {})
+        record = stages.get(name)
+        if record is None:
+            stages[name] = dict(values)
+            return
+        for key in ("peak_bytes", "peak_delta_bytes"):
+            record[key] = max(record[key], values[key])
+        record["net_bytes"] += values["net_bytes"]
+        record["calls"] += values["calls"]
+        record["top"] = merge_sites([record["top"], values["top"]], self.top)
+
+    def merge(self, stages: Mapping[str, StageRecord], workbook: str) -> None:
+        for name, values in stages.items():
+            self.add(name, workbook, **values)
+
+    def workbook_stages(self, workbook: str = RUN_KEY) -> Dict[str, StageRecord]:
+        return self.records.get(workbook, {})
+
+    def stage_totals(self) -> Dict[str, StageRecord]:
+        totals = MemoryProfiler(enabled=False, top=self.top)
+        for stages in self.records.values():
+            totals.merge(stages, RUN_KEY)
+        return totals.workbook_stages()
+
+    def to_json(self, meta: Optional[Mapping[str, object]] = None) -> Dict[str, object]:
+        totals = self.stage_totals()
+        return {
+            "meta": dict(meta or {}),
+            "peak_bytes": max((int(r["peak_bytes"]) for r in totals.values()), default=0),
+            "stages": totals,
+            "workbooks": {
+                workbook: stages
+                for workbook, stages in sorted(self.records.items())
+                if workbook != RUN_KEY
+            },
+        }
+
+    def write(self, path: Path, meta: Optional[Mapping[str, object]] = None) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with replacing(path) as tmp, tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.to_json(meta), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+
+def merge_sites(site_lists: List[List[Dict[str, object]]], top: int) -> List[Dict[str, object]]:
+    merged: Dict[str, Dict[str, object]] = {}
+    for sites in site_lists:
+        for site in sites:
+            entry = merged.setdefault(
+                site["site"], {"site": site["site"], "size_bytes": 0, "count": 0}
+            )
+            entry["size_bytes"] += site["size_bytes"]
+            entry["count"] += site["count"]
+    return sorted(merged.values(), key=lambda site: site["size_bytes"], reverse=True)[:top]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared --profile option for the analysis CLIs.
+
+Modes:
+- cprofile: deterministic cProfile of the whole run (exact call counts, higher overhead)
+- stats: statistical profiler; samples the main thread's stack every SAMPLE_INTERVAL_S
+  of CPU time (SIGPROF) and turns the samples into the same pstats format, so long
+  openpyxl-heavy runs keep close to their normal speed. It cannot count calls: the
+  pstats call-count fields hold the number of samples with the function on the stack,
+  and the top report heads that column "samples" instead of "ncalls"
+
+Either way the run writes, next to its other outputs:
+- {name}-{mode}.pstats: load with pstats.Stats / snakeviz
+- {name}-{mode}-top.txt: the top --profile-top functions by cumulative time
+
+Only the main process is profiled; run_scan --jobs workers are not.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import marshal
+import pstats
+import signal
+import sys
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    from analysis.scan_store import replace_text, replacing
+except ImportError:
+    from scan_store import replace_text, replacing
+
+PROFILE_MODES = ("cprofile", "stats")
+DEFAULT_TOP = 40
+SAMPLE_INTERVAL_S = 0.005
+
+FuncKey = Tuple[str, int, str]
+# pstats' column header and its relabelling for SamplingProfiler reports
+SAMPLED_HEADER = ("   ncalls  tottime", "  samples  tottime")
+
+
+def add_profile_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help=(
+            "Profile the run (cprofile: deterministic; stats: sampling) and write a pstats "
+            "dump plus a top cumulative-time report into the output directory."
+        ),
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP,
+        metavar="N",
+        help=f"Functions listed in the text report (default: {DEFAULT_TOP}).",
+    )
+
+
+def _func_key(frame: FrameType) -> FuncKey:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class SamplingProfiler:
+    """SIGPROF stack sampler with cProfile.Profile's enable/disable/dump_stats interface."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._previous = None
+
+    def _sample(self, _signum: int, frame: Optional[FrameType]) -> None:
+        stack = []
+        while frame is not None:
+            stack.append(_func_key(frame))
+            frame = frame.f_back
+        if stack:
+            self.stacks[tuple(stack)] += 1
+
+    def enable(self) -> None:
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def disable(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+    def stats(self) -> Dict[FuncKey, tuple]:
+        """{func: (cc, nc, tt, ct, {caller: (cc, nc, tt, ct)})}, times in sampled seconds.
+
+        cc and nc are sample counts, not call counts; pstats has no other slot for them.
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        own_by_caller: Dict[FuncKey, Counter] = defaultdict(Counter)
+        total_by_caller: Dict[FuncKey, Counter] = defaultdict(Counter)
+        for stack, count in self.stacks.items():
+            own[stack[0]] += count
+            if len(stack) > 1:
+                own_by_caller[stack[0]][stack[1]] += count
+            # a recursive function counts once per sample
+            for func in set(stack):
+                total[func] += count
+            for callee, caller in set(zip(stack, stack[1:])):
+                total_by_caller[callee][caller] += count
+        step = self.interval
+        return {
+            func: (
+                samples,
+                samples,
+                own[func] * step,
+                samples * step,
+                {
+                    caller: (n, n, own_by_caller[func][caller] * step, n * step)
+                    for caller, n in total_by_caller[func].items()
+                },
+            )
+            for func, samples in total.items()
+        }
+
+    def dump_stats(self, path: Path) -> None:
+        with path.open("wb") as f:
+            marshal.dump(self.stats(), f)
+
+
+def write_profile_report(
+    pstats_path: Path, report_path: Path, top: int, title: str, sampled: bool = False
+) -> None:
+    stream = io.StringIO()
+    stats = pstats.Stats(str(pstats_path), stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    report = stream.getvalue()
+    if sampled:
+        # SamplingProfiler stores sample counts where pstats expects call counts
+        report = report.replace(SAMPLED_HEADER[0], SAMPLED_HEADER[1], 1)
+        samples = round(stats.total_tt / SAMPLE_INTERVAL_S)
+        report = report.replace(f"{stats.total_calls} function calls", f"{samples} samples", 1)
+        title += (
+            "\nsamples: CPU-time samples with the function on the stack, not calls;"
+            " percall is per sample"
+        )
+    replace_text(report_path, f"{title}\n{report}")
+
+
+@contextmanager
+def profiling(args: argparse.Namespace, out_dir: Path, name: str) -> Iterator[None]:
+    """Run the block under args.profile (if set) and write {name}-{mode}.* into out_dir."""
+    mode = getattr(args, "profile", None)
+    if mode is None:
+        yield
+        return
+    if mode == "stats" and not hasattr(signal, "setitimer"):
+        raise SystemExit("--profile stats needs SIGPROF/setitimer (POSIX); use cprofile")
+    profiler = cProfile.Profile() if mode == "cprofile" else SamplingProfiler()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        pstats_path = out_dir / f"{name}-{mode}.pstats"
+        report_path = out_dir / f"{name}-{mode}-top.txt"
+        with replacing(pstats_path) as tmp:
+            profiler.dump_stats(tmp)
+        title = f"{name} --profile {mode}: top {args.profile_top} by cumulative time"
+        if mode == "stats":
+            title += f" (sampled every {SAMPLE_INTERVAL_S * 1000:g} ms of CPU time)"
+        write_profile_report(
+            pstats_path, report_path, args.profile_top, title, sampled=mode == "stats"
+        )
+        print(f"Wrote {mode} profile to {pstats_path} and {report_path}", file=sys.stderr)
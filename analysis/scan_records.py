@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact binary twin of the record-shaped scan artifacts (xml-cf-report.jsonl and the
+{template}_rule_catalog_dv.csv catalogs), for consumers that only need some sheets.
+
+Layout of a .bin file (little-endian uint32 throughout, every section 4-byte aligned):
+- header: magic, format version, section sizes, and the size and SHA-256 of the text
+  file the records were written from (zero when written without one)
+- schema: JSON list of [field, kind]; kind is str (string id), int (the value),
+  list (start and count in the list table, items are string ids) or json (string id of
+  a JSON text); the last slot of every record holds the JSON of any fields outside the
+  schema
+- strings: offsets + UTF-8 data; every distinct string is stored once (interned)
+- groups: one (template, version, sheet, first record, record count) per key, in order
+  of first appearance, so a key's records are one contiguous slice
+- records: a fixed number of slots per record
+- lists: the list items
+
+RecordFile memory-maps the file and decodes only the groups that are asked for.
+ABSENT in a slot means the field was missing from the record. The JSONL/CSV files stay
+the human-readable export; iter_records() reads the .bin twin when the text file still
+has the size and SHA-256 recorded in its header and falls back to parsing the text
+otherwise, so touching, copying or restoring files does not change which one is read.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from analysis.scan_store import file_sha256
+except ImportError:
+    from scan_store import file_sha256
+
+MAGIC = b"SCANREC\0"
+FORMAT_VERSION = 2
+# magic, version, schema bytes, strings, string bytes, groups, records, slots, list items,
+# source size, source sha256
+HEADER = struct.Struct("<8s8IQ32s")
+NO_SOURCE = (0, bytes(32))
+ABSENT = 0xFFFFFFFF
+GROUP_SLOTS = 5
+KINDS = ("str", "int", "list", "json")
+SUFFIX = ".bin"
+
+Key = Tuple[str, str, str]
+Field = Tuple[str, str]
+SourceStamp = Tuple[int, bytes]
+
+# (path, size, mtime_ns) -> SHA-256, so one process hashes an unchanged text file once
+_DIGESTS: Dict[Tuple[Path, int, int], bytes] = {}
+
+
+def _padded(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _u32(values: Iterable[int]) -> array:
+    out = array("I", values)
+    if sys.byteorder != "little":
+        out.byteswap()
+    return out
+
+
+class RecordWriter:
+    """Collects records under their (template, version, sheet) key; write() saves them."""
+
+    def __init__(self, fields: Sequence[Field]) -> None:
+        for name, kind in fields:
+            if kind not in KINDS:
+                raise ValueError(f"{name}: unknown field kind {kind!r}")
+        self.fields = list(fields)
+        self._names = {name for name, _ in self.fields}
+        self._slots = sum(2 if kind == "list" else 1 for _, kind in self.fields) + 1
+        self._strings: Dict[str, int] = {}
+        self._groups: Dict[Key, array] = {}
+        self._lists = array("I")
+        self.records = 0
+
+    def _intern(self, text: str) -> int:
+        string_id = self._strings.get(text)
+        if string_id is None:
+            string_id = self._strings[text] = len(self._strings)
+        return string_id
+
+    def add(self, key: Key, record: Dict[str, object]) -> None:
+        slots = self._groups.get(key)
+        if slots is None:
+            slots = self._groups[key] = array("I")
+            for part in key:
+                self._intern(part)
+        for name, kind in self.fields:
+            value = record.get(name)
+            if name not in record:
+                slots.extend((ABSENT, 0) if kind == "list" else (ABSENT,))
+            elif kind == "str":
+                slots.append(self._intern(str(value)))
+            elif kind == "int":
+                slots.append(int(value))
+            elif kind == "list":
+                slots.extend((len(self._lists), len(value)))
+                self._lists.extend(self._intern(str(item)) for item in value)
+            else:
+                slots.append(self._intern(json.dumps(value, ensure_ascii=False)))
+        extra = {name: value for name, value in record.items() if name not in self._names}
+        slots.append(self._intern(json.dumps(extra, ensure_ascii=False)) if extra else ABSENT)
+        self.records += 1
+
+    def write(self, path: Path, source: Optional[Path] = None) -> None:
+        """Write atomically, so a reader that has the old file mapped keeps a valid view.
+
+        source is the finished text export the records mirror; its size and hash go in the
+        header for current_binary().
+        """
+        schema = _padded(json.dumps(self.fields).encode("utf-8"))
+        encoded = [text.encode("utf-8") for text in self._strings]
+        offsets = [0]
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        string_data = _padded(b"".join(encoded))
+        groups: List[int] = []
+        first = 0
+        for key, slots in self._groups.items():
+            count = len(slots) // self._slots
+            groups.extend([*(self._strings[part] for part in key), first, count])
+            first += count
+        header = HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            len(schema),
+            len(encoded),
+            len(string_data),
+            len(self._groups),
+            self.records,
+            self._slots,
+            len(self._lists),
+            *(NO_SOURCE if source is None else source_stamp(source)),
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            f.write(header)
+            f.write(schema)
+            f.write(_u32(offsets).tobytes())
+            f.write(string_data)
+            f.write(_u32(groups).tobytes())
+            for slots in self._groups.values():
+                f.write(_u32(slots).tobytes())
+            f.write(_u32(self._lists).tobytes())
+        os.replace(tmp, path)
+
+
+class CsvRecordTee:
+    """A csv.writer stand-in that also adds each row to a RecordWriter.
+
+    Values are stored the way csv.writer writes them, so the binary records equal the rows
+    csv.DictReader reads back from the CSV.
+    """
+
+    def __init__(self, writer, records: RecordWriter, header: List[str], template: str) -> None:
+        self.writer = writer
+        self.records = records
+        self.header = header
+        self.template = template
+
+    def writerow(self, row: Sequence[object]) -> None:
+        self.writer.writerow(row)
+        record = {
+            name: "" if value is None else str(value) for name, value in zip(self.header, row)
+        }
+        self.records.add((self.template, record["version"], record["sheet"]), record)
+
+    def writerows(self, rows: Iterable[Sequence[object]]) -> None:
+        for row in rows:
+            self.writerow(row)
+
+
+class RecordFile:
+    """A memory-mapped .bin file; records are decoded per (template, version, sheet)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            schema_len,
+            string_count,
+            string_bytes,
+            group_count,
+            record_count,
+            self._slots,
+            list_count,
+            source_size,
+            source_digest,
+        ) = HEADER.unpack_from(self._mm)
+        self.source: SourceStamp = (source_size, source_digest)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path}: not a version {FORMAT_VERSION} scan record file")
+        pos = HEADER.size
+        schema = json.loads(self._mm[pos : pos + schema_len].rstrip(b"\0"))
+        self.fields: List[Field] = [(name, kind) for name, kind in schema]
+        pos += schema_len
+        words = memoryview(self._mm).cast("I")
+        if sys.byteorder != "little":
+            words = _u32(words)
+        self._words = words
+        self._offsets = pos // 4
+        self._string_base = pos + (string_count + 1) * 4
+        self._strings: List[Optional[str]] = [None] * string_count
+        pos = self._string_base + string_bytes
+        self._groups_at = pos // 4
+        self._records_at = self._groups_at + group_count * GROUP_SLOTS
+        self._lists_at = self._records_at + record_count * self._slots
+        self.record_count = record_count
+        self._index: Dict[Key, Tuple[int, int]] = {}
+        for number in range(group_count):
+            at = self._groups_at + number * GROUP_SLOTS
+            template, version, sheet, first, count = words[at : at + GROUP_SLOTS]
+            key = (self._string(template), self._string(version), self._string(sheet))
+            self._index[key] = (first, count)
+        if self._lists_at + list_count > len(words):
+            self.close()
+            raise ValueError(f"{path}: truncated scan record file")
+
+    def __enter__(self) -> "RecordFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def close(self) -> None:
+        if isinstance(self._words, memoryview):
+            self._words.release()
+        self._mm.close()
+
+    def _string(self, string_id: int) -> str:
+        text = self._strings[string_id]
+        if text is None:
+            start, end = self._words[self._offsets + string_id : self._offsets + string_id + 2]
+            text = self._strings[string_id] = self._mm[
+                self._string_base + start : self._string_base + end
+            ].decode("utf-8")
+        return text
+
+    def keys(self) -> List[Key]:
+        return list(self._index)
+
+    def _record(self, number: int) -> Dict[str, object]:
+        at = self._records_at + number * self._slots
+        slots = self._words[at : at + self._slots]
+        record: Dict[str, object] = {}
+        pos = 0
+        for name, kind in self.fields:
+            value = slots[pos]
+            pos += 2 if kind == "list" else 1
+            if value == ABSENT:
+                continue
+            if kind == "str":
+                record[name] = self._string(value)
+            elif kind == "int":
+                record[name] = value
+            elif kind == "list":
+                start = self._lists_at + value
+                items = self._words[start : start + slots[pos - 1]]
+                record[name] = [self._string(item) for item in items]
+            else:
+                record[name] = json.loads(self._string(value))
+        if slots[-1] != ABSENT:
+            record.update(json.loads(self._string(slots[-1])))
+        return record
+
+    def records(self, key: Key) -> List[Dict[str, object]]:
+        first, count = self._index.get(key, (0, 0))
+        return [self._record(number) for number in range(first, first + count)]
+
+    def select(
+        self,
+        template: Optional[str] = None,
+        version: Optional[str] = None,
+        sheet: Optional[str] = None,
+    ) -> Iterator[Dict[str, object]]:
+        """Records of every key matching the given parts (None matches anything)."""
+        wanted = (template, version, sheet)
+        for key in self._index:
+            if all(want is None or want == part for want, part in zip(wanted, key)):
+                yield from self.records(key)
+
+
+def binary_path(path: Path) -> Path:
+    return path.with_suffix(SUFFIX)
+
+
+def source_stamp(path: Path) -> SourceStamp:
+    """(size, SHA-256) of a text export, as RecordWriter.write records it."""
+    info = path.stat()
+    key = (path.resolve(), info.st_size, info.st_mtime_ns)
+    digest = _DIGESTS.get(key)
+    if digest is None:
+        digest = _DIGESTS[key] = bytes.fromhex(file_sha256(path))
+    return info.st_size, digest
+
+
+def recorded_source(twin: Path) -> Optional[SourceStamp]:
+    """The source stamp in a .bin header, or None for another format version."""
+    with twin.open("rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, version, *_, size, digest = HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    return size, digest
+
+
+def current_binary(path: Path) -> Optional[Path]:
+    """The .bin twin of a JSONL/CSV artifact, unless it is missing or path has changed.
+
+    The twin is current when it was written from path as path is now (same size and
+    SHA-256); without path it is used as is.
+    """
+    twin = binary_path(path)
+    if not twin.exists():
+        return None
+    recorded = recorded_source(twin)
+    if recorded is None:
+        return None
+    if path.exists():
+        if recorded[0] != path.stat().st_size or recorded != source_stamp(path):
+            return None
+    return twin
+
+
+def _iter_text(path: Path) -> Iterator[Dict[str, object]]:
+    with path.open(encoding="utf-8", newline="" if path.suffix == ".csv" else None) as f:
+        if path.suffix == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_records(
+    path: Path,
+    template: Optional[str] = None,
+    version: Optional[str] = None,
+    sheet: Optional[str] = None,
+) -> Iterator[Dict[str, object]]:
+    """Records of a JSONL/CSV scan artifact, from its .bin twin when that is current.
+
+    Filters match the record key; the per-template CSV catalogs have no template
+    column, so their text fallback ignores the template filter.
+    """
+    twin = current_binary(path)
+    if twin is not None:
+        with RecordFile(twin) as records:
+            yield from records.select(template, version, sheet)
+        return
+    if not path.exists():
+        raise FileNotFoundError(f"Missing {path}")
+    wanted = {"template": template, "version": version, "sheet": sheet}
+    for record in _iter_text(path):
+        if all(
+            want is None or name not in record or record[name] == want
+            for name, want in wanted.items()
+        ):
+            yield record
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed object store shared by the analysis/scan-YYYY-MM-DD directories.
+
+Every file of a deduplicated scan directory is a hardlink to
+analysis/.scan-objects/{sha[:2]}/{sha}, so a CSV/TSV/JSONL that is byte-identical to
+one from an earlier scan takes no extra disk space, while readers (find_latest_scan,
+the review scripts) still see ordinary files. Each directory also gets a
+scan-manifest.json ({relative path: {sha256, size}}) for verify.
+
+Objects are made read-only because a hardlinked file is shared by every scan that
+references it: writing one in place would change all of them. run_scan therefore calls
+unshare_tree() on its output directory before writing, and every other writer into a
+scan directory (the review and text-diff scripts, the --timings/--memprofile/--profile
+reports) goes through replace_text()/replacing(), which write a temp file and
+os.replace() it over the target so the shared object is never touched.
+gc drops objects no scan directory links to any more.
+
+Usage:
+  python analysis/scan_store.py dedup                    # every analysis/scan-* directory
+  python analysis/scan_store.py dedup analysis/scan-2026-01-24
+  python analysis/scan_store.py unshare analysis/scan-2026-01-24
+  python analysis/scan_store.py verify analysis/scan-2026-01-24
+  python analysis/scan_store.py gc
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+ANALYSIS_ROOT = ROOT / "analysis"
+STORE_ROOT = ANALYSIS_ROOT / ".scan-objects"
+SCAN_PREFIX = "scan-"
+MANIFEST_NAME = "scan-manifest.json"
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def replacing(path: Path) -> Iterator[Path]:
+    """Yield a temp path next to path that replaces path once the block succeeds.
+
+    The new file gets its own inode, so a hardlinked (deduplicated) path is swapped out
+    rather than written through.
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+
+def replace_text(path: Path, text: str) -> None:
+    with replacing(path) as tmp:
+        tmp.write_text(text, encoding="utf-8")
+
+
+def iter_files(scan_dir: Path) -> Iterator[Path]:
+    """Regular files of a scan directory, manifest excluded, in a stable order."""
+    for path in sorted(scan_dir.rglob("*")):
+        if path.is_file() and not path.is_symlink() and path.name != MANIFEST_NAME:
+            yield path
+
+
+@dataclass
+class DedupStats:
+    files: int = 0
+    new_objects: int = 0
+    new_bytes: int = 0
+    shared_bytes: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} file(s): {self.new_objects} new object(s) "
+            f"({self.new_bytes / 1e6:.1f} MB), {self.shared_bytes / 1e6:.1f} MB shared"
+        )
+
+
+class ObjectStore:
+    def __init__(self, root: Path = STORE_ROOT) -> None:
+        self.root = root
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def add(self, path: Path, stats: DedupStats) -> str:
+        """Replace path by a hardlink to its object, storing the object if it is new."""
+        digest = file_sha256(path)
+        obj = self.object_path(digest)
+        size = path.stat().st_size
+        stats.files += 1
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            tmp = obj.with_name(f"{digest}.{os.getpid()}.tmp")
+            os.link(path, tmp)
+            os.replace(tmp, obj)
+            os.chmod(obj, READ_ONLY)
+            stats.new_objects += 1
+            stats.new_bytes += size
+            return digest
+        if not os.path.samefile(path, obj):
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            os.link(obj, tmp)
+            os.replace(tmp, path)
+        stats.shared_bytes += size
+        return digest
+
+    def dedup_tree(self, scan_dir: Path) -> DedupStats:
+        """Hardlink every file of scan_dir into the store and write its manifest."""
+        stats = DedupStats()
+        manifest: Dict[str, Dict[str, object]] = {}
+        for path in iter_files(scan_dir):
+            digest = self.add(path, stats)
+            manifest[path.relative_to(scan_dir).as_posix()] = {
+                "sha256": digest,
+                "size": path.stat().st_size,
+            }
+        (scan_dir / MANIFEST_NAME).write_text(
+            json.dumps(manifest, indent=1, sort_keys=True) + "\n", encoding="utf-8"
+        )
+        return stats
+
+    def gc(self) -> int:
+        """Remove objects that no scan directory links to; returns the bytes freed."""
+        freed = 0
+        if not self.root.exists():
+            return freed
+        for obj in self.root.glob("*/*"):
+            info = obj.stat()
+            if info.st_nlink == 1:
+                freed += info.st_size
+                obj.unlink()
+        return freed
+
+
+def unshare_tree(scan_dir: Path) -> int:
+    """Give every shared or read-only file of scan_dir its own writable copy.
+
+    Call before rewriting files in a deduplicated directory; returns the files copied.
+    """
+    copied = 0
+    if not scan_dir.exists():
+        return copied
+    for path in iter_files(scan_dir):
+        info = path.stat()
+        if info.st_nlink == 1 and info.st_mode & stat.S_IWUSR:
+            continue
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, path)
+        copied += 1
+    manifest = scan_dir / MANIFEST_NAME
+    if copied and manifest.exists():
+        manifest.unlink()
+    return copied
+
+
+def verify_tree(scan_dir: Path) -> List[str]:
+    """Files of scan_dir that are missing or no longer match its manifest."""
+    manifest = json.loads((scan_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    problems = []
+    for rel_path, entry in sorted(manifest.items()):
+        path = scan_dir / rel_path
+        if not path.exists():
+            problems.append(f"missing: {rel_path}")
+        elif file_sha256(path) != entry["sha256"]:
+            problems.append(f"changed: {rel_path}")
+    return problems
+
+
+def scan_dirs(paths: List[Path]) -> List[Path]:
+    if paths:
+        return paths
+    return sorted(
+        p for p in ANALYSIS_ROOT.iterdir() if p.is_dir() and p.name.startswith(SCAN_PREFIX)
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Deduplicate scan directories by content.")
+    parser.add_argument("command", choices=("dedup", "unshare", "verify", "gc"))
+    parser.add_argument(
+        "scan_dirs",
+        type=Path,
+        nargs="*",
+        help="Scan directories (default: every analysis/scan-* directory).",
+    )
+    parser.add_argument("--store", type=Path, default=STORE_ROOT, help="Object store root.")
+    args = parser.parse_args(argv)
+    store = ObjectStore(args.store)
+
+    if args.command == "gc":
+        print(f"Freed {store.gc() / 1e6:.1f} MB from {store.root}")
+        return 0
+    status = 0
+    for scan_dir in scan_dirs(args.scan_dirs):
+        if args.command == "dedup":
+            print(f"{scan_dir}: {store.dedup_tree(scan_dir)}")
+        elif args.command == "unshare":
+            print(f"{scan_dir}: {unshare_tree(scan_dir)} file(s) unshared")
+        else:
+            problems = verify_tree(scan_dir)
+            print(f"{scan_dir}: {'ok' if not problems else f'{len(problems)} problem(s)'}")
+            for problem in problems:
+                print(f"  {problem}")
+            status = status or int(bool(problems))
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
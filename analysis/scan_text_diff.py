@@ -5,18 +5,48 @@ Extract text diffs between template versions to support product-readable change
 Outputs:
 - analysis/scan-YYYY-MM-DD/{template}_text_diff.csv
 - analysis/scan-YYYY-MM-DD/{template}_text_diff_summary.csv
+- analysis/scan-YYYY-MM-DD/{template}_text_fingerprints.json
+- analysis/scan-YYYY-MM-DD/text-diff-memprofile.json with --memprofile (see scan_memory.py)
+- analysis/scan-YYYY-MM-DD/scan_text_diff-{cprofile|stats}.* with --profile (see scan_profile.py)
+
+Sheets are compared through sheet_fingerprint: identical sheets are skipped and only
+row blocks whose hashes differ are compared cell by cell.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import datetime as dt
 import re
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import openpyxl
 
+try:
+    from analysis.scan_memory import MemoryProfiler, add_memprofile_argument, profiler_from_args
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_store import replacing
+    from analysis.sheet_fingerprint import (
+        SheetFingerprint,
+        build_fingerprint,
+        changed_blocks,
+        split_row_blocks,
+        write_fingerprints,
+    )
+except ImportError:
+    from scan_memory import MemoryProfiler, add_memprofile_argument, profiler_from_args
+    from scan_profile import add_profile_argument, profiling
+    from scan_store import replacing
+    from sheet_fingerprint import (
+        SheetFingerprint,
+        build_fingerprint,
+        changed_blocks,
+        split_row_blocks,
+        write_fingerprints,
+    )
+
 ROOT = Path(__file__).resolve().parents[1]
 TEMPLATE_ROOT = ROOT / "app" / "templates"
 DATE_TAG = dt.date.today().isoformat()
@@ -59,6 +89,33 @@ def extract_sheet_text(ws) -> Dict[str, str]:
     return texts
 
 
+def index_sheet_text(ws) -> Tuple[Dict[int, Dict[str, str]], SheetFingerprint]:
+    blocks = split_row_blocks(extract_sheet_text(ws))
+    return blocks, build_fingerprint(blocks, "text")
+
+
+def diff_sheet_text(
+    base: Tuple[Dict[int, Dict[str, str]], SheetFingerprint],
+    current: Tuple[Dict[int, Dict[str, str]], SheetFingerprint],
+) -> List[Tuple[str, str, str]]:
+    """(cell, current_text, baseline_text) for cells whose text differs."""
+    base_blocks, base_fp = base
+    cur_blocks, cur_fp = current
+    if base_fp.digest == cur_fp.digest:
+        return []
+    changes = []
+    for block in changed_blocks(base_fp, cur_fp):
+        base_sheet_text = base_blocks.get(block, {})
+        cur_sheet_text = cur_blocks.get(block, {})
+        for cell in set(base_sheet_text.keys()) | set(cur_sheet_text.keys()):
+            base_val = base_sheet_text.get(cell, "")
+            cur_val = cur_sheet_text.get(cell, "")
+            if base_val == cur_val:
+                continue
+            changes.append((cell, cur_val, base_val))
+    return changes
+
+
 def load_versions(folder: Path) -> List[Tuple[str, Path]]:
     files = sorted(p for p in folder.glob("*.xlsx") if is_versioned_xlsx(p))
     versions = []
@@ -71,54 +128,64 @@ def load_versions(folder: Path) -> List[Tuple[str, Path]]:
 
 def write_csv(path: Path, header: List[str], rows: List[List[str]]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8", newline="") as f:
+    with replacing(path) as tmp, tmp.open("w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(header)
         writer.writerows(rows)
 
 
-def main() -> None:
-    OUT_ROOT.mkdir(parents=True, exist_ok=True)
+def run_text_diff(
+    template_root: Path, out_root: Path, memory: Optional[MemoryProfiler] = None
+) -> int:
+    """Write the text diff outputs for every template folder under template_root.
+
+    memory records load_workbook/index/diff stages per workbook when profiling.
+    """
+    memory = memory or MemoryProfiler(enabled=False)
+    out_root.mkdir(parents=True, exist_ok=True)
+    changed_total = 0
 
-    for template_dir in TEMPLATE_ROOT.iterdir():
+    for template_dir in template_root.iterdir():
         if not template_dir.is_dir():
             continue
         versions = load_versions(template_dir)
         if not versions:
             continue
         baseline_version, baseline_file = versions[-1]
-        baseline_wb = openpyxl.load_workbook(baseline_file, data_only=True, read_only=False)
-        baseline_texts = {
-            ws.title: extract_sheet_text(ws) for ws in baseline_wb.worksheets
+        workbook = f"{template_dir.name}/{baseline_file.name}"
+        with memory.stage("load_workbook", workbook):
+            baseline_wb = openpyxl.load_workbook(baseline_file, data_only=True, read_only=False)
+        with memory.stage("index_baseline", workbook):
+            baseline_texts = {ws.title: index_sheet_text(ws) for ws in baseline_wb.worksheets}
+        fingerprints: Dict[str, Dict[str, SheetFingerprint]] = {
+            baseline_version: {sheet: fp for sheet, (_, fp) in baseline_texts.items()}
         }
+        empty_sheet = ({}, build_fingerprint({}, "text"))
 
         diff_rows = []
         summary_counts: Dict[Tuple[str, str], int] = {}
 
         for version, file_path in versions[:-1]:
-            wb = openpyxl.load_workbook(file_path, data_only=True, read_only=False)
-            for ws in wb.worksheets:
-                sheet = ws.title
-                base_sheet_text = baseline_texts.get(sheet, {})
-                cur_sheet_text = extract_sheet_text(ws)
-                all_cells = set(base_sheet_text.keys()) | set(cur_sheet_text.keys())
-                changed = 0
-                for cell in all_cells:
-                    base_val = base_sheet_text.get(cell, "")
-                    cur_val = cur_sheet_text.get(cell, "")
-                    if base_val == cur_val:
-                        continue
-                    if not base_val and not cur_val:
-                        continue
-                    diff_rows.append(
-                        [sheet, version, baseline_version, cell, cur_val, base_val]
-                    )
-                    changed += 1
-                summary_counts[(sheet, version)] = changed
+            workbook = f"{template_dir.name}/{file_path.name}"
+            with memory.stage("load_workbook", workbook):
+                wb = openpyxl.load_workbook(file_path, data_only=True, read_only=False)
+            fingerprints[version] = {}
+            with memory.stage("diff", workbook):
+                for ws in wb.worksheets:
+                    sheet = ws.title
+                    current = index_sheet_text(ws)
+                    fingerprints[version][sheet] = current[1]
+                    changes = diff_sheet_text(baseline_texts.get(sheet, empty_sheet), current)
+                    for cell, cur_val, base_val in changes:
+                        diff_rows.append(
+                            [sheet, version, baseline_version, cell, cur_val, base_val]
+                        )
+                    summary_counts[(sheet, version)] = len(changes)
+                    changed_total += len(changes)
 
         diff_rows.sort(key=lambda r: (r[0], r[1], r[3]))
         write_csv(
-            OUT_ROOT / f"{template_dir.name.lower()}_text_diff.csv",
+            out_root / f"{template_dir.name.lower()}_text_diff.csv",
             ["sheet", "version", "baseline", "cell", "version_text", "baseline_text"],
             diff_rows,
         )
@@ -127,10 +194,33 @@ def main() -> None:
         for (sheet, version), count in sorted(summary_counts.items()):
             summary_rows.append([sheet, version, baseline_version, str(count)])
         write_csv(
-            OUT_ROOT / f"{template_dir.name.lower()}_text_diff_summary.csv",
+            out_root / f"{template_dir.name.lower()}_text_diff_summary.csv",
             ["sheet", "version", "baseline", "changed_cells"],
             summary_rows,
         )
+        write_fingerprints(
+            out_root / f"{template_dir.name.lower()}_text_fingerprints.json",
+            {template_dir.name: fingerprints},
+        )
+    return changed_total
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Text diffs between template versions.")
+    add_memprofile_argument(parser, OUT_ROOT / "text-diff-memprofile.json")
+    add_profile_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    memory = profiler_from_args(args)
+    with profiling(args, OUT_ROOT, "scan_text_diff"):
+        run_text_diff(TEMPLATE_ROOT, OUT_ROOT, memory)
+    if args.memprofile is not None:
+        memory.write(args.memprofile, {"date": DATE_TAG})
+        memory.close()
+        print(f"Wrote memory profile to {args.memprofile}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-phase timing records for the analysis scripts (run_scan --timings).
+
+A PhaseTimer accumulates, per workbook and phase, wall time, CPU time, bytes read,
+cells and rules processed, plus how many calls ran nested inside another phase
+(their time is already part of the enclosing phase's). Workbook-level phases are
+recorded where the work runs (including process-pool workers) and merged into the
+run's timer; run-level phases use the empty workbook key. With a MemoryProfiler
+attached, every phase is also a memory stage (see scan_memory.py). write() emits
+scan-timings.json:
+
+{
+  "meta": {...},
+  "total": {"wall_s": ..., "cpu_s": ...},
+  "phases": {phase: {wall_s, cpu_s, bytes_read, cells, rules, calls, nested}},
+  "workbooks": {"CMRT/RMI_CMRT_6.5.xlsx": {phase: {...}}}
+}
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional
+
+try:
+    from analysis.scan_memory import MemoryProfiler
+    from analysis.scan_store import replacing
+except ImportError:
+    from scan_memory import MemoryProfiler
+    from scan_store import replacing
+
+PHASE_FIELDS = ("wall_s", "cpu_s", "bytes_read", "cells", "rules", "calls", "nested")
+RUN_KEY = ""
+
+PhaseRecord = Dict[str, float]
+
+
+class PhaseTimer:
+    def __init__(self, memory: Optional[MemoryProfiler] = None) -> None:
+        self.memory = memory or MemoryProfiler(enabled=False)
+        self.records: Dict[str, Dict[str, PhaseRecord]] = {}
+        self._depth = 0
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextmanager
+    def phase(self, name: str, workbook: str = RUN_KEY) -> Iterator[Dict[str, int]]:
+        """Time a block; the yielded dict takes bytes_read/cells/rules counters."""
+        counters = {"bytes_read": 0, "cells": 0, "rules": 0}
+        nested = int(self._depth > 0)
+        with self.memory.stage(name, workbook):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self._depth += 1
+            try:
+                yield counters
+            finally:
+                self._depth -= 1
+                self.add(
+                    name,
+                    workbook,
+                    wall_s=time.perf_counter() - wall,
+                    cpu_s=time.process_time() - cpu,
+                    calls=1,
+                    nested=nested,
+                    **counters,
+                )
+
+    def add(self, name: str, workbook: str = RUN_KEY, **values: float) -> None:
+        record = self.records.setdefault(workbook, {}).setdefault(
+            name, dict.fromkeys(PHASE_FIELDS, 0)
+        )
+        for key, value in values.items():
+            record[key] += value
+
+    def merge(self, phases: Mapping[str, PhaseRecord], workbook: str) -> None:
+        for name, values in phases.items():
+            self.add(name, workbook, **values)
+
+    def workbook_phases(self, workbook: str = RUN_KEY) -> Dict[str, PhaseRecord]:
+        return self.records.get(workbook, {})
+
+    def phase_totals(self) -> Dict[str, PhaseRecord]:
+        totals: Dict[str, PhaseRecord] = {}
+        for phases in self.records.values():
+            for name, values in phases.items():
+                total = totals.setdefault(name, dict.fromkeys(PHASE_FIELDS, 0))
+                for key, value in values.items():
+                    total[key] += value
+        return totals
+
+    def to_json(self, meta: Optional[Mapping[str, object]] = None) -> Dict[str, object]:
+        return {
+            "meta": dict(meta or {}),
+            "total": {
+                "wall_s": _round(time.perf_counter() - self._wall),
+                "cpu_s": _round(time.process_time() - self._cpu),
+            },
+            "phases": _rounded(self.phase_totals()),
+            "workbooks": {
+                workbook: _rounded(phases)
+                for workbook, phases in sorted(self.records.items())
+                if workbook != RUN_KEY
+            },
+        }
+
+    def write(self, path: Path, meta: Optional[Mapping[str, object]] = None) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with replacing(path) as tmp, tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.to_json(meta), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+
+def _round(value: float) -> float:
+    return round(value, 6)
+
+
+def _rounded(phases: Mapping[str, PhaseRecord]) -> Dict[str, PhaseRecord]:
+    return {
+        name: {
+            key: _round(value) if key.endswith("_s") else int(value)
+            for key, value in record.items()
+        }
+        for name, record in phases.items()
+    }
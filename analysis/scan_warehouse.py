@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite warehouse of one scan directory (scan-warehouse.sqlite), filled by run_scan.
+
+Tables (every one has template, version, sheet columns and an index on them):
+- formulas: cell, formula ({template}_rule_catalog_formulas.csv rows)
+- dvs: the {template}_rule_catalog_dv.csv columns
+- cf_catalog: the {template}_rule_catalog_cf.csv columns (openpyxl view)
+- cf_rules: xml-cf-report records, standard and ext (source); formulas is a JSON list
+  and extra the JSON of any other record fields
+- sheet_states: state of every sheet in every version
+- sheet_diffs: {template}_sheet_diff_summary.csv (version vs baseline)
+- version_diffs: {template}_version_diff_pairs.csv (from_version -> version), only
+  with --diff-mode adjacent|all-pairs
+- sqref_rects: one rectangle per sqref fragment of dvs, cf_catalog and cf_rules
+  (source_table, source_id), so "which rules cover D5" is an indexed range query
+
+formulas.cell and the sqref columns are indexed too. Values are stored the way the CSVs
+hold them (text), except rule_index, the diff counts and the rectangle bounds.
+
+A sources table holds the name, size and SHA-256 of every scan file the rows were loaded
+from; current_warehouse() compares them with the files on disk, so the warehouse is only
+used while it matches the scan's text exports.
+
+Usage:
+  python analysis/scan_warehouse.py "SELECT version, sheet, sqref, formula1 FROM dvs
+      WHERE template = 'CMRT' AND type = 'list' AND sheet = 'Smelter List'"
+  python analysis/scan_warehouse.py --covering dvs CMRT 6.5 "Smelter List" D5
+  python analysis/scan_warehouse.py --scan-dir analysis/scan-2026-01-24 --tables
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from openpyxl.utils.cell import coordinate_to_tuple
+
+try:
+    from analysis.scan_records import source_stamp
+    from analysis.sqref_index import parse_sqref
+except ImportError:
+    from scan_records import source_stamp
+    from sqref_index import parse_sqref
+
+WAREHOUSE_NAME = "scan-warehouse.sqlite"
+KEY_COLUMNS = ("template", "version", "sheet")
+DIFF_COUNTS = [
+    "formula_added",
+    "formula_removed",
+    "formula_changed",
+    "dv_added",
+    "dv_removed",
+    "cf_added",
+    "cf_removed",
+]
+# table -> columns after the key columns; INTEGER columns are marked, the rest is TEXT
+TABLES: Dict[str, List[Tuple[str, str]]] = {
+    "formulas": [("cell", "TEXT"), ("formula", "TEXT")],
+    "dvs": [
+        (name, "TEXT")
+        for name in (
+            "sqref",
+            "type",
+            "operator",
+            "allowBlank",
+            "showErrorMessage",
+            "showInputMessage",
+            "errorTitle",
+            "error",
+            "promptTitle",
+            "prompt",
+            "formula1",
+            "formula2",
+        )
+    ],
+    "cf_catalog": [
+        (name, "TEXT")
+        for name in ("sqref", "type", "operator", "priority", "dxfId", "formulas")
+    ],
+    "cf_rules": [
+        ("source", "TEXT"),
+        ("ext_uri", "TEXT"),
+        ("sqref", "TEXT"),
+        ("rule_index", "INTEGER"),
+        ("type", "TEXT"),
+        ("priority", "TEXT"),
+        ("dxfId", "TEXT"),
+        ("operator", "TEXT"),
+        ("rule_id", "TEXT"),
+        ("formulas", "TEXT"),
+        ("extra", "TEXT"),
+    ],
+    "sheet_states": [("state", "TEXT")],
+    "sheet_diffs": [("baseline", "TEXT")] + [(name, "INTEGER") for name in DIFF_COUNTS],
+    "version_diffs": [("from_version", "TEXT")] + [(name, "INTEGER") for name in DIFF_COUNTS],
+    "sqref_rects": [
+        ("source_table", "TEXT"),
+        ("source_id", "INTEGER"),
+        ("min_col", "INTEGER"),
+        ("min_row", "INTEGER"),
+        ("max_col", "INTEGER"),
+        ("max_row", "INTEGER"),
+    ],
+}
+SQREF_TABLES = ("dvs", "cf_catalog", "cf_rules")
+# what run_scan rewrites per template pass; cf_rules comes from the xml-cf report
+TEMPLATE_TABLES = ("formulas", "dvs", "cf_catalog", "sheet_states", "sheet_diffs", "version_diffs")
+INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    "formulas": [KEY_COLUMNS, ("cell",)],
+    "dvs": [KEY_COLUMNS, ("sqref",)],
+    "cf_catalog": [KEY_COLUMNS, ("sqref",)],
+    "cf_rules": [KEY_COLUMNS, ("sqref",)],
+    "sheet_states": [KEY_COLUMNS],
+    "sheet_diffs": [KEY_COLUMNS],
+    "version_diffs": [KEY_COLUMNS],
+    "sqref_rects": [("source_table", *KEY_COLUMNS, "min_row", "max_row"), ("source_id",)],
+}
+CF_RECORD_COLUMNS = [name for name, _ in TABLES["cf_rules"] if name not in ("formulas", "extra")]
+BATCH_SIZE = 5000
+
+
+def _quote(name: str) -> str:
+    return f'"{name}"'
+
+
+def _columns(table: str) -> List[str]:
+    return [*KEY_COLUMNS, *(name for name, _ in TABLES[table])]
+
+
+class WarehouseWriter:
+    """Rows per table, inserted in batches; commit() makes them visible to readers.
+
+    Rows are replaced per template (clear), so --watch only rewrites what it rescanned.
+    create_indexes() is meant to run once the bulk of a full run is loaded; later
+    inserts keep the indexes up to date.
+    """
+
+    def __init__(self, path: Path, fresh: bool = False) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fresh:
+            for stale in (path, path.with_name(f"{path.name}-journal")):
+                stale.unlink(missing_ok=True)
+        self.conn = sqlite3.connect(path)
+        for table in TABLES:
+            columns = ", ".join(
+                [
+                    "id INTEGER PRIMARY KEY",
+                    *(f"{_quote(name)} TEXT" for name in KEY_COLUMNS),
+                    *(f"{_quote(name)} {kind}" for name, kind in TABLES[table]),
+                ]
+            )
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources (name TEXT PRIMARY KEY, size INTEGER, sha256 TEXT)"
+        )
+        self._columns = {table: _columns(table) for table in TABLES}
+        self._insert = {
+            table: (
+                f"INSERT INTO {table} (id, {', '.join(map(_quote, columns))}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 1))})"
+            )
+            for table, columns in self._columns.items()
+        }
+        self._next_id = {
+            table: (self.conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0) + 1
+            for table in TABLES
+        }
+        self._pending: Dict[str, List[Tuple[object, ...]]] = {table: [] for table in TABLES}
+
+    def __enter__(self) -> "WarehouseWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.create_indexes()
+        self.close()
+
+    def clear(self, table: str, template: Optional[str] = None) -> None:
+        """Drop the rows of one template (every row when template is None)."""
+        self._flush(table)
+        where, params = ("WHERE template = ?", (template,)) if template is not None else ("", ())
+        self.conn.execute(f"DELETE FROM {table} {where}", params)
+        if table in SQREF_TABLES:
+            self.conn.execute(
+                f"DELETE FROM sqref_rects WHERE source_table = ? {where.replace('WHERE', 'AND')}",
+                (table, *params),
+            )
+
+    def add(self, table: str, row: Dict[str, object]) -> None:
+        """Queue one row; row holds the key columns and any of the table's columns."""
+        row_id = self._next_id[table]
+        self._next_id[table] += 1
+        pending = self._pending[table]
+        pending.append((row_id, *(row.get(name) for name in self._columns[table])))
+        if table in SQREF_TABLES:
+            key = tuple(row[name] for name in KEY_COLUMNS)
+            for rect in parse_sqref(str(row.get("sqref") or "")):
+                self._add_rect(table, row_id, key, rect)
+        if len(pending) >= BATCH_SIZE:
+            self._flush(table)
+
+    def _add_rect(
+        self, table: str, row_id: int, key: Sequence[str], rect: Tuple[int, int, int, int]
+    ) -> None:
+        rects = self._pending["sqref_rects"]
+        rects.append((self._next_id["sqref_rects"], *key, table, row_id, *rect))
+        self._next_id["sqref_rects"] += 1
+
+    def add_cf_record(self, record: Dict[str, object]) -> None:
+        """Queue one xml-cf-report record as a cf_rules row."""
+        known = {*KEY_COLUMNS, *CF_RECORD_COLUMNS, "formulas"}
+        extra = {name: value for name, value in record.items() if name not in known}
+        row = {name: record.get(name) for name in (*KEY_COLUMNS, *CF_RECORD_COLUMNS)}
+        row["formulas"] = json.dumps(record.get("formulas", []), ensure_ascii=False)
+        row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+        self.add("cf_rules", row)
+
+    def record_source(self, path: Path) -> None:
+        """Note the finished scan file that rows were just loaded from (see current_warehouse)."""
+        size, digest = source_stamp(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sources (name, size, sha256) VALUES (?, ?, ?)",
+            (path.name, size, digest.hex()),
+        )
+
+    def _flush(self, table: str) -> None:
+        for name in (table, "sqref_rects"):
+            if self._pending[name]:
+                self.conn.executemany(self._insert[name], self._pending[name])
+                self._pending[name] = []
+
+    def commit(self) -> None:
+        for table in TABLES:
+            self._flush(table)
+        self.conn.commit()
+
+    def create_indexes(self) -> None:
+        self.commit()
+        for table, indexes in INDEXES.items():
+            for columns in indexes:
+                name = f"{table}_{'_'.join(columns)}"
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+                    f"({', '.join(map(_quote, columns))})"
+                )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class TableTee:
+    """A csv.writer stand-in that also queues each row into a warehouse table.
+
+    Values are stored the way csv.writer writes them (None as ""), like CsvRecordTee.
+    """
+
+    def __init__(
+        self, writer, warehouse: WarehouseWriter, table: str, header: List[str], template: str
+    ) -> None:
+        self.writer = writer
+        self.warehouse = warehouse
+        self.table = table
+        self.header = header
+        self.template = template
+
+    def writerow(self, row: Sequence[object]) -> None:
+        self.writer.writerow(row)
+        record: Dict[str, object] = {
+            name: "" if value is None else str(value) for name, value in zip(self.header, row)
+        }
+        record["template"] = self.template
+        self.warehouse.add(self.table, record)
+
+    def writerows(self, rows: Iterable[Sequence[object]]) -> None:
+        for row in rows:
+            self.writerow(row)
+
+
+def warehouse_path(scan_root: Path) -> Path:
+    return scan_root / WAREHOUSE_NAME
+
+
+def current_warehouse(scan_root: Path, *artifacts: Path) -> Optional[Path]:
+    """The scan's warehouse, unless it is missing or was not loaded from artifacts as they
+    are now (size and SHA-256 in its sources table); missing artifacts are not checked.
+    """
+    path = warehouse_path(scan_root)
+    if not path.exists():
+        return None
+    with closing(connect(path)) as conn:
+        try:
+            recorded = {
+                row["name"]: (row["size"], row["sha256"])
+                for row in conn.execute("SELECT name, size, sha256 FROM sources")
+            }
+        except sqlite3.OperationalError:
+            return None
+    for artifact in artifacts:
+        if not artifact.exists():
+            continue
+        size, digest = recorded.get(artifact.name, (None, None))
+        if size != artifact.stat().st_size or digest != source_stamp(artifact)[1].hex():
+            return None
+    return path
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Read-only connection whose rows are sqlite3.Row (usable as dicts)."""
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _where(
+    template: Optional[str], version: Optional[str], sheet: Optional[str], prefix: str = ""
+) -> Tuple[str, List[str]]:
+    clauses, params = [], []
+    for name, value in zip(KEY_COLUMNS, (template, version, sheet)):
+        if value is not None:
+            clauses.append(f"{prefix}{name} = ?")
+            params.append(value)
+    return (" AND ".join(clauses) or "1"), params
+
+
+def select(
+    conn: sqlite3.Connection,
+    table: str,
+    template: Optional[str] = None,
+    version: Optional[str] = None,
+    sheet: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """Rows of table for the given key parts (None matches anything), in load order."""
+    where, params = _where(template, version, sheet)
+    columns = ", ".join(map(_quote, _columns(table)))
+    cursor = conn.execute(f"SELECT {columns} FROM {table} WHERE {where} ORDER BY id", params)
+    return [dict(row) for row in cursor]
+
+
+def has_rows(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None
+
+
+def covering(
+    conn: sqlite3.Connection, table: str, template: str, version: str, sheet: str, cell: str
+) -> List[Dict[str, object]]:
+    """Rows of a sqref table (dvs, cf_catalog, cf_rules) whose sqref contains cell."""
+    if table not in SQREF_TABLES:
+        raise ValueError(f"{table} has no sqref column")
+    row, col = coordinate_to_tuple(cell.replace("$", ""))
+    where, params = _where(template, version, sheet, prefix="r.")
+    columns = ", ".join(f"t.{_quote(name)}" for name in _columns(table))
+    cursor = conn.execute(
+        f"SELECT DISTINCT t.id, {columns} FROM sqref_rects r "
+        f"JOIN {table} t ON t.id = r.source_id WHERE r.source_table = ? AND {where} "
+        "AND r.min_row <= ? AND r.max_row >= ? AND r.min_col <= ? AND r.max_col >= ? "
+        "ORDER BY t.id",
+        [table, *params, row, row, col, col],
+    )
+    return [{name: value for name, value in dict(hit).items() if name != "id"} for hit in cursor]
+
+
+def cf_record(row: Dict[str, object]) -> Dict[str, object]:
+    """The xml-cf-report record a cf_rules row was loaded from."""
+    record = {
+        name: row[name] for name in (*KEY_COLUMNS, *CF_RECORD_COLUMNS) if row[name] is not None
+    }
+    record["formulas"] = json.loads(str(row["formulas"]))
+    if row.get("extra"):
+        record.update(json.loads(str(row["extra"])))
+    return record
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    try:
+        from analysis.scan_artifacts import find_latest_scan
+    except ImportError:
+        from scan_artifacts import find_latest_scan
+
+    parser = argparse.ArgumentParser(description="Query the SQLite warehouse of a scan.")
+    parser.add_argument("sql", nargs="?", help="SQL to run against the warehouse.")
+    parser.add_argument(
+        "--scan-dir", type=Path, default=None, help="analysis/scan-YYYY-MM-DD directory."
+    )
+    parser.add_argument(
+        "--covering",
+        nargs=5,
+        metavar=("TABLE", "TEMPLATE", "VERSION", "SHEET", "CELL"),
+        help="Rows of dvs, cf_catalog or cf_rules whose sqref contains CELL.",
+    )
+    parser.add_argument("--tables", action="store_true", help="List tables and row counts.")
+    args = parser.parse_args(argv)
+    if not (args.sql or args.covering or args.tables):
+        parser.error("give SQL, --covering or --tables")
+
+    path = warehouse_path(args.scan_dir or find_latest_scan())
+    if not path.exists():
+        print(f"No warehouse at {path}; run analysis/run_scan.py first.", file=sys.stderr)
+        return 1
+    with closing(connect(path)) as conn:
+        if args.tables:
+            for table in TABLES:
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                print(f"{table}\t{count}")
+            return 0
+        if args.covering:
+            rows = covering(conn, *args.covering)
+        else:
+            rows = [dict(row) for row in conn.execute(args.sql)]
+    if rows:
+        print("\t".join(rows[0]))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row.values()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hierarchical (Merkle-style) sheet fingerprints shared by run_scan and scan_text_diff.
+
+A sheet fingerprint has three levels:
+- blocks: one hash per block of ROW_BLOCK_SIZE rows over the sheet's cells
+- kinds: one hash per kind (formulas/text from the block hashes, dv and cf from rule keys)
+- digest: one hash over the kind hashes
+
+Equal digests mean an identical sheet (skip in O(1)); otherwise only kinds and row
+blocks whose hashes differ need to be compared cell by cell.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    from analysis.scan_store import replacing
+except ImportError:
+    from scan_store import replacing
+
+ROW_BLOCK_SIZE = 64
+CELL_ROW_RE = re.compile(r"(\d+)$")
+
+
+def row_block(coordinate: str) -> int:
+    match = CELL_ROW_RE.search(coordinate)
+    return (int(match.group(1)) - 1) // ROW_BLOCK_SIZE if match else 0
+
+
+def split_row_blocks(cells: Mapping[str, str]) -> Dict[int, Dict[str, str]]:
+    blocks: Dict[int, Dict[str, str]] = {}
+    for coordinate, value in cells.items():
+        blocks.setdefault(row_block(coordinate), {})[coordinate] = value
+    return blocks
+
+
+def _digest(parts: Iterable[str]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+def hash_cells(cells: Mapping[str, str]) -> str:
+    return _digest(f"{coordinate}\x1f{value}" for coordinate, value in sorted(cells.items()))
+
+
+def hash_rules(keys: Iterable[Tuple[str, ...]]) -> str:
+    """Order-insensitive hash of rule keys, matching the set semantics of the diffs."""
+    return _digest("\x1f".join(key) for key in sorted(set(keys)))
+
+
+@dataclass(frozen=True)
+class SheetFingerprint:
+    digest: str
+    kinds: Dict[str, str] = field(default_factory=dict)
+    blocks: Dict[int, str] = field(default_factory=dict)
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "digest": self.digest,
+            "kinds": self.kinds,
+            "blocks": {str(block): h for block, h in sorted(self.blocks.items())},
+        }
+
+    @classmethod
+    def from_json(cls, payload: Mapping[str, object]) -> "SheetFingerprint":
+        blocks = {int(block): str(h) for block, h in dict(payload["blocks"]).items()}
+        return cls(str(payload["digest"]), dict(payload["kinds"]), blocks)
+
+
+def build_fingerprint(
+    cell_blocks: Mapping[int, Mapping[str, str]],
+    cell_kind: str,
+    rule_keys: Optional[Mapping[str, Iterable[Tuple[str, ...]]]] = None,
+) -> SheetFingerprint:
+    blocks = {block: hash_cells(cells) for block, cells in cell_blocks.items() if cells}
+    kinds = {cell_kind: _digest(f"{block}:{h}" for block, h in sorted(blocks.items()))}
+    for kind, keys in (rule_keys or {}).items():
+        kinds[kind] = hash_rules(keys)
+    digest = _digest(f"{kind}:{h}" for kind, h in sorted(kinds.items()))
+    return SheetFingerprint(digest, kinds, blocks)
+
+
+def changed_blocks(a: SheetFingerprint, b: SheetFingerprint) -> List[int]:
+    blocks = a.blocks.keys() | b.blocks.keys()
+    return sorted(block for block in blocks if a.blocks.get(block) != b.blocks.get(block))
+
+
+def write_fingerprints(
+    path: Path, fingerprints: Mapping[str, Mapping[str, Mapping[str, SheetFingerprint]]]
+) -> None:
+    """Write {template: {version: {sheet: fingerprint}}} as JSON."""
+    payload = {
+        "row_block_size": ROW_BLOCK_SIZE,
+        "templates": {
+            template: {
+                version: {sheet: fp.to_json() for sheet, fp in sheets.items()}
+                for version, sheets in versions.items()
+            }
+            for template, versions in fingerprints.items()
+        },
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with replacing(path) as tmp, tmp.open("w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+
+
+def load_fingerprints(path: Path) -> Dict[str, Dict[str, Dict[str, SheetFingerprint]]]:
+    with path.open("r", encoding="utf-8") as f:
+        payload = json.load(f)
+    return {
+        template: {
+            version: {sheet: SheetFingerprint.from_json(fp) for sheet, fp in sheets.items()}
+            for version, sheets in versions.items()
+        }
+        for template, versions in payload["templates"].items()
+    }
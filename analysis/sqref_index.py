@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spatial index over sqref ranges for DV/CF lookups ("which rules cover B5 / B5:D9").
+
+SqrefIndex parses every sqref fragment once into a rectangle and keeps the row
+intervals in a static centered interval tree: a query visits O(log n) nodes plus the
+rectangles whose rows match, then checks their columns. Whole-column (A:A) and
+whole-row (5:5) fragments span the sheet like Excel does.
+
+RuleCatalog wraps catalog rows (run_scan {template}_rule_catalog_dv.csv rows or
+xml-cf-report.jsonl records) and builds one SqrefIndex per (template, version, sheet)
+the first time that sheet is queried.
+
+Rectangle set algebra (union_rects / subtract_rects / intersect_rects) works on row
+bands rather than cells, so A:A minus A1:A10 costs the same as B2 minus B2. Results are
+canonical: the same covered cells always give the same rectangle list, whatever the
+sqref looked like (A5:A100 and A5:A50 A51:A100 normalise to one rectangle).
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+
+MAX_ROW = 1_048_576
+MAX_COL = 16_384
+
+T = TypeVar("T")
+# (min_col, min_row, max_col, max_row), 1-based and inclusive
+Rect = Tuple[int, int, int, int]
+SheetKey = Tuple[str, str, str]
+Interval = Tuple[int, int]
+
+
+def parse_sqref(sqref: str) -> List[Rect]:
+    """Rectangles of a space-separated sqref; unparseable fragments are skipped."""
+    rects = []
+    for part in sqref.replace("$", "").split():
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(part)
+        except (TypeError, ValueError):
+            continue
+        min_col, max_col = min_col or 1, max_col or MAX_COL
+        min_row, max_row = min_row or 1, max_row or MAX_ROW
+        # a reversed range (E9:A5) covers the same cells as A5:E9
+        min_col, max_col = sorted((min_col, max_col))
+        min_row, max_row = sorted((min_row, max_row))
+        rects.append((min_col, min_row, max_col, max_row))
+    return rects
+
+
+def _merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sorted, disjoint, non-adjacent intervals covering the same points."""
+    merged: List[Interval] = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def _subtract_intervals(left: List[Interval], right: List[Interval]) -> List[Interval]:
+    result = []
+    for lo, hi in left:
+        for cut_lo, cut_hi in right:
+            if cut_hi < lo or cut_lo > hi:
+                continue
+            if cut_lo > lo:
+                result.append((lo, cut_lo - 1))
+            lo = cut_hi + 1
+            if lo > hi:
+                break
+        if lo <= hi:
+            result.append((lo, hi))
+    return result
+
+
+def _intersect_intervals(left: List[Interval], right: List[Interval]) -> List[Interval]:
+    return _subtract_intervals(left, _subtract_intervals(left, right))
+
+
+def _band_algebra(
+    left: List[Rect],
+    right: List[Rect],
+    combine: Callable[[List[Interval], List[Interval]], List[Interval]],
+) -> List[Rect]:
+    """Apply combine to the column intervals of every row band of left and right.
+
+    The rows are cut wherever a rectangle starts or ends; inside one band every
+    rectangle either covers all rows or none, so the band is a 1-D problem. Bands with
+    the same columns that touch are merged again, which makes the output canonical.
+    """
+    rects = left + right
+    cuts = sorted({rect[1] for rect in rects} | {rect[3] + 1 for rect in rects})
+    bands: List[Tuple[int, int, List[Interval]]] = []
+    for first, end in zip(cuts, cuts[1:]):
+        columns = combine(
+            _merge_intervals((r[0], r[2]) for r in left if r[1] <= first <= r[3]),
+            _merge_intervals((r[0], r[2]) for r in right if r[1] <= first <= r[3]),
+        )
+        if not columns:
+            continue
+        if bands and bands[-1][1] == first - 1 and bands[-1][2] == columns:
+            bands[-1] = (bands[-1][0], end - 1, columns)
+        else:
+            bands.append((first, end - 1, columns))
+    return [
+        (min_col, first, max_col, last)
+        for first, last, columns in bands
+        for min_col, max_col in columns
+    ]
+
+
+def union_rects(left: Iterable[Rect], right: Iterable[Rect] = ()) -> List[Rect]:
+    """Canonical rectangles covering left or right; union_rects(x) normalises x."""
+    return _band_algebra(list(left), list(right), lambda a, b: _merge_intervals(a + b))
+
+
+def subtract_rects(left: Iterable[Rect], right: Iterable[Rect]) -> List[Rect]:
+    return _band_algebra(list(left), list(right), _subtract_intervals)
+
+
+def intersect_rects(left: Iterable[Rect], right: Iterable[Rect]) -> List[Rect]:
+    return _band_algebra(list(left), list(right), _intersect_intervals)
+
+
+def count_cells(rects: Iterable[Rect]) -> int:
+    """Cells covered by disjoint rectangles (e.g. the output of the functions above)."""
+    return sum(
+        (max_col - min_col + 1) * (max_row - min_row + 1)
+        for min_col, min_row, max_col, max_row in rects
+    )
+
+
+def format_rect(rect: Rect) -> str:
+    min_col, min_row, max_col, max_row = rect
+    if min_row == 1 and max_row == MAX_ROW:
+        return f"{get_column_letter(min_col)}:{get_column_letter(max_col)}"
+    if min_col == 1 and max_col == MAX_COL:
+        return f"{min_row}:{max_row}"
+    start = f"{get_column_letter(min_col)}{min_row}"
+    if (min_col, min_row) == (max_col, max_row):
+        return start
+    return f"{start}:{get_column_letter(max_col)}{max_row}"
+
+
+def format_sqref(rects: Iterable[Rect]) -> str:
+    return " ".join(format_rect(rect) for rect in rects)
+
+
+class _Node:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, entries: List[Tuple[int, int, int]]) -> None:
+        points = sorted(point for lo, hi, _ in entries for point in (lo, hi))
+        self.center = points[len(points) // 2]
+        here = [entry for entry in entries if entry[0] <= self.center <= entry[1]]
+        self.by_start = sorted(here)
+        self.by_end = sorted(here, key=lambda entry: entry[1], reverse=True)
+        left = [entry for entry in entries if entry[1] < self.center]
+        right = [entry for entry in entries if entry[0] > self.center]
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+
+class SqrefIndex(Generic[T]):
+    """Items keyed by their sqref; queries return items in insertion order."""
+
+    def __init__(self, items: Iterable[Tuple[str, T]]) -> None:
+        self.items: List[T] = []
+        # per rectangle: (min_col, max_col, item number)
+        self._columns: List[Tuple[int, int, int]] = []
+        rows: List[Tuple[int, int, int]] = []
+        for sqref, item in items:
+            for min_col, min_row, max_col, max_row in parse_sqref(sqref):
+                rows.append((min_row, max_row, len(self._columns)))
+                self._columns.append((min_col, max_col, len(self.items)))
+            self.items.append(item)
+        self._root: Optional[_Node] = _Node(rows) if rows else None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _row_matches(self, first: int, last: int) -> Iterable[int]:
+        """Rectangle numbers whose rows overlap first..last."""
+        node = self._root
+        stack = [node] if node is not None else []
+        while stack:
+            node = stack.pop()
+            if last < node.center:
+                for lo, _, rect in node.by_start:
+                    if lo > last:
+                        break
+                    yield rect
+                if node.left is not None:
+                    stack.append(node.left)
+            elif first > node.center:
+                for _, hi, rect in node.by_end:
+                    if hi < first:
+                        break
+                    yield rect
+                if node.right is not None:
+                    stack.append(node.right)
+            else:
+                for _, _, rect in node.by_start:
+                    yield rect
+                stack.extend(child for child in (node.left, node.right) if child is not None)
+
+    def _query(self, rect: Rect) -> List[int]:
+        min_col, min_row, max_col, max_row = rect
+        hits = set()
+        for number in self._row_matches(min_row, max_row):
+            lo, hi, item = self._columns[number]
+            if lo <= max_col and hi >= min_col:
+                hits.add(item)
+        return sorted(hits)
+
+    def covering(self, cell: str) -> List[T]:
+        """Items whose sqref contains the cell (A1 notation, $ allowed)."""
+        row, col = coordinate_to_tuple(cell.replace("$", ""))
+        return [self.items[item] for item in self._query((col, row, col, row))]
+
+    def overlapping(self, ref: str) -> List[T]:
+        """Items whose sqref shares at least one cell with ref (a range or sqref)."""
+        hits = set()
+        for rect in parse_sqref(ref):
+            hits.update(self._query(rect))
+        return [self.items[item] for item in sorted(hits)]
+
+
+class RuleCatalog(List[dict]):
+    """Catalog rows plus a lazily built SqrefIndex per (template, version, sheet).
+
+    Rows without a template column (the per-template CSV catalogs) use template.
+    """
+
+    def __init__(self, rows: Iterable[dict] = (), template: str = "") -> None:
+        super().__init__(rows)
+        self.template = template
+        self._indexes: Dict[SheetKey, SqrefIndex[dict]] = {}
+        self._grouped: Optional[Dict[SheetKey, List[dict]]] = None
+
+    def sheet_index(self, version: str, sheet: str, template: str = "") -> SqrefIndex[dict]:
+        key = (template or self.template, version, sheet)
+        index = self._indexes.get(key)
+        if index is None:
+            if self._grouped is None:
+                self._grouped = {}
+                for row in self:
+                    row_key = (row.get("template") or self.template, row["version"], row["sheet"])
+                    self._grouped.setdefault(row_key, []).append(row)
+            rows = self._grouped.get(key, [])
+            index = self._indexes[key] = SqrefIndex((row.get("sqref", ""), row) for row in rows)
+        return index
+
+    def covering(self, version: str, sheet: str, cell: str, template: str = "") -> List[dict]:
+        return self.sheet_index(version, sheet, template).covering(cell)
+
+    def overlapping(self, version: str, sheet: str, ref: str, template: str = "") -> List[dict]:
+        return self.sheet_index(version, sheet, template).overlapping(ref)
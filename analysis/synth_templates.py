@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generate scaled-up synthetic workbooks from a real template for benchmarks/profiling.
+
+The generator works on the sheet XML directly, so it can emit multi-million-row sheets
+without loading them into openpyxl. For each selected sheet (default: Smelter List and
+Product List):
+- the last data row (the last row shaped like the row above it, or --template-row) is
+  filled down N times; relative references move with each new row (Excel fill-down)
+  and shared formulas are continued by extending the master's ref
+- rows below it (footers) move down by N, as with an Excel row insert
+- dimension, merged cells, hyperlinks, DV/CF sqrefs and defined names that reach the
+  data row are stretched over the new rows
+- calcChain.xml is dropped; Excel rebuilds it on open
+
+Outputs keep the template's file name, so each --scale writes a tree that the scanners
+accept as a template root:
+  {out_dir}/x{scale}/{template}/{file}.xlsx
+
+Usage:
+  python analysis/synth_templates.py app/templates/CMRT/RMI_CMRT_6.5.xlsx --scale 10 --scale 100
+  python analysis/synth_templates.py FILE --sheet "Smelter List" --rows 50000 --out-dir /tmp/synth
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import shutil
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape, unescape
+
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.formula.translate import Translator
+
+try:
+    from analysis.xlsx_package import WorkbookPackage
+except ImportError:
+    from xlsx_package import WorkbookPackage
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_ROOT = ROOT / "analysis" / "synthetic"
+DEFAULT_SHEETS = ("Smelter List", "Product List")
+XML_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+ROW_RE = re.compile(r"<row\b(?:[^>]*/>|[^>]*>.*?</row>)", re.S)
+ROW_NUM_RE = re.compile(r'^<row\b[^>]*?\br="(\d+)"')
+CELL_RE = re.compile(r'<c\b[^>]*?\br="([A-Z]+)(\d+)"[^>]*?(?:/>|>.*?</c>)', re.S)
+CELL_STYLE_RE = re.compile(r'^<c\b[^>]*?\bs="(\d+)"')
+# cell/row r attributes, <f> elements and ref attributes inside the <f> start tag
+ROW_PART_RE = re.compile(
+    r'(?P<rowattr><row\b[^>]*?\br=")(?P<row>\d+)"'
+    r'|(?P<cellattr><c\b[^>]*?\br=")(?P<col>[A-Z]+)(?P<cellrow>\d+)"'
+    r"|(?P<fopen><f\b[^>]*?)(?:(?P<fclose>/>)|>(?P<ftext>.*?)</f>)",
+    re.S,
+)
+F_REF_RE = re.compile(r'\bref="([^"]*)"')
+F_SHARED_RE = re.compile(r'<f\b([^>]*\bt="shared"[^>]*?)(?:/>|>(.*?)</f>)', re.S)
+ATTR_RE = re.compile(r'\b(\w+)="([^"]*)"')
+CELL_REF_RE = re.compile(r"(?<![A-Za-z0-9_.])(\$?)([A-Za-z]{1,3})(\$?)(\d+)(?![A-Za-z0-9_(])")
+ROW_RANGE_RE = re.compile(r"^(\$?)(\d+):(\$?)(\d+)$")
+SHEET_REF_ATTR_RE = re.compile(r'(<(?:dimension|mergeCell|hyperlink|conditionalFormatting|'
+                               r'dataValidation|selection)\b[^>]*?\b(?:sqref|ref)=")([^"]*)(")')
+XM_SQREF_RE = re.compile(r"(<xm:sqref>)([^<]*)(</xm:sqref>)")
+DEFINED_NAME_RE = re.compile(r"(<definedName\b[^>]*>)([^<]*)(</definedName>)")
+
+# a piece is literal text or a row offset rendered relative to the output row
+Piece = Union[str, int]
+RowFn = Callable[[str, int, bool], List[Piece]]
+
+
+@dataclass
+class SheetPlan:
+    name: str
+    template_row: int
+    rows: int
+
+
+@dataclass
+class RowTemplate:
+    pieces: List[Piece] = field(default_factory=list)
+
+    def render(self, row: int) -> str:
+        return "".join(p if isinstance(p, str) else str(row + p) for p in self.pieces)
+
+
+def _merge(pieces: Iterable[Piece]) -> List[Piece]:
+    merged: List[Piece] = []
+    for piece in pieces:
+        if isinstance(piece, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += piece
+        elif piece != "":
+            merged.append(piece)
+    return merged
+
+
+def ref_pieces(ref: str, row_fn: RowFn) -> List[Piece]:
+    """Split an A1 reference list; row_fn(abs_marker, row, is_range_end) rewrites each row."""
+    match = ROW_RANGE_RE.match(ref)
+    if match:
+        return [
+            match.group(1),
+            *row_fn(match.group(1), int(match.group(2)), False),
+            ":" + match.group(3),
+            *row_fn(match.group(3), int(match.group(4)), True),
+        ]
+    pieces: List[Piece] = []
+    pos = 0
+    for match in CELL_REF_RE.finditer(ref):
+        is_end = match.start() > 0 and ref[match.start() - 1] == ":"
+        pieces.append(ref[pos : match.start()] + match.group(1) + match.group(2) + match.group(3))
+        pieces.extend(row_fn(match.group(3), int(match.group(4)), is_end))
+        pos = match.end()
+    pieces.append(ref[pos:])
+    return pieces
+
+
+def formula_pieces(formula: str, row_fn: RowFn, sheet: Optional[str]) -> List[Piece]:
+    """Rewrite the row numbers of range operands in a formula (unescaped, without '=').
+
+    With sheet set, only references to that sheet (unqualified ones count as local) are
+    rewritten; with sheet None every reference is.
+    """
+    tokens = Tokenizer("=" + formula).items
+    if "".join(token.value for token in tokens) != formula:
+        return [formula]
+    pieces: List[Piece] = []
+    for token in tokens:
+        if token.type != Token.OPERAND or token.subtype != Token.RANGE:
+            pieces.append(token.value)
+            continue
+        prefix, _, ref = token.value.rpartition("!")
+        if sheet is not None and prefix:
+            if prefix.strip("'").replace("''", "'") != sheet:
+                pieces.append(token.value)
+                continue
+        pieces.append(prefix + ("!" if prefix else ""))
+        pieces.extend(ref_pieces(ref, row_fn))
+    return pieces
+
+
+def insert_row_fn(after: int, count: int) -> RowFn:
+    """Excel row insert below `after`: later rows move down, ranges ending at it stretch."""
+
+    def row_fn(_abs: str, row: int, is_range_end: bool) -> List[Piece]:
+        if row > after or (is_range_end and row == after):
+            return [str(row + count)]
+        return [str(row)]
+
+    return row_fn
+
+
+def fill_row_fn(origin: int) -> RowFn:
+    """Excel fill-down from `origin`: relative rows become offsets of the output row."""
+
+    def row_fn(abs_marker: str, row: int, _is_range_end: bool) -> List[Piece]:
+        return [str(row)] if abs_marker else [row - origin]
+
+    return row_fn
+
+
+def _xml_formula_pieces(xml_text: str, row_fn: RowFn, sheet: Optional[str]) -> List[Piece]:
+    formula = unescape(xml_text, XML_ENTITIES)
+    return [
+        escape(piece) if isinstance(piece, str) else piece
+        for piece in formula_pieces(formula, row_fn, sheet)
+    ]
+
+
+def compile_row(row_xml: str, row_fn: RowFn, sheet: Optional[str]) -> RowTemplate:
+    pieces: List[Piece] = []
+    pos = 0
+    for match in ROW_PART_RE.finditer(row_xml):
+        pieces.append(row_xml[pos : match.start()])
+        pos = match.end()
+        if match.group("rowattr"):
+            pieces.append(match.group("rowattr"))
+            pieces.extend(row_fn("", int(match.group("row")), False))
+            pieces.append('"')
+        elif match.group("cellattr"):
+            pieces.append(match.group("cellattr") + match.group("col"))
+            pieces.extend(row_fn("", int(match.group("cellrow")), False))
+            pieces.append('"')
+        else:
+            start_tag = match.group("fopen")
+            ref = F_REF_RE.search(start_tag)
+            if ref:
+                pieces.append(start_tag[: ref.start(1)])
+                pieces.extend(ref_pieces(ref.group(1), row_fn))
+                pieces.append(start_tag[ref.end(1) :])
+            else:
+                pieces.append(start_tag)
+            if match.group("fclose"):
+                pieces.append("/>")
+            else:
+                pieces.append(">")
+                pieces.extend(_xml_formula_pieces(match.group("ftext"), row_fn, sheet))
+                pieces.append("</f>")
+    pieces.append(row_xml[pos:])
+    return RowTemplate(_merge(pieces))
+
+
+def rewrite_refs(text: str, regex: re.Pattern, row_fn: RowFn) -> str:
+    def replace(match: re.Match) -> str:
+        refs = " ".join(
+            RowTemplate(_merge(ref_pieces(ref, row_fn))).render(0)
+            for ref in match.group(2).split()
+        )
+        return f"{match.group(1)}{refs}{match.group(3)}"
+
+    return regex.sub(replace, text)
+
+
+def row_number(row_xml: str) -> int:
+    match = ROW_NUM_RE.match(row_xml)
+    return int(match.group(1)) if match else 0
+
+
+def row_signature(row_xml: str) -> Tuple[Tuple[str, str, bool], ...]:
+    signature = []
+    for match in CELL_RE.finditer(row_xml):
+        style = CELL_STYLE_RE.match(match.group(0))
+        signature.append((match.group(1), style.group(1) if style else "", "<f" in match.group(0)))
+    return tuple(signature)
+
+
+def find_template_row(rows: List[str]) -> int:
+    """The last row with the same cells/styles as the row directly above it."""
+    for idx in range(len(rows) - 1, 0, -1):
+        current, previous = rows[idx], rows[idx - 1]
+        if row_number(current) == row_number(previous) + 1 and row_signature(
+            current
+        ) == row_signature(previous):
+            return row_number(current)
+    raise ValueError("no repeated data row found; pass --template-row")
+
+
+def shared_masters(rows: List[str]) -> Dict[str, Tuple[str, str, str]]:
+    """si -> (master cell, ref, formula text) for shared formulas in the sheet."""
+    masters: Dict[str, Tuple[str, str, str]] = {}
+    for row_xml in rows:
+        for cell in CELL_RE.finditer(row_xml):
+            for f in F_SHARED_RE.finditer(cell.group(0)):
+                attrs = dict(ATTR_RE.findall(f.group(1)))
+                if "ref" in attrs and f.group(2):
+                    coord = cell.group(1) + cell.group(2)
+                    masters[attrs["si"]] = (coord, attrs["ref"], unescape(f.group(2), XML_ENTITIES))
+    return masters
+
+
+def _ref_rows(ref: str) -> Tuple[int, int]:
+    rows = [int(m.group(4)) for m in CELL_REF_RE.finditer(ref)]
+    return (min(rows), max(rows)) if rows else (0, 0)
+
+
+def fill_template(row_xml: str, template_row: int, masters: Dict[str, Tuple[str, str, str]]) -> str:
+    """The template row with its shared formulas made fill-down safe.
+
+    Masters whose ref covers the template row are continued by the new rows, so clones
+    become plain dependents; other dependents get their formula text written out.
+    """
+
+    def fix_cell(cell: re.Match) -> str:
+        coord = cell.group(1) + cell.group(2)
+
+        def fix_formula(f: re.Match) -> str:
+            attrs = dict(ATTR_RE.findall(f.group(1)))
+            master = masters.get(attrs.get("si", ""))
+            if master is None:
+                return f.group(0)
+            top, bottom = _ref_rows(master[1])
+            if top <= template_row <= bottom:
+                return f'<f t="shared" si="{attrs["si"]}"/>'
+            text = Translator("=" + master[2], origin=master[0]).translate_formula(coord)
+            return f"<f>{escape(text[1:])}</f>"
+
+        return F_SHARED_RE.sub(fix_formula, cell.group(0))
+
+    return CELL_RE.sub(fix_cell, row_xml)
+
+
+def write_scaled_sheet(out, xml: str, plan: SheetPlan, chunk_rows: int = 2000) -> None:
+    start = xml.index("<sheetData")
+    data_open = xml.index(">", start) + 1
+    if xml[data_open - 2] == "/":
+        raise ValueError(f"{plan.name}: sheet has no rows")
+    data_close = xml.index("</sheetData>", data_open)
+    rows = ROW_RE.findall(xml, data_open, data_close)
+    insert = insert_row_fn(plan.template_row, plan.rows)
+
+    head = rewrite_refs(xml[:data_open], SHEET_REF_ATTR_RE, insert)
+    tail = xml[data_close:]
+    tail = rewrite_refs(tail, SHEET_REF_ATTR_RE, insert)
+    tail = rewrite_refs(tail, XM_SQREF_RE, insert)
+    out.write(head.encode("utf-8"))
+
+    masters = shared_masters(rows)
+    template_xml = next((r for r in rows if row_number(r) == plan.template_row), None)
+    if template_xml is None:
+        raise ValueError(f"{plan.name}: row {plan.template_row} not found")
+    fill = compile_row(
+        fill_template(template_xml, plan.template_row, masters),
+        fill_row_fn(plan.template_row),
+        None,
+    )
+    for row_xml in rows:
+        out.write(compile_row(row_xml, insert, plan.name).render(0).encode("utf-8"))
+        if row_number(row_xml) != plan.template_row:
+            continue
+        for first in range(1, plan.rows + 1, chunk_rows):
+            last = min(first + chunk_rows, plan.rows + 1)
+            batch = "".join(fill.render(plan.template_row + k) for k in range(first, last))
+            out.write(batch.encode("utf-8"))
+    out.write(tail.encode("utf-8"))
+
+
+def scale_defined_names(workbook_xml: str, plans: List[SheetPlan]) -> str:
+    for plan in plans:
+        insert = insert_row_fn(plan.template_row, plan.rows)
+
+        def replace(match: re.Match, plan: SheetPlan = plan, insert: RowFn = insert) -> str:
+            formula = unescape(match.group(2), XML_ENTITIES)
+            if plan.name not in formula:
+                return match.group(0)
+            pieces = formula_pieces(formula, insert, plan.name)
+            text = escape(RowTemplate(_merge(pieces)).render(0))
+            return f"{match.group(1)}{text}{match.group(3)}"
+
+        workbook_xml = DEFINED_NAME_RE.sub(replace, workbook_xml)
+    return workbook_xml
+
+
+def drop_calc_chain(member: str, data: bytes) -> bytes:
+    text = data.decode("utf-8")
+    if member == "[Content_Types].xml":
+        text = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', "", text)
+    else:
+        text = re.sub(r'<Relationship\b[^>]*Target="[^"]*calcChain\.xml"[^>]*/>', "", text)
+    return text.encode("utf-8")
+
+
+def plan_sheets(
+    package: WorkbookPackage,
+    sheets: List[str],
+    rows: Optional[int],
+    scale: Optional[int],
+    template_row: Optional[int],
+) -> List[SheetPlan]:
+    plans = []
+    for name in sheets:
+        if name not in package.sheet_map:
+            continue
+        xml = package.sheet_bytes(name).decode("utf-8")
+        row = template_row or find_template_row(ROW_RE.findall(xml))
+        added = rows if rows is not None else (scale - 1) * row
+        plans.append(SheetPlan(name, row, added))
+    return plans
+
+
+def generate(
+    source: Path,
+    dest: Path,
+    sheets: List[str],
+    rows: Optional[int] = None,
+    scale: Optional[int] = None,
+    template_row: Optional[int] = None,
+) -> List[SheetPlan]:
+    with WorkbookPackage(source) as package:
+        plans = plan_sheets(package, sheets, rows, scale, template_row)
+        if not plans:
+            raise ValueError(f"{source.name}: none of {', '.join(sheets)} found")
+        by_path = {package.sheet_map[plan.name]: plan for plan in plans}
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f"{dest.name}.tmp")
+        with zipfile.ZipFile(package.file_stream()) as zin, zipfile.ZipFile(
+            tmp, "w", zipfile.ZIP_DEFLATED, compresslevel=1
+        ) as zout:
+            for info in zin.infolist():
+                member = info.filename
+                if member == "xl/calcChain.xml":
+                    continue
+                if member in by_path:
+                    xml = package.sheet_bytes(by_path[member].name).decode("utf-8")
+                    with zout.open(member, "w", force_zip64=True) as out:
+                        write_scaled_sheet(out, xml, by_path[member])
+                    continue
+                data = zin.read(member)
+                if member == "xl/workbook.xml":
+                    data = scale_defined_names(data.decode("utf-8"), plans).encode("utf-8")
+                elif member in ("[Content_Types].xml", "xl/_rels/workbook.xml.rels"):
+                    data = drop_calc_chain(member, data)
+                zout.writestr(info, data)
+        shutil.move(str(tmp), str(dest))
+    return plans
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scale a template up for benchmarks.")
+    parser.add_argument("source", type=Path, nargs="+", help="Template xlsx file(s).")
+    parser.add_argument(
+        "--sheet",
+        action="append",
+        default=None,
+        help=f"Sheet to grow (repeatable; default: {', '.join(DEFAULT_SHEETS)}).",
+    )
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument(
+        "--scale",
+        type=int,
+        action="append",
+        help="Grow each sheet to ~N times its rows (repeatable, e.g. 10, 100, 1000).",
+    )
+    size.add_argument("--rows", type=int, help="Add exactly this many rows per sheet.")
+    parser.add_argument(
+        "--template-row",
+        type=int,
+        default=None,
+        help="Row to fill down (default: last row shaped like the row above it).",
+    )
+    parser.add_argument("--out-dir", type=Path, default=OUT_ROOT)
+    args = parser.parse_args(argv)
+    if args.scale and min(args.scale) < 2:
+        parser.error("--scale must be >= 2")
+    if args.rows is not None and args.rows < 1:
+        parser.error("--rows must be >= 1")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    sheets = args.sheet or list(DEFAULT_SHEETS)
+    runs = [(f"x{scale}", None, scale) for scale in args.scale] if args.scale else [
+        (f"plus{args.rows}", args.rows, None)
+    ]
+    for source in args.source:
+        for label, rows, scale in runs:
+            dest = args.out_dir / label / source.parent.name / source.name
+            plans = generate(source, dest, sheets, rows, scale, args.template_row)
+            grown = ", ".join(f"{p.name} +{p.rows} rows after row {p.template_row}" for p in plans)
+            print(f"Wrote {dest} ({grown})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+import os
+import unittest
+
+import analysis.benchmark_scan as benchmark_scan
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_check_against_baseline_flags_regressions(self):
+        baseline = {
+            "tolerance": 0.25,
+            "workbooks": ["CMRT/RMI_CMRT_6.5.xlsx"],
+            "stages": {
+                "load_workbook": {"normalized": 40.0},
+                "xml_cf_report": {"normalized": 10.0, "tolerance": 0.5},
+                "iter_data_validations": {"normalized": 0.01},
+            },
+        }
+        results = {
+            "calibration_s": 0.3,
+            "workbooks": ["CMRT/RMI_CMRT_6.5.xlsx"],
+            "stages": {
+                "load_workbook": {"normalized": 52.0},
+                "xml_cf_report": {"normalized": 14.0},
+                "iter_data_validations": {"normalized": 0.05},
+            },
+        }
+        ok, lines = benchmark_scan.check_against_baseline(results, baseline)
+        self.assertFalse(ok)
+        self.assertIn("REGRESSION", lines[0])
+        self.assertTrue(lines[1].endswith("ok"))
+        self.assertTrue(lines[2].endswith("ok"))
+
+    def test_slow_stages_are_opt_in(self):
+        quick = benchmark_scan.parse_args([]).stages.split(",")
+        self.assertEqual(quick, list(benchmark_scan.DEFAULT_STAGES))
+        self.assertNotIn("docs_rule_check", quick)
+        full = benchmark_scan.parse_args(["--full"]).stages.split(",")
+        self.assertEqual(full, list(benchmark_scan.STAGES))
+        picked = benchmark_scan.parse_args(["--stages", "scan_text_diff"]).stages
+        self.assertEqual(picked, "scan_text_diff")
+
+    @unittest.skipUnless(os.environ.get("RUN_BENCHMARKS"), "set RUN_BENCHMARKS=1 to run")
+    def test_stages_within_committed_baseline(self):
+        self.assertEqual(benchmark_scan.main([]), 0)
@@ -0,0 +1,49 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import analysis.compare_timings as compare_timings
+import analysis.scan_timings as scan_timings
+
+
+class TestCompareTimings(unittest.TestCase):
+    def test_runs_line_up_stages_and_files_with_threshold(self):
+        def timings(load_s, extract_s, workbooks):
+            timer = scan_timings.PhaseTimer()
+            for workbook in workbooks:
+                timer.add("extract_openpyxl", workbook, wall_s=extract_s, calls=1)
+                timer.add("load_workbook", workbook, wall_s=load_s, calls=1, nested=1)
+            timer.add("diff", wall_s=1.0, calls=1)
+            return timer
+
+        with tempfile.TemporaryDirectory() as tmp:
+            before_dir, after_dir = Path(tmp) / "scan-2026-01-24", Path(tmp) / "scan-2026-10-18"
+            timings(1.0, 2.0, ["CMRT/RMI_CMRT_6.4.xlsx", "CMRT/RMI_CMRT_6.5.xlsx"]).write(
+                before_dir / "scan-timings.json"
+            )
+            timings(1.05, 2.6, ["CMRT/RMI_CMRT_6.5.xlsx", "CMRT/RMI_CMRT_6.6.xlsx"]).write(
+                after_dir / "scan-timings.json"
+            )
+            before = compare_timings.load_run(before_dir)
+            after = compare_timings.load_run(after_dir)
+            with mock.patch("sys.stdout", io.StringIO()) as out:
+                status = compare_timings.main([str(before_dir), str(after_dir)])
+        self.assertEqual(after.files["CMRT/RMI_CMRT_6.5.xlsx"], 2.6)
+        stages, files = compare_timings.compare_runs(before, after)
+        by_name = {change.name: change for change in stages}
+        self.assertEqual(by_name["extract_openpyxl"].status, "slower")
+        self.assertEqual(by_name["load_workbook"].status, "same")
+        self.assertEqual(by_name["diff"].status, "same")
+        self.assertEqual(
+            [(change.name, change.status) for change in files],
+            [
+                ("CMRT/RMI_CMRT_6.6.xlsx", "new"),
+                ("CMRT/RMI_CMRT_6.4.xlsx", "gone"),
+                ("CMRT/RMI_CMRT_6.5.xlsx", "slower"),
+            ],
+        )
+        self.assertEqual(files[2].where, "extract_openpyxl +0.600s")
+        self.assertEqual(status, 1)
+        self.assertIn("Summary: 2 slower, 0 faster, 1 new, 1 gone", out.getvalue())
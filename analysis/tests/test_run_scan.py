@@ -1,9 +1,17 @@
+import argparse
+import io
+import os
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import analysis.run_scan as run_scan
+import analysis.scan_events as scan_events
+import analysis.scan_memory as scan_memory
+import analysis.scan_timings as scan_timings
 import analysis.scan_text_diff as scan_text_diff
+from analysis.tests.workbooks import make_workbook
 
 
 class TestVersionParsing(unittest.TestCase):
@@ -48,6 +56,61 @@ class TestDiffSummary(unittest.TestCase):
         self.assertEqual(diff["Sheet1"]["formula_removed"], 0)
         self.assertEqual(diff["Sheet1"]["formula_changed"], 1)
 
+    def test_diff_engine_reuses_baseline_index(self):
+        dv = {"sqref": "B1:B5", "type": "list", "operator": "", "formula1": "$L$1", "formula2": ""}
+        cf = {"sqref": "C1", "type": "expression", "operator": "", "formulas": "C1=1"}
+        baseline = ({"S": {"A1": "1", "A2": "2"}}, {"S": [dv]}, {"S": [cf]})
+        baseline_index = run_scan.index_version(*baseline)
+        engine = run_scan.DiffEngine(baseline_index)
+        self.assertEqual(engine.diff(baseline_index), {"S": run_scan.NO_CHANGES})
+        self.assertEqual(engine.diff(run_scan.index_version(*baseline)), {"S": run_scan.NO_CHANGES})
+
+        current = (
+            {"S": {"A2": "3", "A3": "4"}, "New": {"A1": "1"}},
+            {"S": [dict(dv, sqref="B1:B9")]},
+            {"S": [cf]},
+        )
+        diff = engine.diff(run_scan.index_version(*current))
+        self.assertEqual(list(diff), ["S", "New"])
+        self.assertEqual(
+            diff["S"],
+            dict(
+                run_scan.NO_CHANGES,
+                formula_added=1,
+                formula_removed=1,
+                formula_changed=1,
+                dv_added=1,
+                dv_removed=1,
+            ),
+        )
+        self.assertEqual(diff["New"]["formula_added"], 1)
+        self.assertEqual(diff, run_scan.build_diff_summary(*baseline, *current))
+
+    def test_diff_modes_and_change_matrix(self):
+        versions = ["6.1", "6.22", "6.4"]
+        self.assertEqual(
+            run_scan.diff_pairs(versions, "adjacent"), [("6.1", "6.22"), ("6.22", "6.4")]
+        )
+        self.assertEqual(
+            run_scan.diff_pairs(versions, "baseline"),
+            [("6.4", "6.1"), ("6.4", "6.22"), ("6.4", "6.4")],
+        )
+        pairs = run_scan.diff_pairs(versions, "all-pairs")
+        self.assertEqual(pairs, [("6.1", "6.22"), ("6.1", "6.4"), ("6.22", "6.4")])
+
+        index = {
+            "6.1": run_scan.index_version({"S": {"A1": "1"}}, {}, {}),
+            "6.22": run_scan.index_version({"S": {"A1": "2"}}, {}, {}),
+            "6.4": run_scan.index_version({"S": {"A1": "2", "A2": "3"}}, {}, {}),
+        }
+        diffs = run_scan.build_version_diffs(index, pairs)
+        self.assertEqual(diffs[("6.1", "6.4")]["S"]["formula_changed"], 1)
+        self.assertEqual(diffs[("6.1", "6.4")]["S"]["formula_added"], 1)
+        self.assertEqual(
+            run_scan.build_change_matrix(versions, diffs),
+            [["6.1", "0", "1", "2"], ["6.22", "1", "0", "1"], ["6.4", "2", "1", "0"]],
+        )
+
 
 class TestConditionalFormattingExtensions(unittest.TestCase):
     def test_contains_cf_extension_detects_x14(self):
@@ -57,3 +120,171 @@ class TestConditionalFormattingExtensions(unittest.TestCase):
     def test_contains_cf_extension_ignores_plain_cf(self):
         xml_bytes = b"<worksheet><conditionalFormatting/></worksheet>"
         self.assertFalse(run_scan.contains_cf_extension(xml_bytes))
+
+    def test_stream_detection_finds_markers_split_across_chunks(self):
+        xml_bytes = b"<worksheet><extLst><ext><x14:conditionalFormatting/></ext></extLst></worksheet>"
+        with mock.patch.object(run_scan, "CF_EXTENSION_CHUNK", 30):
+            self.assertEqual(
+                run_scan.stream_contains_cf_extension(io.BytesIO(xml_bytes)), (True, 60)
+            )
+            self.assertEqual(
+                run_scan.stream_contains_cf_extension(io.BytesIO(b"<a>" * 40)), (False, 120)
+            )
+
+
+class TestScanTemplates(unittest.TestCase):
+    def test_scan_workbook_extracts_rules(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_workbook(Path(tmp) / "RMI_CMRT_6.5.xlsx")
+            scan = run_scan.scan_workbook("CMRT", "6.5", path)
+        self.assertEqual(scan.sheet_states, {"Declaration": "visible", "L": "hidden"})
+        self.assertEqual(scan.formulas["Declaration"], {"A3": "SUM(A1:A2)", "D1": "A1"})
+        self.assertEqual(scan.dvs["Declaration"][0]["sqref"], "B1:B5")
+        self.assertEqual(scan.cfs["Declaration"][0]["formulas"], 'C1=""')
+
+    def test_parallel_scan_matches_serial_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            templates = {
+                "CMRT": [
+                    ("6.4", make_workbook(root / "RMI_CMRT_6.4.xlsx", "SUM(A1:A1)")),
+                    ("6.5", make_workbook(root / "RMI_CMRT_6.5.xlsx")),
+                ],
+                "EMRT": [("2.1", make_workbook(root / "RMI_EMRT_2.1.xlsx", "A1*2"))],
+            }
+            serial = list(run_scan.scan_templates(templates, jobs=1))
+            parallel = list(run_scan.scan_templates(templates, jobs=2))
+        self.assertEqual(
+            [(s.template, s.version) for s in parallel],
+            [("CMRT", "6.4"), ("CMRT", "6.5"), ("EMRT", "2.1")],
+        )
+        self.assertEqual(serial, parallel)
+
+
+class TestScanCache(unittest.TestCase):
+    def test_unchanged_workbooks_are_served_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            templates = {
+                "CMRT": [
+                    ("6.4", make_workbook(root / "RMI_CMRT_6.4.xlsx", "SUM(A1:A1)")),
+                    ("6.5", make_workbook(root / "RMI_CMRT_6.5.xlsx")),
+                ]
+            }
+            first_cache = run_scan.ScanCache(root / "cache")
+            first = list(run_scan.scan_templates(templates, cache=first_cache))
+            self.assertEqual((first_cache.hits, first_cache.misses), (0, 2))
+
+            make_workbook(root / "RMI_CMRT_6.5.xlsx", "A1*3")
+            second_cache = run_scan.ScanCache(root / "cache")
+            with mock.patch.object(run_scan, "scan_workbook", wraps=run_scan.scan_workbook) as spy:
+                second = list(run_scan.scan_templates(templates, cache=second_cache))
+            self.assertEqual(spy.call_count, 1)
+            self.assertEqual(spy.call_args.args[:2], ("CMRT", "6.5"))
+        self.assertEqual((second_cache.hits, second_cache.misses), (1, 1))
+        self.assertEqual(second[0], first[0])
+        self.assertEqual(second[1].formulas["Declaration"]["A3"], "A1*3")
+
+    def test_cache_entries_are_per_engine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            templates = {"CMRT": [("6.5", make_workbook(root / "RMI_CMRT_6.5.xlsx"))]}
+            list(run_scan.scan_templates(templates, cache=run_scan.ScanCache(root / "cache")))
+            raw_cache = run_scan.ScanCache(root / "cache")
+            with mock.patch.object(run_scan, "scan_workbook", wraps=run_scan.scan_workbook) as spy:
+                list(run_scan.scan_templates(templates, engine="raw", cache=raw_cache))
+            self.assertEqual(spy.call_args.kwargs["engine"], "raw")
+            self.assertEqual((raw_cache.hits, raw_cache.misses), (0, 1))
+
+
+class TestWatch(unittest.TestCase):
+    def test_watcher_reports_settled_content_changes_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "CMRT").mkdir()
+            current = make_workbook(root / "CMRT" / "RMI_CMRT_6.5.xlsx")
+            watcher = run_scan.TemplateWatcher(root)
+            self.assertEqual(watcher.poll(), {})
+
+            stat = current.stat()
+            os.utime(current, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertEqual((watcher.poll(), watcher.poll()), ({}, {}))
+
+            added = make_workbook(root / "CMRT" / "RMI_CMRT_6.6.xlsx")
+            (root / "CMRT" / "~$RMI_CMRT_6.6.xlsx").write_bytes(b"lock")
+            self.assertEqual(watcher.poll(), {})
+            self.assertEqual(watcher.poll(), {"CMRT": frozenset([added])})
+
+            make_workbook(current, "A1*3")
+            added.unlink()
+            self.assertEqual(watcher.poll(), {"CMRT": frozenset([added])})
+            self.assertEqual(watcher.poll(), {"CMRT": frozenset([current])})
+
+    def test_rescan_rewrites_only_changed_workbook_tsvs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root, out = Path(tmp) / "templates", Path(tmp) / "out"
+            (root / "CMRT").mkdir(parents=True)
+            make_workbook(root / "CMRT" / "RMI_CMRT_6.4.xlsx", "SUM(A1:A1)")
+            current = make_workbook(root / "CMRT" / "RMI_CMRT_6.5.xlsx")
+            args = argparse.Namespace(
+                jobs=1, engine="openpyxl", skip_xml_cf=True, diff_mode="baseline"
+            )
+            ctx = run_scan.ScanContext(
+                args=args,
+                cache=run_scan.ScanCache(Path(tmp) / "cache"),
+                timer=scan_timings.PhaseTimer(),
+                memory=scan_memory.MemoryProfiler(enabled=False),
+                events=scan_events.EventLog(None, "test"),
+            )
+            outputs = {}
+            with mock.patch.object(run_scan, "OUT_ROOT", out), mock.patch.object(
+                run_scan, "TEMPLATE_ROOT", root
+            ):
+                run_scan.scan_and_write(ctx, run_scan.load_templates(), outputs)
+                make_workbook(current, "A1*3")
+                with mock.patch.object(
+                    run_scan, "write_sheet_tsv", wraps=run_scan.write_sheet_tsv
+                ) as spy:
+                    run_scan.scan_and_write(
+                        ctx, run_scan.load_templates(), outputs, frozenset([current])
+                    )
+            self.assertEqual({call.args[3] for call in spy.call_args_list}, {"6.5"})
+            self.assertEqual((ctx.cache.hits, ctx.cache.misses), (1, 3))
+            tsv = (out / "analysis_cmrt_declaration" / "6.5.formulas.tsv").read_text()
+            self.assertIn("A3\tA1*3", tsv)
+            with (out / "cmrt_rule_catalog_formulas.csv").open(encoding="utf-8") as f:
+                self.assertIn("6.4,Declaration,A3,SUM(A1:A1)\n", f.read())
+        self.assertEqual(outputs["CMRT"].baseline_version, "6.5")
+
+
+class TestRawEngine(unittest.TestCase):
+    def test_raw_engine_matches_openpyxl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_workbook(Path(tmp) / "RMI_CMRT_6.5.xlsx")
+            expected = run_scan.scan_workbook("CMRT", "6.5", path)
+            actual = run_scan.scan_workbook("CMRT", "6.5", path, engine="raw")
+        self.assertEqual(actual, expected)
+
+    def test_iter_sheet_xml_raw_shared_formulas_and_merges(self):
+        xml = (
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            b"<sheetData>"
+            b'<row r="1"><c r="A1"><f t="shared" ref="A1:A3" si="0">B1*2</f><v>0</v></c>'
+            b'<c r="C1" t="s"><v>0</v></c></row>'
+            b'<row r="2"><c r="A2"><f t="shared" si="0"/><v>0</v></c></row>'
+            b'<row r="3"><c r="A3"><f t="shared" si="0"/><v>0</v></c><c r="B3"><f>A3</f></c></row>'
+            b"</sheetData>"
+            b'<mergeCells count="1"><mergeCell ref="A3:B3"/></mergeCells>'
+            b'<conditionalFormatting sqref="D1 C1:C2"><cfRule type="expression" dxfId="0" priority="2">'
+            b"<formula>C1=1</formula></cfRule></conditionalFormatting>"
+            b'<dataValidations count="1"><dataValidation type="list" allowBlank="1" sqref="E1:E9">'
+            b"<formula1>$A$1:$A$3</formula1></dataValidation></dataValidations>"
+            b"</worksheet>"
+        )
+        formulas, dvs, cfs = run_scan.iter_sheet_xml_raw(io.BytesIO(xml), {0: "=C2"})
+        self.assertEqual(formulas, {"A1": "B1*2", "C1": "C2", "A2": "B2*2", "A3": "B3*2"})
+        self.assertEqual(dvs[0]["sqref"], "E1:E9")
+        self.assertEqual(dvs[0]["allowBlank"], "1")
+        self.assertEqual(dvs[0]["showErrorMessage"], "0")
+        self.assertEqual(cfs[0]["sqref"], "<ConditionalFormatting C1:C2 D1>")
+        self.assertEqual(cfs[0]["formulas"], "C1=1")
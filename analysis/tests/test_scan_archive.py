@@ -0,0 +1,29 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import analysis.run_scan as run_scan
+import analysis.scan_archive as scan_archive
+
+
+class TestTsvArchive(unittest.TestCase):
+    def test_archive_round_trips_sheet_tsvs(self):
+        rows = [["A1", "SUM(B1:B2)"], ["A2", "IF(C1=\"\u662f\",1,0)"]]
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp)
+            with mock.patch.object(run_scan, "OUT_ROOT", out / "files"):
+                run_scan.write_sheet_tsv(None, "CMRT", "Smelter List", "6.5", "formulas", rows)
+            with scan_archive.TsvArchiveWriter(out / "scan.pack") as archive:
+                run_scan.write_sheet_tsv(archive, "CMRT", "Smelter List", "6.5", "formulas", rows)
+                run_scan.write_sheet_tsv(archive, "CMRT", "Smelter List", "6.5", "dv", [])
+
+            packed = scan_archive.TsvArchive(out / "scan.pack")
+            key = ("CMRT", "Smelter List", "6.5", "formulas")
+            self.assertEqual(packed.keys(), [key, ("CMRT", "Smelter List", "6.5", "dv")])
+            self.assertEqual(packed.read_rows(*key), rows)
+            self.assertEqual(packed.extract(out / "unpacked"), 2)
+            rel = Path("analysis_cmrt_smelter_list") / "6.5.formulas.tsv"
+            self.assertEqual(
+                (out / "unpacked" / rel).read_bytes(), (out / "files" / rel).read_bytes()
+            )
@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import analysis.scan_artifacts as scan_artifacts
+import analysis.scan_records as scan_records
+import analysis.xml_cf_report as xml_cf_report
+
+
+class TestScanArtifacts(unittest.TestCase):
+    def test_artifacts_parse_once_and_load_templates_lazily(self):
+        records = [
+            {"template": t, "version": v, "sheet": "Checker", "sqref": "A1", "formulas": f}
+            for t, v, f in [("CMRT", "6.5", ["A1=1", ""]), ("EMRT", "2.1", ["B1"])]
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            scan_dir = Path(tmp)
+            writer = scan_records.RecordWriter(xml_cf_report.CF_RECORD_FIELDS)
+            for record in records:
+                writer.add((record["template"], record["version"], record["sheet"]), record)
+            writer.write(scan_dir / "xml-cf-report.bin")
+            (scan_dir / "cmrt_rule_catalog_dv.csv").write_text(
+                'version,sheet,sqref,formula1\n6.5,Checker,B2,"""Yes,No"""\n', encoding="utf-8"
+            )
+
+            artifacts = scan_artifacts.artifacts_for(scan_dir)
+            self.assertIs(scan_artifacts.artifacts_for(scan_dir / "."), artifacts)
+            self.assertEqual(artifacts.cf_templates(), ["CMRT", "EMRT"])
+            self.assertEqual(artifacts.cf_records("EMRT"), records[1:])
+            self.assertEqual(list(artifacts._cf), ["EMRT"])
+            self.assertEqual(
+                artifacts.cf_formulas(),
+                {("CMRT", "6.5", "Checker"): ["A1=1"], ("EMRT", "2.1", "Checker"): ["B1"]},
+            )
+            self.assertIs(artifacts.cf_formulas(), artifacts.cf_formulas())
+            dv = artifacts.dv_records()[("CMRT", "6.5", "Checker")]
+            self.assertEqual(dv[0]["formula1"], '"Yes,No"')
+            self.assertIs(artifacts.dv_catalog("CMRT"), artifacts.dv_catalog("CMRT"))
+
+            # run_scan hands its CF records over; DV rows are still read from the scan
+            handed = scan_artifacts.ScanArtifacts(scan_dir)
+            handed.provide_cf_records(records[:1])
+            self.assertEqual(handed.cf_templates(), ["CMRT"])
+            self.assertEqual(
+                handed.cf_catalog().covering("6.5", "Checker", "A1", "CMRT"), records[:1]
+            )
+            self.assertEqual(handed.dv_records(), {("CMRT", "6.5", "Checker"): dv})
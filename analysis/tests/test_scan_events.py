@@ -0,0 +1,42 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import analysis.run_scan as run_scan
+import analysis.scan_events as scan_events
+import analysis.xml_cf_report as xml_cf_report
+from analysis.tests.workbooks import make_workbook
+
+
+class TestScanEvents(unittest.TestCase):
+    def test_file_and_sheet_events_with_throughput_summary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "templates"
+            (root / "CMRT").mkdir(parents=True)
+            path = make_workbook(root / "CMRT" / "RMI_CMRT_6.5.xlsx")
+            events_path = Path(tmp) / "events.jsonl"
+            with scan_events.EventLog(events_path, "test") as events:
+                xml_cf_report.run_report(
+                    root, Path(tmp) / "cf.jsonl", Path(tmp) / "cf.csv", events=events
+                )
+                scan = run_scan.scan_workbook("CMRT", "6.5", path)
+                run_scan.log_workbook_events(events, "CMRT/RMI_CMRT_6.5.xlsx", scan, 0.5, "miss")
+            lines = events_path.read_text(encoding="utf-8").splitlines()
+        payloads = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [p["event"] for p in payloads],
+            ["start", "sheet", "sheet", "file", "sheet", "sheet", "file", "summary"],
+        )
+        cf_file, scan_sheet, scan_file, summary = payloads[3], payloads[4], payloads[6], payloads[7]
+        self.assertEqual(cf_file["cf_rules"], 1)
+        self.assertGreater(cf_file["bytes_inflated"], 0)
+        self.assertNotIn("cache", cf_file)
+        self.assertEqual(scan_sheet["sheet"], "Declaration")
+        self.assertEqual((scan_sheet["dv_rules"], scan_sheet["cf_rules"]), (1, 1))
+        self.assertEqual(scan_file["formula_cells"], scan.cell_count)
+        self.assertEqual(scan_file["cache"], "miss")
+        self.assertEqual(summary["files"], 2)
+        self.assertEqual(summary["cache_misses"], 1)
+        self.assertEqual(summary["formula_cells"], scan.cell_count)
+        self.assertGreater(summary["formula_cells_per_s"], 0)
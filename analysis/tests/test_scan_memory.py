@@ -0,0 +1,38 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import analysis.run_scan as run_scan
+import analysis.scan_memory as scan_memory
+from analysis.tests.workbooks import make_workbook
+
+
+class TestScanMemory(unittest.TestCase):
+    def test_memory_profiler_records_nested_peaks_and_sites(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_workbook(Path(tmp) / "RMI_CMRT_6.5.xlsx")
+            scan = run_scan.scan_workbook("CMRT", "6.5", path, memprofile_top=5)
+            self.assertIn("load_workbook", scan.memory)
+            self.assertLessEqual(len(scan.memory["load_workbook"]["top"]), 5)
+            self.assertEqual(scan, run_scan.scan_workbook("CMRT", "6.5", path))
+
+            memory = scan_memory.MemoryProfiler()
+            try:
+                memory.merge(scan.memory, "CMRT/RMI_CMRT_6.5.xlsx")
+                with memory.stage("outer"):
+                    with memory.stage("inner"):
+                        held = [bytearray(1 << 20)]
+                    del held
+                memory.write(Path(tmp) / "memprofile.json", {"engine": "openpyxl"})
+            finally:
+                memory.close()
+            payload = json.loads((Path(tmp) / "memprofile.json").read_text(encoding="utf-8"))
+        inner, outer = payload["stages"]["inner"], payload["stages"]["outer"]
+        self.assertGreaterEqual(inner["peak_delta_bytes"], 1 << 20)
+        self.assertGreaterEqual(outer["peak_bytes"], inner["peak_bytes"])
+        self.assertLess(outer["net_bytes"], 1 << 20)
+        self.assertTrue(inner["top"][0]["site"].startswith("analysis/tests/test_scan_memory.py:"))
+        self.assertEqual(list(payload["workbooks"]), ["CMRT/RMI_CMRT_6.5.xlsx"])
+        workbook = payload["workbooks"]["CMRT/RMI_CMRT_6.5.xlsx"]
+        self.assertEqual(workbook["load_workbook"]["calls"], 1)
@@ -0,0 +1,45 @@
+import argparse
+import io
+import pstats
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import analysis.run_scan as run_scan
+import analysis.scan_profile as scan_profile
+from analysis.tests.workbooks import make_workbook
+
+
+class TestScanProfile(unittest.TestCase):
+    def test_both_modes_write_pstats_and_top_report(self):
+        def busy_scan(path):
+            deadline = time.process_time() + 0.2
+            while time.process_time() < deadline:
+                run_scan.scan_workbook("CMRT", "6.5", path)
+
+        parser = argparse.ArgumentParser()
+        scan_profile.add_profile_argument(parser)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_workbook(Path(tmp) / "RMI_CMRT_6.5.xlsx")
+            out_dir = Path(tmp) / "out"
+            for mode in scan_profile.PROFILE_MODES:
+                args = parser.parse_args(["--profile", mode, "--profile-top", "5"])
+                with mock.patch("sys.stderr", io.StringIO()):
+                    with scan_profile.profiling(args, out_dir, "run_scan"):
+                        busy_scan(path)
+                stats = pstats.Stats(str(out_dir / f"run_scan-{mode}.pstats"))
+                functions = {name for _, _, name in stats.stats}
+                self.assertIn("busy_scan", functions)
+                self.assertIn("scan_workbook", functions)
+                report = (out_dir / f"run_scan-{mode}-top.txt").read_text(encoding="utf-8")
+                self.assertTrue(report.startswith(f"run_scan --profile {mode}: top 5"))
+                self.assertIn("cumulative", report)
+                if mode == "stats":
+                    self.assertIn("  samples  tottime", report)
+                    self.assertNotIn("ncalls", report)
+                    self.assertNotIn("function calls", report)
+                else:
+                    self.assertIn("   ncalls  tottime", report)
+            self.assertIsNone(parser.parse_args([]).profile)
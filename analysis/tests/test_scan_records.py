@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import analysis.scan_records as scan_records
+
+
+class TestScanRecords(unittest.TestCase):
+    def test_binary_round_trips_records_and_reads_single_sheets(self):
+        def rec(template, version, sheet, rule_index, formulas, **extra):
+            return {
+                "template": template,
+                "version": version,
+                "sheet": sheet,
+                "rule_index": rule_index,
+                "formulas": formulas,
+                **extra,
+            }
+
+        records = [
+            rec("CMRT", "6.5", "Checker", 0, ["A1=1", "B1"], sqref="A1"),
+            rec("CMRT", "6.5", "L", 3, [], color_scale={"cfvo": []}),
+            rec("EMRT", "2.1", "Checker", 1, ["A1=1"]),
+        ]
+        fields = [
+            ("template", "str"),
+            ("version", "str"),
+            ("sheet", "str"),
+            ("sqref", "str"),
+            ("rule_index", "int"),
+            ("formulas", "list"),
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = Path(tmp) / "xml-cf-report.jsonl"
+            jsonl.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+            writer = scan_records.RecordWriter(fields)
+            for record in records:
+                writer.add((record["template"], record["version"], record["sheet"]), record)
+            writer.write(scan_records.binary_path(jsonl), source=jsonl)
+
+            with scan_records.RecordFile(scan_records.binary_path(jsonl)) as binary:
+                self.assertEqual(len(binary), 3)
+                self.assertEqual(list(binary.select()), records)
+                self.assertEqual(binary.records(("CMRT", "6.5", "L")), records[1:2])
+                self.assertEqual(list(binary.select(sheet="Checker")), records[::2])
+                self.assertEqual(binary.records(("CRT", "1.0", "L")), [])
+            self.assertEqual(list(scan_records.iter_records(jsonl, "EMRT")), records[2:])
+
+            # touching the text export keeps the twin; changing its content does not
+            later = scan_records.binary_path(jsonl).stat().st_mtime + 1
+            os.utime(jsonl, (later, later))
+            self.assertEqual(scan_records.current_binary(jsonl), scan_records.binary_path(jsonl))
+            records[2]["rule_index"] = 7
+            jsonl.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+            self.assertEqual(jsonl.stat().st_size, binary.source[0])
+            self.assertIsNone(scan_records.current_binary(jsonl))
+            self.assertEqual(list(scan_records.iter_records(jsonl, "EMRT")), records[2:])
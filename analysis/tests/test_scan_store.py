@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import openpyxl
+
+import analysis.scan_events as scan_events
+import analysis.scan_store as scan_store
+import analysis.scan_text_diff as scan_text_diff
+import analysis.scan_timings as scan_timings
+import analysis.xml_cf_range_diff as xml_cf_range_diff
+from analysis.tests.workbooks import make_workbook
+
+
+class TestScanStore(unittest.TestCase):
+    def test_dedup_hardlinks_identical_outputs_and_unshare_splits_them(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = scan_store.ObjectStore(Path(tmp) / "objects")
+            old, new = Path(tmp) / "scan-2026-01-24", Path(tmp) / "scan-2026-01-25"
+            for scan_dir, summary in ((old, "a,1\n"), (new, "a,2\n")):
+                (scan_dir / "analysis_cmrt_declaration").mkdir(parents=True)
+                (scan_dir / "analysis_cmrt_declaration" / "6.5.dv.tsv").write_text("list\n")
+                (scan_dir / "cmrt_rules_summary.csv").write_text(summary)
+            store.dedup_tree(old)
+            stats = store.dedup_tree(new)
+            tsv = "analysis_cmrt_declaration/6.5.dv.tsv"
+            self.assertEqual((stats.files, stats.new_objects, stats.shared_bytes), (2, 1, 5))
+            self.assertTrue(os.path.samefile(old / tsv, new / tsv))
+            manifest = json.loads((new / scan_store.MANIFEST_NAME).read_text())
+            self.assertEqual(manifest[tsv]["size"], 5)
+
+            self.assertEqual(scan_store.unshare_tree(new), 2)
+            (new / tsv).write_text("changed\n")
+            self.assertEqual((old / tsv).read_text(), "list\n")
+            self.assertEqual(scan_store.verify_tree(old), [])
+            self.assertEqual(store.gc(), 4)
+            shutil.rmtree(old)
+            self.assertEqual(store.gc(), 9)
+            self.assertEqual(list(store.root.glob("*/*")), [])
+
+    def test_review_outputs_replace_shared_files_instead_of_writing_through(self):
+        record = {"template": "CMRT", "version": "6.5", "sheet": "Checker", "sqref": "A1"}
+        with tempfile.TemporaryDirectory() as tmp:
+            store = scan_store.ObjectStore(Path(tmp) / "objects")
+            old, new = Path(tmp) / "scan-2026-01-24", Path(tmp) / "scan-2026-01-25"
+            for scan_dir in (old, new):
+                scan_dir.mkdir()
+                (scan_dir / "xml-cf-report.jsonl").write_text(json.dumps(record) + "\n")
+                (scan_dir / "xml-cf-range-diff.md").write_text("stale\n")
+                (scan_dir / "xml-semantic-events.jsonl").write_text("{}\n")
+                store.dedup_tree(scan_dir)
+
+            with mock.patch("sys.stdout"):
+                xml_cf_range_diff.run_diff(new, new / "xml-cf-range-diff.md")
+            scan_events.EventLog(new / "xml-semantic-events.jsonl", "test").close()
+            with self.assertRaises(RuntimeError), scan_store.replacing(new / "cf.md") as out:
+                out.write_text("partial")
+                raise RuntimeError
+            self.assertEqual(sorted(p.name for p in new.iterdir() if ".tmp" in p.name), [])
+            self.assertNotEqual((new / "xml-cf-range-diff.md").read_text(), "stale\n")
+            self.assertEqual((old / "xml-cf-range-diff.md").read_text(), "stale\n")
+            self.assertEqual(scan_store.verify_tree(old), [])
+
+    def test_text_diff_and_timings_rewrite_a_deduplicated_scan_without_touching_others(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "templates"
+            (root / "CMRT").mkdir(parents=True)
+            make_workbook(root / "CMRT" / "RMI_CMRT_6.4.xlsx")
+            current = make_workbook(root / "CMRT" / "RMI_CMRT_6.5.xlsx")
+            store = scan_store.ObjectStore(Path(tmp) / "objects")
+            old, new = Path(tmp) / "scan-2026-01-24", Path(tmp) / "scan-2026-01-25"
+            for scan_dir in (old, new):
+                scan_text_diff.run_text_diff(root, scan_dir)
+                (scan_dir / "scan-timings.json").write_text("{}\n")
+                store.dedup_tree(scan_dir)
+            summary = "cmrt_text_diff_summary.csv"
+            self.assertTrue(os.path.samefile(old / summary, new / summary))
+
+            wb = openpyxl.load_workbook(current)
+            wb["Declaration"]["F1"] = "New note"
+            wb.save(current)
+            scan_text_diff.run_text_diff(root, new)
+            scan_timings.PhaseTimer().write(new / "scan-timings.json")
+            self.assertFalse(os.path.samefile(old / summary, new / summary))
+            self.assertEqual((old / "scan-timings.json").read_text(), "{}\n")
+            self.assertEqual(scan_store.verify_tree(old), [])
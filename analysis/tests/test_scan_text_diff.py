@@ -0,0 +1,19 @@
+import unittest
+
+import openpyxl
+
+import analysis.scan_text_diff as scan_text_diff
+
+
+class TestTextDiff(unittest.TestCase):
+    def test_text_diff_only_reports_changed_cells(self):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws["A1"], ws["A100"], ws["B100"] = "Title", "Old note", "Same"
+        base = scan_text_diff.index_sheet_text(ws)
+        ws["A100"] = "New  note"
+        current = scan_text_diff.index_sheet_text(ws)
+        self.assertEqual(scan_text_diff.diff_sheet_text(base, base), [])
+        self.assertEqual(
+            scan_text_diff.diff_sheet_text(base, current), [("A100", "New note", "Old note")]
+        )
@@ -0,0 +1,32 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import analysis.run_scan as run_scan
+import analysis.scan_timings as scan_timings
+from analysis.tests.workbooks import make_workbook
+
+
+class TestScanTimings(unittest.TestCase):
+    def test_workbook_phases_are_recorded_and_merged(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_workbook(Path(tmp) / "RMI_CMRT_6.5.xlsx")
+            scan = run_scan.scan_workbook("CMRT", "6.5", path, engine="raw", xml_cf=True)
+            self.assertEqual(
+                list(scan.timings),
+                ["read_package", "detect_cf_extensions", "extract_raw", "xml_cf_collect"],
+            )
+            self.assertEqual(scan.timings["read_package"]["bytes_read"], path.stat().st_size)
+            self.assertEqual(scan.timings["extract_raw"]["cells"], scan.cell_count)
+
+            timer = scan_timings.PhaseTimer()
+            timer.merge(scan.timings, "CMRT/RMI_CMRT_6.5.xlsx")
+            with timer.phase("diff") as counters:
+                counters["rules"] = 2
+            timer.write(Path(tmp) / "scan-timings.json", {"engine": "raw"})
+            payload = json.loads((Path(tmp) / "scan-timings.json").read_text(encoding="utf-8"))
+        self.assertEqual(payload["meta"], {"engine": "raw"})
+        self.assertEqual(payload["phases"]["diff"]["rules"], 2)
+        self.assertEqual(payload["phases"]["diff"]["calls"], 1)
+        self.assertEqual(list(payload["workbooks"]), ["CMRT/RMI_CMRT_6.5.xlsx"])
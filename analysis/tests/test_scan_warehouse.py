@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import analysis.run_scan as run_scan
+import analysis.scan_artifacts as scan_artifacts
+import analysis.scan_events as scan_events
+import analysis.scan_memory as scan_memory
+import analysis.scan_timings as scan_timings
+import analysis.scan_warehouse as scan_warehouse
+from analysis.tests.workbooks import make_workbook
+
+
+class TestScanWarehouse(unittest.TestCase):
+    def test_rescan_replaces_template_rows_and_indexes_sqrefs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root, out = Path(tmp) / "templates", Path(tmp) / "out"
+            (root / "CMRT").mkdir(parents=True)
+            make_workbook(root / "CMRT" / "RMI_CMRT_6.4.xlsx", "SUM(A1:A1)")
+            current = make_workbook(root / "CMRT" / "RMI_CMRT_6.5.xlsx")
+            args = argparse.Namespace(
+                jobs=1, engine="openpyxl", skip_xml_cf=True, diff_mode="adjacent"
+            )
+            path = scan_warehouse.warehouse_path(out)
+            ctx = run_scan.ScanContext(
+                args=args,
+                cache=None,
+                timer=scan_timings.PhaseTimer(),
+                memory=scan_memory.MemoryProfiler(enabled=False),
+                events=scan_events.EventLog(None, "test"),
+                warehouse=scan_warehouse.WarehouseWriter(path, fresh=True),
+            )
+            with mock.patch.object(run_scan, "OUT_ROOT", out), mock.patch.object(
+                run_scan, "TEMPLATE_ROOT", root
+            ):
+                run_scan.scan_and_write(ctx, run_scan.load_templates(), {})
+                ctx.warehouse.create_indexes()
+                make_workbook(current, "A1*3")
+                run_scan.scan_and_write(ctx, run_scan.load_templates(), {}, frozenset([current]))
+            ctx.warehouse.close()
+
+            conn = scan_warehouse.connect(path)
+            formulas = scan_warehouse.select(conn, "formulas", "CMRT", "6.5", "Declaration")
+            self.assertEqual(
+                sorted((r["cell"], r["formula"]) for r in formulas), [("A3", "A1*3"), ("D1", "A1")]
+            )
+            self.assertEqual(len(scan_warehouse.select(conn, "dvs")), 2)
+            dvs = scan_warehouse.covering(conn, "dvs", "CMRT", "6.5", "Declaration", "B3")
+            self.assertEqual(
+                [(r["sqref"], r["formula1"]) for r in dvs], [("B1:B5", "$A$1:$A$2")]
+            )
+            self.assertEqual(
+                scan_warehouse.covering(conn, "cf_catalog", "CMRT", "6.4", "Declaration", "C6"), []
+            )
+            states = scan_warehouse.select(conn, "sheet_states", "CMRT", "6.5")
+            self.assertEqual(
+                [(r["sheet"], r["state"]) for r in states],
+                [("Declaration", "visible"), ("L", "hidden")],
+            )
+            diffs = scan_warehouse.select(conn, "version_diffs", sheet="Declaration")
+            self.assertEqual(
+                [(r["from_version"], r["version"], r["formula_changed"]) for r in diffs],
+                [("6.4", "6.5", 1)],
+            )
+            conn.close()
+            catalogs = sorted(out.glob("cmrt_rule_catalog_*.csv"))
+            self.assertEqual(scan_warehouse.current_warehouse(out, *catalogs), path)
+
+    def test_artifacts_serve_sheet_lookups_from_warehouse(self):
+        record = {
+            "template": "EMRT",
+            "version": "2.1",
+            "sheet": "Mine List",
+            "source": "ext",
+            "sqref": "A1:A9",
+            "rule_index": 0,
+            "formulas": ["FIND(\"!\",A1)"],
+            "data_bar": {"min": "0"},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            scan_dir = Path(tmp)
+            key = ("EMRT", "2.1", "Mine List")
+            jsonl = scan_dir / "xml-cf-report.jsonl"
+            jsonl.write_text(json.dumps(record) + "\n", encoding="utf-8")
+            with scan_warehouse.WarehouseWriter(scan_warehouse.warehouse_path(scan_dir)) as writer:
+                writer.add_cf_record(record)
+                writer.record_source(jsonl)
+                writer.add("dvs", {**dict(zip(scan_warehouse.KEY_COLUMNS, key)), "sqref": "B2"})
+
+            artifacts = scan_artifacts.ScanArtifacts(scan_dir)
+            self.assertEqual(artifacts.cf_records(*key), [record])
+            self.assertEqual(artifacts.sheet_cf_formulas(key), record["formulas"])
+            self.assertEqual([row["sqref"] for row in artifacts.sheet_dv_rows(key)], ["B2"])
+            self.assertEqual(scan_warehouse.DIFF_COUNTS, run_scan.DIFF_FIELDS)
+
+            # touching a text export keeps the warehouse; changing its content does not
+            later = scan_warehouse.warehouse_path(scan_dir).stat().st_mtime + 1
+            os.utime(jsonl, (later, later))
+            self.assertIsNotNone(scan_artifacts.ScanArtifacts(scan_dir).warehouse())
+            jsonl.write_text(json.dumps(dict(record, rule_index=1)) + "\n", encoding="utf-8")
+            self.assertIsNone(scan_artifacts.ScanArtifacts(scan_dir).warehouse())
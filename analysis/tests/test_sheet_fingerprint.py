@@ -0,0 +1,26 @@
+import unittest
+
+import analysis.sheet_fingerprint as sheet_fingerprint
+
+
+class TestSheetFingerprint(unittest.TestCase):
+    def test_fingerprint_localises_changes_to_row_blocks(self):
+        cells = {f"A{row}": f"B{row}*2" for row in range(1, 200)}
+        edited = dict(cells, A130="B130*3")
+        base = sheet_fingerprint.build_fingerprint(
+            sheet_fingerprint.split_row_blocks(cells), "formulas", {"dv": [("A1", "list")]}
+        )
+        same = sheet_fingerprint.build_fingerprint(
+            sheet_fingerprint.split_row_blocks(dict(reversed(list(cells.items())))),
+            "formulas",
+            {"dv": [("A1", "list")]},
+        )
+        changed = sheet_fingerprint.build_fingerprint(
+            sheet_fingerprint.split_row_blocks(edited), "formulas", {"dv": [("A1", "list")]}
+        )
+        self.assertEqual(same.digest, base.digest)
+        self.assertNotEqual(changed.digest, base.digest)
+        self.assertEqual(changed.kinds["dv"], base.kinds["dv"])
+        self.assertEqual(sheet_fingerprint.changed_blocks(base, changed), [2])
+        restored = sheet_fingerprint.SheetFingerprint.from_json(changed.to_json())
+        self.assertEqual(restored, changed)
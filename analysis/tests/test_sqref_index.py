@@ -0,0 +1,48 @@
+import unittest
+
+import analysis.docs_excel_rule_check as docs_excel_rule_check
+import analysis.sqref_index as sqref_index
+
+
+class TestSqrefIndex(unittest.TestCase):
+    def test_covering_and_overlapping_with_whole_columns_and_rows(self):
+        index = sqref_index.SqrefIndex(
+            [("A1:A10 C3", "a"), ("B:B", "b"), ("2:2", "c"), ("$E$9:$E$5", "d"), ("bad", "e")]
+        )
+        self.assertEqual(index.covering("A2"), ["a", "c"])
+        self.assertEqual(index.covering("B1048576"), ["b"])
+        self.assertEqual(index.covering("E7"), ["d"])
+        self.assertEqual(index.covering("F1"), [])
+        self.assertEqual(index.overlapping("E9:A5"), ["a", "b", "d"])
+        self.assertEqual(index.overlapping("C3 XFD2"), ["a", "c"])
+        self.assertEqual(sqref_index.SqrefIndex([("A1 D:D", "d")]).covering("$D$900"), ["d"])
+
+    def test_rule_catalog_indexes_each_sheet_once(self):
+        catalog = sqref_index.RuleCatalog(
+            [
+                {"version": "6.5", "sheet": "Declaration", "sqref": "D8:D9", "type": "list"},
+                {"version": "6.5", "sheet": "Declaration", "sqref": "D:D", "type": "custom"},
+                {"version": "6.4", "sheet": "Declaration", "sqref": "D8", "type": "list"},
+                {"template": "EMRT", "version": "6.5", "sheet": "Declaration", "sqref": "D8"},
+            ],
+            template="CMRT",
+        )
+        index = catalog.sheet_index("6.5", "Declaration")
+        self.assertIs(catalog.sheet_index("6.5", "Declaration", template="CMRT"), index)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(len(catalog.sheet_index("6.5", "Declaration", template="EMRT")), 1)
+        hits = docs_excel_rule_check.dv_list_for_cell(catalog, "6.5", "Declaration", "D9")
+        self.assertEqual([row["sqref"] for row in hits], ["D8:D9"])
+
+    def test_rect_algebra_is_canonical_and_handles_whole_columns(self):
+        parse = sqref_index.parse_sqref
+        self.assertEqual(sqref_index.union_rects(parse("A5:A50 A51:A100")), [(1, 5, 1, 100)])
+        self.assertEqual(
+            sqref_index.union_rects(parse("A1:B2 B2:C3")),
+            sqref_index.union_rects(parse("B3:C3 A1:B1 A2:C2")),
+        )
+        rest = sqref_index.subtract_rects(parse("A:A 5:1048576"), parse("A1:A10 B5:C7"))
+        self.assertEqual(sqref_index.format_sqref(rest), "D5:XFD7 B8:XFD10 11:1048576")
+        self.assertEqual(
+            sqref_index.count_cells(sqref_index.intersect_rects(parse("A:B"), parse("B2:D3"))), 2
+        )
@@ -0,0 +1,45 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import openpyxl
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.worksheet.datavalidation import DataValidation
+
+import analysis.run_scan as run_scan
+import analysis.synth_templates as synth_templates
+
+
+class TestSynthTemplates(unittest.TestCase):
+    def test_generated_rows_fill_down_and_push_the_footer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "RMI_CMRT_6.5.xlsx"
+            wb = openpyxl.Workbook()
+            ws = wb.active
+            ws.title = "Smelter List"
+            ws["A1"] = "Smelter"
+            for row in range(5, 9):
+                ws[f"B{row}"] = f'=IF(C{row}="","",C{row}&$A$1)'
+            ws["A10"] = "end"
+            ws["D10"] = "=COUNTA(B5:B8)"
+            ws.merge_cells("A10:C10")
+            dv = DataValidation(type="list", formula1="$A$1:$A$2")
+            dv.add("C5:C8")
+            ws.add_data_validation(dv)
+            ws.conditional_formatting.add("B5:B8", FormulaRule(formula=['B5=""']))
+            wb.save(source)
+
+            dest = Path(tmp) / "out" / source.name
+            plans = synth_templates.generate(source, dest, ["Smelter List"], rows=10)
+            self.assertEqual([(p.template_row, p.rows) for p in plans], [(8, 10)])
+
+            ws = openpyxl.load_workbook(dest)["Smelter List"]
+            self.assertEqual(ws["B18"].value, '=IF(C18="","",C18&$A$1)')
+            self.assertEqual(ws["A20"].value, "end")
+            self.assertEqual(ws["D20"].value, "=COUNTA(B5:B18)")
+            self.assertEqual([str(r) for r in ws.merged_cells.ranges], ["A20:C20"])
+            self.assertEqual(str(ws.data_validations.dataValidation[0].sqref), "C5:C18")
+            self.assertEqual([str(cf.sqref) for cf in ws.conditional_formatting], ["B5:B18"])
+
+            raw = run_scan.scan_workbook("CMRT", "6.5", dest, engine="raw")
+            self.assertEqual(raw, run_scan.scan_workbook("CMRT", "6.5", dest))
@@ -0,0 +1,17 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from analysis.tests.workbooks import make_workbook
+from analysis.xlsx_package import WorkbookPackage
+
+
+class TestWorkbookPackage(unittest.TestCase):
+    def test_package_serves_sheets_in_workbook_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_workbook(Path(tmp) / "RMI_CMRT_6.5.xlsx")
+            with WorkbookPackage(path) as package:
+                self.assertEqual(list(package.sheet_map), ["Declaration", "L"])
+                self.assertEqual([s["state"] for s in package.worksheets], ["visible", "hidden"])
+                with package.sheet_stream("L") as stream:
+                    self.assertEqual(stream.read(), package.sheet_bytes("L"))
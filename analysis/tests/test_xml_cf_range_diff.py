@@ -0,0 +1,41 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import analysis.xml_cf_range_diff as xml_cf_range_diff
+
+
+class TestRangeDiff(unittest.TestCase):
+    def test_range_diff_reports_cells_per_rule_not_sqref_spelling(self):
+        def rec(version, sqref, formula):
+            return {
+                "template": "CMRT",
+                "version": version,
+                "sheet": "Checker",
+                "source": "standard",
+                "type": "expression",
+                "operator": "",
+                "sqref": sqref,
+                "formulas": [formula],
+            }
+
+        with tempfile.TemporaryDirectory() as tmp:
+            scan_root = Path(tmp)
+            records = [
+                rec("6.4", "A5:A100", "$B5=1"),
+                rec("6.4", "C:C", "$B1=2"),
+                rec("6.5", "A5:A50 A51:A100", "$B5=1"),
+                rec("6.5", "C2:C1048576", "$B1=2"),
+                rec("6.5", "D4", "$D4=3"),
+            ]
+            (scan_root / "xml-cf-report.jsonl").write_text(
+                "".join(json.dumps(r) + "\n" for r in records), encoding="utf-8"
+            )
+            out = scan_root / "diff.md"
+            xml_cf_range_diff.run_diff(scan_root, out)
+            report = out.read_text(encoding="utf-8")
+        self.assertIn("6.4 → 6.5: 2 rule(s) changed; CF coverage +1 / -1 cells", report)
+        self.assertIn("`expression: $B1=2`\n    - -C1 (1 cell)", report)
+        self.assertIn("`expression: $D4=3`\n    - +D4 (1 cell)", report)
+        self.assertNotIn("$B5=1", report)
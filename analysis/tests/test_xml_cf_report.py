@@ -0,0 +1,90 @@
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import analysis.run_scan as run_scan
+import analysis.scan_events as scan_events
+import analysis.xml_cf_report as xml_cf_report
+from analysis.tests.workbooks import make_workbook
+from analysis.xlsx_package import WorkbookPackage
+
+
+class TestXmlCfReport(unittest.TestCase):
+    def test_scan_workbook_collects_xml_cf_records(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_workbook(Path(tmp) / "RMI_CMRT_6.5.xlsx")
+            scan = run_scan.scan_workbook("CMRT", "6.5", path, engine="raw", xml_cf=True)
+            with WorkbookPackage(path) as package:
+                expected = xml_cf_report.collect_workbook_cf(package, "CMRT", "6.5")
+        self.assertTrue(expected)
+        self.assertEqual(scan.xml_cf_records, expected)
+
+    def test_streamed_cf_skips_sheet_data_and_matches_tree_records(self):
+        sheet = (
+            '<x:worksheet xmlns:x="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:x14="http://schemas.microsoft.com/office/spreadsheetml/2009/9/main" '
+            'xmlns:xm="http://schemas.microsoft.com/office/excel/2006/main">'
+            '<x:sheetData>' + '<x:row r="1"><x:c r="A1"><x:v>1</x:v></x:c></x:row>' * 500
+            + '</x:sheetData><x:mergeCells count="1"><x:mergeCell ref="A1:B1"/></x:mergeCells>'
+            '<x:conditionalFormatting sqref="A1:A5"><x:cfRule type="expression" priority="1">'
+            "<x:formula>A1&gt;0</x:formula></x:cfRule></x:conditionalFormatting>"
+            '<x:extLst><x:ext uri="{78C0D931-6437-407d-A8EE-F0AAD7539E65}">'
+            '<x14:conditionalFormattings><x14:conditionalFormatting><x14:cfRule type="expression" '
+            'priority="2" id="{1}"><xm:f>B1=1</xm:f></x14:cfRule><xm:sqref>B1:B9</xm:sqref>'
+            "</x14:conditionalFormatting></x14:conditionalFormattings></x:ext></x:extLst>"
+            "</x:worksheet>"
+        ).encode()
+        stripped = b"".join(xml_cf_report.iter_without_sheet_data(io.BytesIO(sheet), 7))
+        self.assertIn(b"<x:sheetData/><x:mergeCells", stripped)
+        self.assertNotIn(b"<x:row", stripped)
+
+        root = xml_cf_report.read_cf_root(io.BytesIO(sheet))
+        self.assertEqual(
+            [xml_cf_report.local_name(child.tag) for child in root],
+            ["conditionalFormatting", "extLst"],
+        )
+        tree = xml_cf_report.ET.fromstring(sheet)
+        expected = list(xml_cf_report.iter_standard_cf(tree, "CMRT", "6.5", "L"))
+        expected += xml_cf_report.iter_ext_cf(tree, "CMRT", "6.5", "L")
+        streamed = list(xml_cf_report.iter_sheet_cf(io.BytesIO(sheet), "CMRT", "6.5", "L"))
+        self.assertEqual([r["source"] for r in streamed], ["standard", "ext"])
+        self.assertEqual(streamed, expected)
+
+    def test_parallel_report_streams_the_serial_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "templates"
+            for name in ("RMI_CMRT_6.4.xlsx", "RMI_CMRT_6.5.xlsx", "RMI_EMRT_2.1.xlsx"):
+                folder = root / name.split("_")[1]
+                folder.mkdir(parents=True, exist_ok=True)
+                make_workbook(folder / name)
+            given = root / "CMRT" / "RMI_CMRT_6.5.xlsx"
+            with WorkbookPackage(given) as package:
+                handed_over = {given: xml_cf_report.collect_workbook_cf(package, "CMRT", "6.5")}
+            outputs = []
+            for jobs in (1, 2):
+                out = Path(tmp) / f"jobs{jobs}"
+                events = scan_events.EventLog(out / "events.jsonl", "xml_cf_report")
+                xml_cf_report.run_report(
+                    root,
+                    out / "cf.jsonl",
+                    out / "summary.csv",
+                    records_by_path=handed_over,
+                    events=events,
+                    jobs=jobs,
+                )
+                events.close()
+                with (out / "events.jsonl").open(encoding="utf-8") as f:
+                    files = [e["workbook"] for e in map(json.loads, f) if e["event"] == "file"]
+                outputs.append(
+                    ((out / "cf.jsonl").read_text(), (out / "summary.csv").read_text(), files)
+                )
+        self.assertEqual(outputs[0], outputs[1])
+        jsonl, summary, files = outputs[0]
+        self.assertEqual(
+            [(r["template"], r["version"]) for r in map(json.loads, jsonl.splitlines())],
+            [("CMRT", "6.4"), ("CMRT", "6.5"), ("EMRT", "2.1")],
+        )
+        self.assertIn("CMRT,6.5,Declaration,standard,1", summary)
+        self.assertEqual(files, ["CMRT/RMI_CMRT_6.4.xlsx", "EMRT/RMI_EMRT_2.1.xlsx"])
@@ -0,0 +1,26 @@
+from pathlib import Path
+
+import openpyxl
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.worksheet.datavalidation import DataValidation
+
+
+def make_workbook(path: Path, formula: str = "SUM(A1:A2)") -> Path:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Declaration"
+    ws["A1"] = 1
+    ws["A2"] = 2
+    ws["A3"] = f"={formula}"
+    dv = DataValidation(type="list", formula1="$A$1:$A$2", allow_blank=True)
+    dv.add("B1:B5")
+    ws.add_data_validation(dv)
+    ws.conditional_formatting.add("C1:C5", FormulaRule(formula=['C1=""']))
+    ws["D1"] = "=A1"
+    ws["E1"] = "=A2"
+    ws.merge_cells("D1:E1")
+    hidden = wb.create_sheet("L")
+    hidden.sheet_state = "hidden"
+    hidden["A1"] = "=Declaration!A3"
+    wb.save(path)
+    return path
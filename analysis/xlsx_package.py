@@ -0,0 +1,95 @@
+"""
+Single-open reader for an xlsx package, shared by the analysis scripts.
+
+A WorkbookPackage reads the xlsx file once, parses xl/workbook.xml and its rels once,
+and hands out each sheet part as a stream (or as bytes). Every consumer in a run (cfExt
+detection, the openpyxl or raw extraction engine, the XML CF report) works from the same
+package instead of reopening the zip. Inflated sheets are not kept: each consumer
+streams the part again, so memory stays flat however large a sheet is.
+"""
+
+from __future__ import annotations
+
+import io
+import zipfile
+from pathlib import Path
+from typing import IO, Dict, List
+import xml.etree.ElementTree as ET
+
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def read_workbook_sheets(z: zipfile.ZipFile) -> List[Dict[str, str]]:
+    """Sheets in workbook.xml order with their zip member path, state and rel type."""
+    wb = ET.fromstring(z.read("xl/workbook.xml"))
+    rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+    rel_map = {
+        rel.get("Id"): (rel.get("Target") or "", rel.get("Type") or "")
+        for rel in rels.findall(f"{{{NS_PKG}}}Relationship")
+    }
+    sheets: List[Dict[str, str]] = []
+    for sheet in wb.findall(f"{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet"):
+        name = sheet.get("name") or ""
+        target, rel_type = rel_map.get(sheet.get(f"{{{NS_R}}}id") or "", ("", ""))
+        if not name or not target:
+            continue
+        path = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        sheets.append(
+            {
+                "name": name,
+                "path": path,
+                "state": sheet.get("state") or "visible",
+                "type": rel_type.rsplit("/", 1)[-1],
+            }
+        )
+    return sheets
+
+
+class WorkbookPackage:
+    """One open xlsx: raw file bytes, zip index and sheet list."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.data = path.read_bytes()
+        self._zip = zipfile.ZipFile(io.BytesIO(self.data))
+        self._members = set(self._zip.namelist())
+        self.sheets = read_workbook_sheets(self._zip)
+        self.sheet_map = {sheet["name"]: sheet["path"] for sheet in self.sheets}
+
+    def __enter__(self) -> "WorkbookPackage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    @property
+    def worksheets(self) -> List[Dict[str, str]]:
+        return [sheet for sheet in self.sheets if sheet["type"] == "worksheet"]
+
+    def file_stream(self) -> IO[bytes]:
+        """The whole xlsx as a stream, for readers such as openpyxl.load_workbook."""
+        return io.BytesIO(self.data)
+
+    def has_member(self, member: str) -> bool:
+        return member in self._members
+
+    def open_member(self, member: str) -> IO[bytes]:
+        return self._zip.open(member)
+
+    def sheet_bytes(self, name: str) -> bytes:
+        """A whole sheet part, inflated; prefer sheet_stream for anything large."""
+        return self._zip.read(self.sheet_map[name])
+
+    def sheet_size(self, name: str) -> int:
+        """Uncompressed size of a sheet part, without inflating it."""
+        return self._zip.getinfo(self.sheet_map[name]).file_size
+
+    def sheet_stream(self, name: str) -> IO[bytes]:
+        """Stream a sheet part, inflating it as it is read."""
+        return self._zip.open(self.sheet_map[name])
@@ -13,15 +13,22 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
-import json
 import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
+try:
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from analysis.scan_store import replace_text
+except ImportError:
+    from scan_profile import add_profile_argument, profiling
+    from scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from scan_store import replace_text
+
 ROOT = Path(__file__).resolve().parents[1]
-SCAN_PREFIX = "scan-"
 
 
 @dataclass(frozen=True)
@@ -160,13 +167,6 @@ NEGATIVE_DOC_PATTERNS = {
 }
 
 
-def find_latest_scan(root: Path) -> Path:
-    scans = sorted([p for p in root.iterdir() if p.is_dir() and p.name.startswith(SCAN_PREFIX)])
-    if not scans:
-        raise FileNotFoundError("No scan-YYYY-MM-DD directories found in analysis/.")
-    return scans[-1]
-
-
 def extract_section(text: str, sheet: str) -> str:
     label_map = {
         "Smelter List": "Smelter List",
@@ -272,38 +272,6 @@ def features_for(template: str, version: str, sheet: str) -> List[Feature]:
     return FEATURES_SMELTER
 
 
-def load_cf_formulas(scan_root: Path) -> Dict[Tuple[str, str, str], List[str]]:
-    path = scan_root / "xml-cf-report.jsonl"
-    if not path.exists():
-        raise FileNotFoundError(f"Missing {path}")
-    formulas: Dict[Tuple[str, str, str], List[str]] = {}
-    with path.open(encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-            key = (rec["template"], rec["version"], rec["sheet"])
-            formulas.setdefault(key, [])
-            for formula in rec.get("formulas", []):
-                if formula:
-                    formulas[key].append(formula)
-    return formulas
-
-
-def load_dv_records(scan_root: Path) -> Dict[Tuple[str, str, str], List[Dict[str, str]]]:
-    dv_map: Dict[Tuple[str, str, str], List[Dict[str, str]]] = {}
-    for path in scan_root.glob("*_rule_catalog_dv.csv"):
-        template = path.stem.split("_rule_catalog_dv")[0].upper()
-        with path.open(encoding="utf-8") as f:
-            header = f.readline().strip().split(",")
-            for line in f:
-                values = line.rstrip("\n").split(",")
-                row = dict(zip(header, values))
-                key = (template, row.get("version", ""), row.get("sheet", ""))
-                dv_map.setdefault(key, []).append(row)
-    return dv_map
-
-
 def excel_date(value: str) -> str:
     if not value:
         return ""
@@ -368,9 +336,12 @@ def format_section(
     return lines
 
 
-def run_compare(scan_root: Path, out_path: Path) -> int:
-    formulas = load_cf_formulas(scan_root)
-    dv_records = load_dv_records(scan_root)
+def run_compare(
+    scan_root: Path, out_path: Path, artifacts: Optional[ScanArtifacts] = None
+) -> int:
+    artifacts = artifacts or artifacts_for(scan_root)
+    formulas = artifacts.cf_formulas()
+    dv_records = artifacts.dv_records()
     sections: List[str] = []
     sections.append("# XML 条件格式 vs 文档对照（启发式）")
     sections.append("")
@@ -432,7 +403,7 @@ def run_compare(scan_root: Path, out_path: Path) -> int:
         results = detect_features(doc_text, sheet_formulas, features_for(template, version, sheet))
         sections.extend(format_section(template, version, sheet, results))
 
-    out_path.write_text("\n".join(sections), encoding="utf-8")
+    replace_text(out_path, "\n".join(sections))
     print(f"Wrote compare report to {out_path}")
     return 0
 
@@ -446,11 +417,13 @@ def main() -> int:
         default=None,
         help="Output markdown path (default: scan-root/xml-cf-doc-compare.md).",
     )
+    add_profile_argument(parser)
     args = parser.parse_args()
 
     scan_root = args.scan_root or find_latest_scan(ROOT / "analysis")
     out_path = args.out or (scan_root / "xml-cf-doc-compare.md")
-    return run_compare(scan_root, out_path)
+    with profiling(args, out_path.parent, "xml_cf_doc_compare"):
+        return run_compare(scan_root, out_path)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,13 @@
 """
 Report conditional-formatting range differences per template/sheet across versions.
 
+Each sqref is normalised into merged rectangles (sqref_index), so A5:A100 and
+A5:A50 A51:A100 count as the same range. Between adjacent versions the report lists,
+per CF rule, the exact cells gained and lost, computed with rectangle set algebra rather
+than cell by cell, so whole-column (A:A) and whole-row (5:1048576) ranges stay cheap.
+A rule is identified by its source, type, operator and formulas; rules that only appear
+in one version gain or lose their whole range.
+
 Input:
 - analysis/scan-YYYY-MM-DD/xml-cf-report.jsonl
 
@@ -12,52 +19,114 @@ Output:
 from __future__ import annotations
 
 import argparse
-import json
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
-
+from typing import Dict, List, Optional, Tuple
+
+
+try:
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from analysis.scan_store import replace_text
+    from analysis.sqref_index import (
+        Rect,
+        count_cells,
+        format_sqref,
+        parse_sqref,
+        subtract_rects,
+        union_rects,
+    )
+except ImportError:
+    from scan_profile import add_profile_argument, profiling
+    from scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from scan_store import replace_text
+    from sqref_index import (
+        Rect,
+        count_cells,
+        format_sqref,
+        parse_sqref,
+        subtract_rects,
+        union_rects,
+    )
 
 ROOT = Path(__file__).resolve().parents[1]
-SCAN_PREFIX = "scan-"
+LABEL_WIDTH = 80
 
-
-def find_latest_scan(root: Path) -> Path:
-    scans = sorted([p for p in root.iterdir() if p.is_dir() and p.name.startswith(SCAN_PREFIX)])
-    if not scans:
-        raise FileNotFoundError("No scan-YYYY-MM-DD directories found in analysis/.")
-    return scans[-1]
+# (source, type, operator, formulas)
+RuleKey = Tuple[str, str, str, Tuple[str, ...]]
+SheetRanges = Dict[RuleKey, List[Rect]]
 
 
 def parse_version(value: str) -> Tuple[int, ...]:
     return tuple(int(part) for part in value.split(".") if part.isdigit())
 
 
-def load_ranges(scan_root: Path) -> Dict[Tuple[str, str, str], Set[str]]:
-    path = scan_root / "xml-cf-report.jsonl"
-    if not path.exists():
-        raise FileNotFoundError(f"Missing {path}")
-    ranges: Dict[Tuple[str, str, str], Set[str]] = {}
-    with path.open(encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-            key = (rec["template"], rec["version"], rec["sheet"])
-            sqref = rec.get("sqref", "")
-            if not sqref:
-                continue
-            ranges.setdefault(key, set()).add(sqref)
+def rule_key(rec: dict) -> RuleKey:
+    return (
+        rec.get("source", ""),
+        rec.get("type", ""),
+        rec.get("operator", ""),
+        tuple(rec.get("formulas") or ()),
+    )
+
+
+def rule_label(key: RuleKey) -> str:
+    source, rule_type, operator, formulas = key
+    label = " ".join(part for part in (rule_type, operator) if part)
+    if source != "standard":
+        label = f"{label} ({source})"
+    text = f"{label}: {'; '.join(formulas)}" if formulas else label
+    if len(text) > LABEL_WIDTH:
+        text = text[: LABEL_WIDTH - 1] + "…"
+    return text
+
+
+def load_ranges(
+    scan_root: Path, artifacts: Optional[ScanArtifacts] = None
+) -> Dict[Tuple[str, str, str], SheetRanges]:
+    """{(template, version, sheet): {rule: canonical rectangles}}."""
+    artifacts = artifacts or artifacts_for(scan_root)
+    ranges: Dict[Tuple[str, str, str], SheetRanges] = {}
+    for rec in artifacts.cf_catalog():
+        key = (rec["template"], rec["version"], rec["sheet"])
+        sqref = rec.get("sqref", "")
+        if not sqref:
+            continue
+        rules = ranges.setdefault(key, {})
+        rule = rule_key(rec)
+        rules[rule] = rules.get(rule, []) + parse_sqref(sqref)
+    for rules in ranges.values():
+        for rule, rects in rules.items():
+            rules[rule] = union_rects(rects)
     return ranges
 
 
-def run_diff(scan_root: Path, out_path: Path) -> int:
-    ranges = load_ranges(scan_root)
+def diff_sheet(
+    prev: SheetRanges, curr: SheetRanges
+) -> List[Tuple[RuleKey, List[Rect], List[Rect]]]:
+    """Per rule whose coverage changed: (rule, gained rectangles, lost rectangles)."""
+    diffs = []
+    for rule in sorted(set(prev) | set(curr)):
+        before, after = prev.get(rule, []), curr.get(rule, [])
+        if before == after:
+            continue
+        diffs.append((rule, subtract_rects(after, before), subtract_rects(before, after)))
+    return diffs
+
+
+def describe(rects: List[Rect]) -> str:
+    cells = count_cells(rects)
+    return f"{format_sqref(rects)} ({cells} cell{'s' if cells != 1 else ''})"
+
+
+def run_diff(scan_root: Path, out_path: Path, artifacts: Optional[ScanArtifacts] = None) -> int:
+    ranges = load_ranges(scan_root, artifacts)
     templates = sorted({t for t, _, _ in ranges})
 
     lines: List[str] = []
     lines.append("# XML CF 范围差异（按版本对比）")
     lines.append("")
     lines.append(f"- Scan: `{scan_root.name}`")
+    lines.append("- Per CF rule: cells gained (+) and lost (-) between adjacent versions.")
     lines.append("")
 
     for template in templates:
@@ -68,25 +137,33 @@ def run_diff(scan_root: Path, out_path: Path) -> int:
         for sheet in sheets:
             diffs = []
             for prev, curr in zip(versions, versions[1:]):
-                prev_set = ranges.get((template, prev, sheet), set())
-                curr_set = ranges.get((template, curr, sheet), set())
-                added = sorted(curr_set - prev_set)
-                removed = sorted(prev_set - curr_set)
-                if added or removed:
-                    diffs.append((prev, curr, added, removed))
+                prev_rules = ranges.get((template, prev, sheet), {})
+                curr_rules = ranges.get((template, curr, sheet), {})
+                rule_diffs = diff_sheet(prev_rules, curr_rules)
+                if rule_diffs:
+                    sheet_before = union_rects(r for rects in prev_rules.values() for r in rects)
+                    sheet_after = union_rects(r for rects in curr_rules.values() for r in rects)
+                    diffs.append((prev, curr, sheet_before, sheet_after, rule_diffs))
             if not diffs:
                 continue
             lines.append(f"## {template} - {sheet}（adjacent diffs）")
             lines.append("")
-            for prev, curr, added, removed in diffs:
-                lines.append(f"- {prev} → {curr}:")
-                if added:
-                    lines.append(f"  - added: {', '.join(added)}")
-                if removed:
-                    lines.append(f"  - removed: {', '.join(removed)}")
+            for prev, curr, sheet_before, sheet_after, rule_diffs in diffs:
+                gained = count_cells(subtract_rects(sheet_after, sheet_before))
+                lost = count_cells(subtract_rects(sheet_before, sheet_after))
+                lines.append(
+                    f"- {prev} → {curr}: {len(rule_diffs)} rule(s) changed; "
+                    f"CF coverage +{gained} / -{lost} cells"
+                )
+                for rule, added, removed in rule_diffs:
+                    lines.append(f"  - `{rule_label(rule)}`")
+                    if added:
+                        lines.append(f"    - +{describe(added)}")
+                    if removed:
+                        lines.append(f"    - -{describe(removed)}")
             lines.append("")
 
-    out_path.write_text("\n".join(lines), encoding="utf-8")
+    replace_text(out_path, "\n".join(lines))
     print(f"Wrote range diff report to {out_path}")
     return 0
 
@@ -100,11 +177,13 @@ def main() -> int:
         default=None,
         help="Output markdown path (default: scan-root/xml-cf-range-diff.md).",
     )
+    add_profile_argument(parser)
     args = parser.parse_args()
 
     scan_root = args.scan_root or find_latest_scan(ROOT / "analysis")
     out_path = args.out or (scan_root / "xml-cf-range-diff.md")
-    return run_diff(scan_root, out_path)
+    with profiling(args, out_path.parent, "xml_cf_range_diff"):
+        return run_diff(scan_root, out_path)
 
 
 if __name__ == "__main__":
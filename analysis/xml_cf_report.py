@@ -2,9 +2,27 @@
 """
 Parse conditional formatting rules directly from worksheet XML, including cfExt (x14/cx).
 
+Sheets are streamed: the bytes of <sheetData> (by far the largest part of a worksheet)
+are dropped before they reach the XML parser, and of the remaining top-level elements
+only conditionalFormatting and extLst are kept, so memory follows the CF rules rather
+than the cell count.
+
 Outputs:
 - analysis/xml-cf-report-YYYY-MM-DD.jsonl
+- analysis/xml-cf-report-YYYY-MM-DD.bin: the same records in the indexed binary format
+  of scan_records.py, for readers that want single sheets
 - analysis/xml-cf-report-YYYY-MM-DD-summary.csv
+- analysis/xml-cf-report-YYYY-MM-DD-memprofile.json with --memprofile (see scan_memory.py)
+- analysis/xml-cf-report-YYYY-MM-DD-events.jsonl with --events (see scan_events.py)
+- xml_cf_report-{cprofile|stats}.* next to the JSONL with --profile (see scan_profile.py)
+
+With --jobs N the workbooks are collected in a process pool. Each worker returns only
+its records (pickled once, with no serialised copy alongside); the parent writes them to
+the JSONL in template/version order as they arrive and merges the summary counts at the
+end, so the output is byte-identical to a serial run and only one workbook's records are
+held as dicts at a time. The .bin is the exception: its string table and group index precede the records,
+so the RecordWriter keeps every record (as interned strings and uint32 slots, a fraction
+of the dicts' size) until it is written after the last workbook.
 """
 
 from __future__ import annotations
@@ -14,17 +32,64 @@ import csv
 import datetime as dt
 import json
 import re
-import zipfile
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
 import xml.etree.ElementTree as ET
 
+try:
+    from analysis.scan_events import (
+        EventLog,
+        add_events_argument,
+        event_log_from_args,
+        format_summary,
+    )
+    from analysis.scan_memory import MemoryProfiler, add_memprofile_argument, profiler_from_args
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_records import RecordWriter, binary_path
+    from analysis.scan_store import replacing
+    from analysis.xlsx_package import WorkbookPackage
+except ImportError:
+    from scan_events import (
+        EventLog,
+        add_events_argument,
+        event_log_from_args,
+        format_summary,
+    )
+    from scan_memory import MemoryProfiler, add_memprofile_argument, profiler_from_args
+    from scan_profile import add_profile_argument, profiling
+    from scan_records import RecordWriter, binary_path
+    from scan_store import replacing
+    from xlsx_package import WorkbookPackage
 
 ROOT = Path(__file__).resolve().parents[1]
 TEMPLATE_ROOT = ROOT / "app" / "templates"
 VERSION_RE = re.compile(r"_(\d+(?:\.\d+)*)$")
 NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+SHEET_DATA_RE = re.compile(rb"<(?:[\w.-]+:)?sheetData[\s/>]")
+CF_PARTS = {"conditionalFormatting", "extLst"}
+CHUNK_SIZE = 1 << 16
+# bytes held back at a chunk boundary so a split "<sheetData" tag is still found
+TAG_TAIL = 64
+# scan_records layout of a record; the rule details (color_scale, ...) go to its extra slot
+CF_RECORD_FIELDS = [
+    ("template", "str"),
+    ("version", "str"),
+    ("sheet", "str"),
+    ("source", "str"),
+    ("ext_uri", "str"),
+    ("sqref", "str"),
+    ("rule_index", "int"),
+    ("type", "str"),
+    ("priority", "str"),
+    ("dxfId", "str"),
+    ("operator", "str"),
+    ("rule_id", "str"),
+    ("formulas", "list"),
+]
 
 
 def local_name(tag: str) -> str:
@@ -36,27 +101,6 @@ def parse_version(path: Path) -> str:
     return match.group(1) if match else ""
 
 
-def build_sheet_xml_map(xlsx_path: Path) -> Dict[str, str]:
-    ns_main = NS_MAIN
-    ns_r = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
-    ns_pkg = "http://schemas.openxmlformats.org/package/2006/relationships"
-    with zipfile.ZipFile(xlsx_path) as z:
-        wb = ET.fromstring(z.read("xl/workbook.xml"))
-        rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
-        rid_map = {
-            rel.get("Id"): rel.get("Target")
-            for rel in rels.findall(f"{{{ns_pkg}}}Relationship")
-        }
-        sheet_map: Dict[str, str] = {}
-        for sheet in wb.findall(f"{{{ns_main}}}sheets/{{{ns_main}}}sheet"):
-            name = sheet.get("name") or ""
-            rid = sheet.get(f"{{{ns_r}}}id")
-            target = rid_map.get(rid or "")
-            if name and target:
-                sheet_map[name] = f"xl/{target}"
-    return sheet_map
-
-
 def iter_templates(root: Path) -> Iterable[Tuple[str, Path]]:
     for folder in sorted(root.iterdir()):
         if not folder.is_dir():
@@ -222,17 +266,84 @@ def iter_ext_cf(
     return records
 
 
-def write_jsonl(path: Path, rows: Iterable[Dict[str, object]]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        for row in rows:
-            f.write(json.dumps(row, ensure_ascii=False))
-            f.write("\n")
+def iter_without_sheet_data(stream: IO[bytes], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Chunks of a worksheet part with the content of <sheetData> cut out.
+
+    <sheetData ...>...</sheetData> becomes an empty <sheetData/>, found with a byte search,
+    so the rows are never parsed at all.
+    """
+    pending = b""
+    closing: Optional[bytes] = None
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        pending += chunk
+        while True:
+            if closing is not None:
+                end = pending.find(closing)
+                if end < 0:
+                    pending = pending[-len(closing) :]
+                    break
+                pending = pending[end + len(closing) :]
+                closing = None
+                continue
+            match = SHEET_DATA_RE.search(pending)
+            if match is None:
+                if len(pending) > TAG_TAIL:
+                    yield pending[:-TAG_TAIL]
+                    pending = pending[-TAG_TAIL:]
+                break
+            tag_end = pending.find(b">", match.end() - 1)
+            if tag_end < 0:
+                yield pending[: match.start()]
+                pending = pending[match.start() :]
+                break
+            yield pending[: match.start()]
+            name = match.group()[1:-1]
+            yield b"<" + name + b"/>"
+            if pending[tag_end - 1 : tag_end] != b"/":
+                closing = b"</" + name + b">"
+            pending = pending[tag_end + 1 :]
+    if closing is None:
+        yield pending
+
+
+def read_cf_root(stream: IO[bytes]) -> ET.Element:
+    """The worksheet root element with only its conditionalFormatting/extLst children."""
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root: Optional[ET.Element] = None
+    depth = 0
+    for chunk in iter_without_sheet_data(stream):
+        parser.feed(chunk)
+        for event, node in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = node
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and local_name(node.tag) not in CF_PARTS:
+                root.remove(node)
+    parser.close()
+    if root is None:
+        raise ET.ParseError("empty worksheet part")
+    return root
+
+
+def iter_sheet_cf(
+    stream: IO[bytes], template: str, version: str, sheet: str
+) -> Iterable[Dict[str, object]]:
+    """iter_standard_cf + iter_ext_cf records of a streamed worksheet part."""
+    root = read_cf_root(stream)
+    yield from iter_standard_cf(root, template, version, sheet)
+    yield from iter_ext_cf(root, template, version, sheet)
+
+
+def format_jsonl(rows: Iterable[Dict[str, object]]) -> str:
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
 
 
 def write_summary(path: Path, counts: Dict[Tuple[str, str, str, str], int]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8", newline="") as f:
+    with replacing(path) as tmp, tmp.open("w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["template", "version", "sheet", "source", "rule_count"])
         for key in sorted(counts):
@@ -240,26 +351,153 @@ def write_summary(path: Path, counts: Dict[Tuple[str, str, str, str], int]) -> N
             writer.writerow([template, version, sheet, source, counts[key]])
 
 
-def run_report(root: Path, out_jsonl: Path, out_summary: Path) -> int:
-    all_records: List[Dict[str, object]] = []
-    counts: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
+def collect_workbook_cf(
+    package: WorkbookPackage,
+    template: str,
+    version: str,
+    events: Optional[EventLog] = None,
+) -> List[Dict[str, object]]:
+    records: List[Dict[str, object]] = []
+    for sheet in package.sheet_map:
+        started = time.perf_counter()
+        count = len(records)
+        with package.sheet_stream(sheet) as stream:
+            records.extend(iter_sheet_cf(stream, template, version, sheet))
+        if events is not None:
+            events.sheet(
+                f"{template}/{package.path.name}",
+                sheet,
+                cf_rules=len(records) - count,
+                bytes_inflated=package.sheet_size(sheet),
+                duration_s=round(time.perf_counter() - started, 6),
+            )
+    return records
 
-    for template, path in iter_templates(root):
-        version = parse_version(path)
-        with zipfile.ZipFile(path) as z:
-            sheet_map = build_sheet_xml_map(path)
-            for sheet, xml_path in sheet_map.items():
-                root_xml = ET.fromstring(z.read(xml_path))
-                standard = list(iter_standard_cf(root_xml, template, version, sheet))
-                ext = list(iter_ext_cf(root_xml, template, version, sheet))
-                for record in standard + ext:
-                    all_records.append(record)
-                    key = (template, version, sheet, record["source"])
-                    counts[key] += 1
-
-    write_jsonl(out_jsonl, all_records)
-    write_summary(out_summary, counts)
-    print(f"Wrote {len(all_records)} rules to {out_jsonl}")
+
+class BufferedEventLog(EventLog):
+    """Keeps sheet events in memory so a worker can hand them to the parent's log."""
+
+    def __init__(self) -> None:
+        super().__init__(None, "xml_cf_report")
+        self.sheets: List[Tuple[str, str, Dict[str, object]]] = []
+
+    def sheet(self, workbook: str, sheet: str, **fields: object) -> None:
+        self.sheets.append((workbook, sheet, fields))
+
+
+@dataclass
+class WorkbookCf:
+    """One workbook's contribution to the report, as returned by collect_file()."""
+
+    template: str
+    version: str
+    rules: int
+    counts: Dict[Tuple[str, str, str, str], int]
+    records: List[Dict[str, object]] = field(default_factory=list)
+    sheets: int = 0
+    inflated: int = 0
+    duration_s: float = 0.0
+    sheet_events: List[Tuple[str, str, Dict[str, object]]] = field(default_factory=list)
+
+
+def summarize_records(
+    template: str, version: str, records: List[Dict[str, object]]
+) -> WorkbookCf:
+    counts: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
+    for record in records:
+        counts[(template, record["version"], record["sheet"], record["source"])] += 1
+    return WorkbookCf(template, version, len(records), dict(counts), records)
+
+
+def collect_file(template: str, path: Path) -> WorkbookCf:
+    """Collect one workbook; runs in the --jobs worker processes."""
+    started = time.perf_counter()
+    version = parse_version(path)
+    events = BufferedEventLog()
+    with WorkbookPackage(path) as package:
+        records = collect_workbook_cf(package, template, version, events)
+        result = summarize_records(template, version, records)
+        result.sheets = len(package.sheet_map)
+        result.inflated = sum(map(package.sheet_size, package.sheet_map))
+    result.sheet_events = events.sheets
+    result.duration_s = time.perf_counter() - started
+    return result
+
+
+def iter_collected(
+    tasks: List[Tuple[str, Path]], jobs: int, memory: MemoryProfiler
+) -> Iterator[WorkbookCf]:
+    """collect_file() for every task, yielded in task order whatever jobs is."""
+    if jobs <= 1 or len(tasks) <= 1:
+        for template, path in tasks:
+            with memory.stage("collect_workbook_cf", f"{template}/{path.name}"):
+                result = collect_file(template, path)
+            yield result
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        yield from pool.map(collect_file, *zip(*tasks))
+
+
+def run_report(
+    root: Path,
+    out_jsonl: Path,
+    out_summary: Path,
+    records_by_path: Optional[Dict[Path, List[Dict[str, object]]]] = None,
+    memory: Optional[MemoryProfiler] = None,
+    events: Optional[EventLog] = None,
+    jobs: int = 1,
+    out_binary: Optional[Path] = None,
+) -> int:
+    """Write the JSONL/summary for every versioned workbook under root.
+
+    records_by_path lets a caller that already read the workbooks (run_scan) hand over
+    their collect_workbook_cf() output instead of having each package opened again.
+    The other workbooks are collected by jobs worker processes (1: in this process).
+    With out_binary the records are also written in the scan_records format.
+    """
+    memory = memory or MemoryProfiler(enabled=False)
+    events = events or EventLog(None, "xml_cf_report")
+    records_by_path = records_by_path or {}
+    tasks = list(iter_templates(root))
+    collected = iter_collected(
+        [task for task in tasks if task[1] not in records_by_path], jobs, memory
+    )
+    counts: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
+    total = 0
+    binary = RecordWriter(CF_RECORD_FIELDS) if out_binary is not None else None
+
+    out_jsonl.parent.mkdir(parents=True, exist_ok=True)
+    with replacing(out_jsonl) as tmp, tmp.open("w", encoding="utf-8") as f:
+        for template, path in tasks:
+            records = records_by_path.get(path)
+            if records is not None:
+                result = summarize_records(template, parse_version(path), records)
+            else:
+                result = next(collected)
+                for workbook, sheet, fields in result.sheet_events:
+                    events.sheet(workbook, sheet, **fields)
+                events.file(
+                    f"{template}/{path.name}",
+                    result.duration_s,
+                    template=template,
+                    version=result.version,
+                    sheets=result.sheets,
+                    cf_rules=result.rules,
+                    bytes_inflated=result.inflated,
+                )
+            f.write(format_jsonl(result.records))
+            if binary is not None:
+                for record in result.records:
+                    binary.add((template, record["version"], record["sheet"]), record)
+            for key, count in result.counts.items():
+                counts[key] += count
+            total += result.rules
+
+    with memory.stage("write_outputs"):
+        write_summary(out_summary, counts)
+        if binary is not None:
+            binary.write(out_binary, source=out_jsonl)
+    print(f"Wrote {total} rules to {out_jsonl}")
     print(f"Wrote summary to {out_summary}")
     return 0
 
@@ -279,12 +517,44 @@ def main() -> int:
         default=None,
         help="Output CSV summary path (default: analysis/xml-cf-report-YYYY-MM-DD-summary.csv).",
     )
+    date_tag = dt.date.today().isoformat()
+    add_memprofile_argument(parser, ROOT / "analysis" / f"xml-cf-report-{date_tag}-memprofile.json")
+    add_events_argument(parser, f"xml-cf-report-{date_tag}-events.jsonl")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes collecting workbooks (default: 1, serial).",
+    )
+    add_profile_argument(parser)
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
 
-    date_tag = dt.date.today().isoformat()
     out_jsonl = args.out or (ROOT / "analysis" / f"xml-cf-report-{date_tag}.jsonl")
     out_summary = args.summary or (ROOT / "analysis" / f"xml-cf-report-{date_tag}-summary.csv")
-    return run_report(args.root, out_jsonl, out_summary)
+    memory = profiler_from_args(args)
+    events = event_log_from_args(
+        args, out_jsonl.with_name(f"{out_jsonl.stem}-events.jsonl"), "xml_cf_report"
+    )
+    with profiling(args, out_jsonl.parent, "xml_cf_report"):
+        status = run_report(
+            args.root,
+            out_jsonl,
+            out_summary,
+            memory=memory,
+            events=events,
+            jobs=args.jobs,
+            out_binary=binary_path(out_jsonl),
+        )
+    if args.memprofile is not None:
+        memory.write(args.memprofile, {"date": date_tag, "root": str(args.root)})
+        memory.close()
+        print(f"Wrote memory profile to {args.memprofile}")
+    if events.enabled:
+        print(f"Throughput: {format_summary(events.close())}")
+        print(f"Wrote events to {events.path}")
+    return status
 
 
 if __name__ == "__main__":
@@ -5,6 +5,8 @@ Strict semantic review: compare Excel CF/DV signals vs markdown docs.
 Outputs:
 - xml-semantic-diff.md (detailed checks + evidence)
 - xml-semantic-fixlist.md (only mismatches)
+- xml-semantic-events.jsonl with --events (per template version/sheet; see scan_events.py)
+- xml_semantic_review-{cprofile|stats}.* with --profile (see scan_profile.py)
 """
 
 from __future__ import annotations
@@ -12,14 +14,34 @@ from __future__ import annotations
 import argparse
 import csv
 import datetime as dt
-import json
 import re
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+try:
+    from analysis.scan_events import (
+        EventLog,
+        add_events_argument,
+        event_log_from_args,
+        format_summary,
+    )
+    from analysis.scan_profile import add_profile_argument, profiling
+    from analysis.scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from analysis.scan_store import replace_text
+except ImportError:
+    from scan_events import (
+        EventLog,
+        add_events_argument,
+        event_log_from_args,
+        format_summary,
+    )
+    from scan_profile import add_profile_argument, profiling
+    from scan_artifacts import ScanArtifacts, artifacts_for, find_latest_scan
+    from scan_store import replace_text
+
 ROOT = Path(__file__).resolve().parents[1]
-SCAN_PREFIX = "scan-"
 VERSION_RE = re.compile(r"_(\d+(?:\.\d+)*)$")
 TARGET_SHEETS = ["Declaration", "Checker", "Smelter List", "Mine List", "Product List"]
 
@@ -33,13 +55,6 @@ class Signal:
     dv_predicate: Optional[Callable[[List[Dict[str, str]]], bool]] = None
 
 
-def find_latest_scan(root: Path) -> Path:
-    scans = sorted([p for p in root.iterdir() if p.is_dir() and p.name.startswith(SCAN_PREFIX)])
-    if not scans:
-        raise FileNotFoundError("No scan-YYYY-MM-DD directories found in analysis/.")
-    return scans[-1]
-
-
 def parse_version(path: Path) -> Tuple[str, Tuple[int, ...]]:
     match = VERSION_RE.search(path.stem)
     if not match:
@@ -66,38 +81,6 @@ def load_template_versions() -> Dict[str, List[str]]:
     return templates
 
 
-def load_cf_formulas(scan_root: Path) -> Dict[Tuple[str, str, str], List[str]]:
-    path = scan_root / "xml-cf-report.jsonl"
-    if not path.exists():
-        raise FileNotFoundError(f"Missing {path}")
-    formulas: Dict[Tuple[str, str, str], List[str]] = {}
-    with path.open(encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
-            key = (rec["template"], rec["version"], rec["sheet"])
-            formulas.setdefault(key, [])
-            for formula in rec.get("formulas", []):
-                if formula:
-                    formulas[key].append(formula)
-    return formulas
-
-
-def load_dv_records(scan_root: Path) -> Dict[Tuple[str, str, str], List[Dict[str, str]]]:
-    dv_map: Dict[Tuple[str, str, str], List[Dict[str, str]]] = {}
-    for path in scan_root.glob("*_rule_catalog_dv.csv"):
-        template = path.stem.split("_rule_catalog_dv")[0].upper()
-        with path.open(encoding="utf-8") as f:
-            header = f.readline().strip().split(",")
-            for line in f:
-                values = line.rstrip("\n").split(",")
-                row = dict(zip(header, values))
-                key = (template, row.get("version", ""), row.get("sheet", ""))
-                dv_map.setdefault(key, []).append(row)
-    return dv_map
-
-
 def load_cfext_summary(scan_root: Path) -> Dict[Tuple[str, str, str], int]:
     summary_path = scan_root / "xml-cf-report-summary.csv"
     cfext: Dict[Tuple[str, str, str], int] = {}
@@ -410,9 +393,15 @@ def detect_signal(
     return doc_has, xml_has, doc_evidence, xml_evidence
 
 
-def run_review(scan_root: Path, out_diff: Path, out_fix: Path) -> int:
-    formulas = load_cf_formulas(scan_root)
-    dv_records = load_dv_records(scan_root)
+def run_review(
+    scan_root: Path,
+    out_diff: Path,
+    out_fix: Path,
+    events: Optional[EventLog] = None,
+    artifacts: Optional[ScanArtifacts] = None,
+) -> int:
+    events = events or EventLog(None, "xml_semantic_review")
+    artifacts = artifacts or artifacts_for(scan_root)
     cfext = load_cfext_summary(scan_root)
     template_versions = load_template_versions()
 
@@ -436,13 +425,24 @@ def run_review(scan_root: Path, out_diff: Path, out_fix: Path) -> int:
     for template in sorted(template_versions):
         versions = template_versions[template]
         for version in versions:
+            started = time.perf_counter()
+            version_key = f"{template}/{version}"
+            version_counts = {"dv_rules": 0, "cf_rules": 0}
             diff_lines.append(f"## {template} {version}")
             diff_lines.append("")
             for sheet in TARGET_SHEETS:
                 key = (template, version, sheet)
-                sheet_formulas = formulas.get(key, [])
-                sheet_dvs = dv_records.get(key, [])
+                sheet_formulas = artifacts.sheet_cf_formulas(key)
+                sheet_dvs = artifacts.sheet_dv_rows(key)
                 sheet_cfext = cfext.get(key, 0)
+                events.sheet(
+                    version_key,
+                    sheet,
+                    dv_rules=len(sheet_dvs),
+                    cf_rules=len(sheet_formulas) + sheet_cfext,
+                )
+                version_counts["dv_rules"] += len(sheet_dvs)
+                version_counts["cf_rules"] += len(sheet_formulas) + sheet_cfext
                 doc_paths = doc_paths_for(template, version, sheet)
                 doc_text = load_docs_text(doc_paths)
 
@@ -497,6 +497,15 @@ def run_review(scan_root: Path, out_diff: Path, out_fix: Path) -> int:
                         fix_lines.append("")
                 diff_lines.append("")
 
+            events.file(
+                version_key,
+                time.perf_counter() - started,
+                template=template,
+                version=version,
+                sheets=len(TARGET_SHEETS),
+                **version_counts,
+            )
+
     diff_lines.append("## Summary")
     diff_lines.append("")
     diff_lines.append(f"- Total checks: {total_checks}")
@@ -509,8 +518,8 @@ def run_review(scan_root: Path, out_diff: Path, out_fix: Path) -> int:
         fix_lines.append("- 未发现需要修正的文档项。")
         fix_lines.append("")
 
-    out_diff.write_text("\n".join(diff_lines), encoding="utf-8")
-    out_fix.write_text("\n".join(fix_lines), encoding="utf-8")
+    replace_text(out_diff, "\n".join(diff_lines))
+    replace_text(out_fix, "\n".join(fix_lines))
     print(f"Wrote detailed diff to {out_diff}")
     print(f"Wrote fix list to {out_fix}")
     return 0
@@ -521,12 +530,22 @@ def main() -> int:
     parser.add_argument("--scan-root", type=Path, default=None, help="analysis/scan-YYYY-MM-DD directory.")
     parser.add_argument("--out-diff", type=Path, default=None, help="Output detailed diff markdown.")
     parser.add_argument("--out-fix", type=Path, default=None, help="Output fix list markdown.")
+    add_events_argument(parser, "xml-semantic-events.jsonl")
+    add_profile_argument(parser)
     args = parser.parse_args()
 
     scan_root = args.scan_root or find_latest_scan(ROOT / "analysis")
     out_diff = args.out_diff or (scan_root / "xml-semantic-diff.md")
     out_fix = args.out_fix or (scan_root / "xml-semantic-fixlist.md")
-    return run_review(scan_root, out_diff, out_fix)
+    events = event_log_from_args(
+        args, scan_root / "xml-semantic-events.jsonl", "xml_semantic_review"
+    )
+    with profiling(args, out_diff.parent, "xml_semantic_review"):
+        status = run_review(scan_root, out_diff, out_fix, events)
+    if events.enabled:
+        print(f"Throughput: {format_summary(events.close())}")
+        print(f"Wrote events to {events.path}")
+    return status
 
 
 if __name__ == "__main__":